@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import logging
+import threading
+
+from records import AddressRecord, select_new
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des données locales (monté en volume dans docker-compose.yml)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+
+class AddressStore:
+    """Stockage local SQLite des adresses connues, indexé par id, adresse et émetteur
+
+    Seules les adresses dont l'ID dépasse la plus haute valeur déjà connue sont
+    insérées, et les validateurs HTTP (ETag / Last-Modified) de la dernière
+    réponse sont conservés pour les requêtes conditionnelles.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, "addresses.db")
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS addresses ("
+                "id INTEGER PRIMARY KEY, address TEXT NOT NULL, issuer TEXT NOT NULL DEFAULT '')"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_addresses_address ON addresses(address)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_addresses_issuer ON addresses(issuer)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._high_water_mark = self._load_high_water_mark()
+        logger.info(f"Stockage des adresses ouvert: {path} (ID maximum connu: {self._high_water_mark})")
+
+    def _load_high_water_mark(self):
+        row = self._conn.execute("SELECT MAX(id) FROM addresses").fetchone()
+        return row[0] or 0
+
+    def refresh(self):
+        """Relit le plus grand ID connu (le stockage a pu être alimenté par une autre instance)"""
+        with self._lock:
+            self._high_water_mark = self._load_high_water_mark()
+        return self._high_water_mark
+
+    @property
+    def high_water_mark(self):
+        """Plus grand ID d'adresse connu localement"""
+        return self._high_water_mark
+
+    def add_new(self, records):
+        """Insère les adresses (AddressRecord) dont l'ID dépasse le plus grand ID connu
+
+        Returns:
+            Le nombre d'adresses insérées
+        """
+        delta, high_water_mark, _ = select_new(records, self._high_water_mark)
+        if not delta:
+            return 0
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO addresses (id, address, issuer) VALUES (?, ?, ?)",
+                ((record.id, record.address, record.issuer) for record in delta)
+            )
+            self._high_water_mark = high_water_mark
+        logger.info("%d nouvelles adresses enregistrées (ID maximum: %d)", len(delta), self._high_water_mark)
+        return len(delta)
+
+    def get_addresses(self, min_id=0, issuer=None, limit=None):
+        """Retourne les adresses (AddressRecord) d'ID supérieur à min_id, triées par ID croissant"""
+        query = "SELECT id, address, issuer FROM addresses WHERE id > ?"
+        params = [int(min_id or 0)]
+        if issuer:
+            query += " AND issuer = ?"
+            params.append(issuer)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [AddressRecord(*row) for row in rows]
+
+    def iter_addresses(self, min_id=0, issuer=None, batch_size=1000):
+        """Parcourt les adresses par lots triés par ID, sans tout charger en mémoire
+
+        Chaque lot est une requête indépendante (pagination par ID), le verrou n'est
+        donc jamais conservé entre deux lots.
+        """
+        last_id = int(min_id or 0)
+        while True:
+            batch = self.get_addresses(min_id=last_id, issuer=issuer, limit=batch_size)
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].id
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def get_validators(self):
+        """Retourne l'ETag et la date Last-Modified de la dernière réponse complète"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('etag', 'last_modified')"
+            ).fetchall()
+        values = dict(rows)
+        return values.get("etag"), values.get("last_modified")
+
+    def set_validators(self, etag, last_modified):
+        """Mémorise les validateurs HTTP de la dernière réponse intégrée"""
+        with self._lock, self._conn:
+            for key, value in (("etag", etag), ("last_modified", last_modified)):
+                if value:
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+                else:
+                    self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,129 @@
+import time
+import heapq
+import threading
+from collections import deque
+
+from query_cache import parse_timestamp
+
+# Fenêtres glissantes: nom -> durée en secondes
+WINDOWS = {"1m": 60, "1h": 3600, "24h": 86400}
+# Nombre de tranches par fenêtre (précision de l'expiration: durée / tranches)
+WINDOW_BUCKETS = 60
+
+
+def _amount(tx):
+    try:
+        return float(tx.get("valueFormatted"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _merge(target, values, sign=1):
+    for name, value in values.items():
+        target[name] = target.get(name, 0) + sign * value
+
+
+class RollingWindow:
+    """Agrégats par clé sur une fenêtre glissante, découpée en tranches
+
+    Chaque tranche garde ses propres sommes; les totaux de la fenêtre sont mis à jour à
+    l'ajout et lorsqu'une tranche expire (ses sommes sont alors soustraites). Un ajout
+    coûte O(1), la lecture d'un total aussi, quelle que soit l'histoire déjà vue.
+    """
+
+    def __init__(self, span, buckets=WINDOW_BUCKETS):
+        self.span = span
+        self.width = span / buckets
+        self.buckets = buckets
+        # Tranches (numéro, {clé: {mesure: valeur}}), de la plus ancienne à la plus récente
+        self._slots = deque()
+        self.totals = {}
+
+    def _expire(self, slot):
+        while self._slots and self._slots[0][0] <= slot - self.buckets:
+            _, values = self._slots.popleft()
+            for key, measures in values.items():
+                total = self.totals[key]
+                _merge(total, measures, -1)
+                if total.get("count", 0) <= 0:
+                    del self.totals[key]
+
+    def add(self, key, measures, timestamp):
+        slot = int(timestamp // self.width)
+        current = max(slot, self._slots[-1][0]) if self._slots else slot
+        self._expire(current)
+        if slot <= current - self.buckets:
+            # Trop ancienne pour la fenêtre
+            return
+        if not self._slots or slot > self._slots[-1][0]:
+            self._slots.append((slot, {}))
+        # Une transaction en retard est comptée dans la tranche la plus récente
+        _merge(self._slots[-1][1].setdefault(key, {}), measures)
+        _merge(self.totals.setdefault(key, {}), measures)
+
+    def snapshot(self, now):
+        """Totaux de la fenêtre à l'instant `now`"""
+        self._expire(int(now // self.width))
+        return self.totals
+
+
+class TransactionAnalytics:
+    """Agrégats glissants des transactions par jeton, émetteur et destinataire"""
+
+    DIMENSIONS = ("token", "sender", "recipient")
+
+    def __init__(self, windows=WINDOWS, buckets=WINDOW_BUCKETS):
+        self.windows = {
+            name: {dimension: RollingWindow(span, buckets) for dimension in self.DIMENSIONS}
+            for name, span in windows.items()
+        }
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def record(self, transactions, now=None):
+        """Intègre des transactions, datées par leur horodatage (ou l'instant de détection)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for tx in transactions:
+                timestamp = min(parse_timestamp(tx.get("timestamp")) or now, now)
+                if timestamp < now - max(WINDOWS.values()):
+                    continue
+                token = str(tx.get("tokenSymbol", ""))
+                amount = _amount(tx)
+                by_token = {"count": 1, "volume": amount}
+                by_address = {"count": 1, f"volume:{token}": amount}
+                for dimensions in self.windows.values():
+                    dimensions["token"].add(token, by_token, timestamp)
+                    dimensions["sender"].add(str(tx.get("from", "")).lower(), by_address, timestamp)
+                    dimensions["recipient"].add(str(tx.get("to", "")).lower(), by_address, timestamp)
+                self.recorded += 1
+
+    @staticmethod
+    def _address_entry(address, measures):
+        volumes = {name.split(":", 1)[1]: value for name, value in measures.items() if name.startswith("volume:")}
+        return {"address": address, "count": measures["count"], "volume": volumes}
+
+    def stats(self, window=None, top=10, now=None):
+        """Totaux par jeton et principaux émetteurs/destinataires de chaque fenêtre"""
+        now = now if now is not None else time.time()
+        names = [window] if window else list(self.windows)
+        result = {}
+        with self._lock:
+            for name in names:
+                dimensions = self.windows[name]
+                tokens = dimensions["token"].snapshot(now)
+                senders = dimensions["sender"].snapshot(now)
+                recipients = dimensions["recipient"].snapshot(now)
+                result[name] = {
+                    "transactions": sum(measures["count"] for measures in tokens.values()),
+                    "tokens": {token: dict(measures) for token, measures in tokens.items()},
+                    "top_senders": [
+                        self._address_entry(address, measures) for address, measures in
+                        heapq.nlargest(top, senders.items(), key=lambda item: item[1]["count"])
+                    ],
+                    "top_recipients": [
+                        self._address_entry(address, measures) for address, measures in
+                        heapq.nlargest(top, recipients.items(), key=lambda item: item[1]["count"])
+                    ],
+                }
+        return result
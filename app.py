@@ -1,26 +1,45 @@
 import os
-import requests
 import logging
 import csv
 from datetime import datetime
 from dotenv import load_dotenv
 import asyncio
 import json
-from fastapi import FastAPI, BackgroundTasks, Response
+import io
+import zlib
+from fastapi import FastAPI, BackgroundTasks, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import uvicorn
-import threading
 import time
-
-# Configuration du logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+from http_client import http_client
+from records import select_new
+from address_store import DATA_DIR
+from transactions import SeenIndex, TransactionCatchUp
+from telegram_dispatcher import TelegramDispatcher
+from scheduler import Scheduler
+from metrics import observe_stage, render_metrics
+from ingest import INGEST_SECRET, SIGNATURE_HEADER, PushMonitor, parse_events, verify_signature
+from logging_config import configure_logging
+from subscriptions import FEED_ADDRESSES, FEED_TRANSACTIONS, SUBSCRIPTIONS_FILE
+from leader import LeaderElection
+from query_cache import QUERY_MAX_LIMIT, AddressIndex, QueryCache, TransactionIndex, parse_timestamp
+from analytics import WINDOWS, TransactionAnalytics
+from watchlist import Watchlist
+from live_feed import LiveFeed
+from tx_archive import TransactionArchive
+from diagnostics import (
+    ADMIN_TOKEN, MEMORY_GROUPS, PROFILE_MODES, PROFILE_SAMPLE_INTERVAL, Diagnostics, DiagnosticsBusyError, verify_admin_token
 )
-logger = logging.getLogger(__name__)
+from networks import NetworkMonitor, load_networks
+from digest import DIGEST_WINDOW
 
 # Chargement des variables d'environnement
 load_dotenv()
 
+# Configuration du logging (écriture dans un thread dédié, secrets masqués)
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Configuration des API
 API_KEY = os.getenv("API_KEY")
 API_URL = os.getenv("API_URL")
@@ -31,137 +50,25 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 app = FastAPI(title="BCReader Telegram Bot")
 
 # Configuration de l'API Telegram
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+TELEGRAM_API_URL = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_BOT_TOKEN}"
 
-# Variable globale pour stocker le dernier ID traité
-last_processed_id = 0
+# File d'envoi Telegram limitée en débit
+telegram_dispatcher = TelegramDispatcher(TELEGRAM_API_URL)
 
-# Verrou pour éviter les problèmes de concurrence
-id_lock = threading.Lock()
+# Flux en direct (SSE) des nouvelles adresses et transactions
+live_feed = LiveFeed()
 
-async def fetch_api_data():
-    """Récupère les données de l'API BCReader"""
-    headers = {
-        "accept": "application/json",
-        "x-api-key": API_KEY
-    }
-    
-    try:
-        response = requests.get(f"{API_URL}/api/config/addresses", headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        logger.info(f"Données récupérées avec succès depuis l'API, type: {type(data)}")
-        return data
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erreur lors de la requête API: {e}")
-        return {"error": str(e)}
-
-async def fetch_transactions_data(page=1, limit=20):
-    """Récupère les données de transactions depuis l'API BCReader"""
-    headers = {
-        "accept": "application/json",
-        "x-api-key": API_KEY
-    }
-    
-    try:
-        response = requests.get(f"{API_URL}/api/all-transactions?page={page}&limit={limit}", headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erreur lors de la requête API pour les transactions: {e}")
-        return {"error": str(e)}
-
-def extract_data_for_csv(data):
-    """Extrait les données pertinentes pour le CSV (id, address, issuer)"""
-    csv_data = []
-    
-    # Vérification si les données sont une liste d'objets (comme dans la réponse de l'API)
-    if isinstance(data, list):
-        for item in data:
-            if isinstance(item, dict) and all(k in item for k in ["id", "address"]):
-                csv_data.append({
-                    "id": item["id"],
-                    "address": item["address"],
-                    "issuer": item.get("issuer", "")
-                })
-    # Si les données sont un dictionnaire
-    elif isinstance(data, dict) and not "error" in data:
-        # Vérifier si les adresses sont directement dans une clé 'addresses'
-        if "addresses" in data and isinstance(data["addresses"], dict):
-            for address_id, address_info in data["addresses"].items():
-                if isinstance(address_info, dict) and "address" in address_info:
-                    csv_data.append({
-                        "id": address_id,
-                        "address": address_info["address"],
-                        "issuer": address_info.get("issuer", "")
-                    })
-        # Si les données sont dans une propriété 'items' ou similaire
-        elif "items" in data and isinstance(data["items"], list):
-            for item in data["items"]:
-                if all(k in item for k in ["id", "address"]):
-                    csv_data.append({
-                        "id": item["id"],
-                        "address": item["address"],
-                        "issuer": item.get("issuer", "")
-                    })
-        # Si les données sont un objet avec des propriétés
-        else:
-            for key, value in data.items():
-                if isinstance(value, dict) and all(k in value for k in ["id", "address"]):
-                    csv_data.append({
-                        "id": value["id"],
-                        "address": value["address"],
-                        "issuer": value.get("issuer", "")
-                    })
-                elif isinstance(value, dict) and "address" in value:
-                    # Cas où l'ID est la clé et les autres infos sont dans la valeur
-                    csv_data.append({
-                        "id": key,
-                        "address": value.get("address", ""),
-                        "issuer": value.get("issuer", "")
-                    })
-    
-    return csv_data
+# Profilage et suivi mémoire à la demande (endpoints /debug, réservés à l'administration)
+diagnostics = Diagnostics()
 
-def save_to_csv(data, keep_file=False):
-    """Sauvegarde les données dans un fichier CSV
-    
-    Args:
-        data: Les données à sauvegarder
-        keep_file: Si True, conserve le fichier. Si False, le fichier sera temporaire.
-        
-    Returns:
-        Le chemin du fichier CSV créé
-    """
-    try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"bcreader_data_{timestamp}.csv"
-        filepath = os.path.join(os.path.dirname(__file__), filename)
-        
-        with open(filepath, 'w', newline='') as csvfile:
-            fieldnames = ['id', 'address', 'issuer']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for item in data:
-                writer.writerow(item)
-        
-        logger.info(f"Données sauvegardées dans {filepath}")
-        return filepath
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde du CSV: {e}")
-        return None
+# Adresses surveillées (fichier de la liste et safes détectés), libellées dans les messages
+watchlist = Watchlist()
 
-def delete_csv_file(filepath):
-    """Supprime un fichier CSV"""
-    try:
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-            logger.info(f"Fichier supprimé: {filepath}")
-    except Exception as e:
-        logger.error(f"Erreur lors de la suppression du fichier: {e}")
+# Durée pendant laquelle /get-csv sert le stockage local sans interroger l'API
+CSV_SNAPSHOT_TTL = float(os.getenv("CSV_SNAPSHOT_TTL", "60"))
 
-def format_data(data, min_id=170, max_addresses=10):
+def format_data(data, min_id=170, max_addresses=None):
     """Met en forme les données pour l'affichage dans Telegram"""
     try:
         if not data:
@@ -170,286 +77,197 @@ def format_data(data, min_id=170, max_addresses=10):
         # S'assurer que min_id est un entier
         min_id = int(min_id) if min_id is not None else 170
         
-        # Filtrer les données pour ne garder que celles avec un ID supérieur à min_id
-        filtered_data = [item for item in data if int(item['id']) > min_id]
-        
-        # Trier les données par ID pour s'assurer qu'elles sont dans l'ordre croissant
-        filtered_data.sort(key=lambda x: int(x['id']))
+        # Un seul passage: filtrage par ID et, si demandé, sélection des max_addresses plus petits IDs
+        filtered_data, _, count = select_new(data, min_id, max_addresses)
         
         if not filtered_data:
             return "ℹ️ Aucune nouvelle adresse depuis le dernier ID"
         
-        # Limiter le nombre d'adresses pour éviter les messages trop longs
-        if len(filtered_data) > max_addresses:
-            logger.info(f"Limitation à {max_addresses} adresses sur {len(filtered_data)} détectées")
-            filtered_data = filtered_data[:max_addresses]
+        if len(filtered_data) < count:
+            logger.info("Limitation à %d adresses sur %d détectées", max_addresses, count)
             
         message = "📊 New Safe Deployed 📊\n\n"
         
         for item in filtered_data:
-            message += f"🔹 ID: {item['id']}\n"
-            message += f"📍 Address: {item['address']}\n"
-            message += f"🏢 Issuer: {item['issuer']}\n\n"
+            message += f"🔹 ID: {item.id}\n"
+            message += f"📍 Address: {item.address}\n"
+            message += f"🏢 Issuer: {item.issuer}\n\n"
         
-        logger.info(f"Formatage de {len(filtered_data)} nouvelles adresses avec ID > {min_id}")
+        logger.info("Formatage de %d nouvelles adresses avec ID > %d", len(filtered_data), min_id)
         return message
     except Exception as e:
         logger.error(f"Erreur lors du formatage du message Telegram: {e}")
         return f"❗ Erreur de formatage: {str(e)}"
 
-def format_transactions(transactions_data, last_tx_hash=None):
+def format_transactions(transactions_data):
     """Met en forme les données de transactions pour l'affichage dans Telegram"""
     try:
         if not transactions_data or "data" not in transactions_data or not transactions_data["data"]:
             return "❗ Aucune transaction disponible"
         
-        # Récupérer les transactions
+        # Récupérer les transactions (déjà filtrées par le rattrapage)
         transactions = transactions_data["data"]
+        watchlist.maybe_reload()
         
-        # Filtrer les transactions si un hash de dernière transaction est fourni
-        # Note: Comme l'API ne fournit pas de hash de transaction, nous utilisons une combinaison de from+to+value comme identifiant unique
-        if last_tx_hash:
-            # Trouver l'index de la dernière transaction traitée
-            try:
-                found = False
-                filtered_transactions = []
-                
-                for tx in transactions:
-                    tx_hash = f"{tx['from']}_{tx['to']}_{tx['valueFormatted']}"
-                    
-                    # Si on trouve la transaction déjà traitée, on marque qu'on l'a trouvée
-                    # et on ne l'ajoute pas à la liste filtrée
-                    if tx_hash == last_tx_hash:
-                        found = True
-                        logger.info(f"Transaction déjà traitée trouvée: {tx_hash}")
-                        break
-                    
-                    # On ajoute uniquement les transactions qui n'ont pas encore été traitées
-                    filtered_transactions.append(tx)
-                
-                # Remplacer la liste originale par la liste filtrée
-                transactions = filtered_transactions
-            except Exception as e:
-                logger.error(f"Erreur lors du filtrage des transactions: {e}")
-        
-        if not transactions:
-            return "ℹ️ Aucune nouvelle transaction depuis la dernière vérification"
-            
         message = "💰 Nouvelles Transactions 💰\n\n"
         
         for tx in transactions:
-            # Vérifier si l'adresse d'origine est l'adresse spéciale
-            if tx['from'] == "0x74a9b04c7bab3d3BAd1A0a06589A24A67a6f9127":
-                message += f"🎁 *GIFT NEW WALLET* 🎁 💸\n"
+            # Libellés des adresses surveillées (recherche en temps constant)
+            sender = watchlist.lookup(tx['from'])
+            recipient = watchlist.lookup(tx['to'])
+            if sender is not None and sender.highlight:
+                message += f"🎁 *{sender.label}* 🎁 💸\n"
+            elif sender is not None:
+                message += f"🔹 De: {tx['from']} 🏷️ *{sender.label}*\n"
             else:
                 message += f"🔹 De: {tx['from']}\n"
-            message += f"📍 À: {tx['to']}\n"
+            if recipient is not None:
+                message += f"📍 À: {tx['to']} 🏷️ *{recipient.label}*\n"
+            else:
+                message += f"📍 À: {tx['to']}\n"
             message += f"💶 Montant: {tx['valueFormatted']} {tx['tokenSymbol']}\n\n"
         
-        logger.info(f"Formatage de {len(transactions)} nouvelles transactions")
+        logger.info("Formatage de %d nouvelles transactions", len(transactions))
         return message
     except Exception as e:
         logger.error(f"Erreur lors du formatage des transactions pour Telegram: {e}")
         return f"❗ Erreur de formatage des transactions: {str(e)}"
 
-async def send_telegram_message(message):
-    """Envoie un message via l'API Telegram"""
-    if not TELEGRAM_BOT_TOKEN:
-        logger.error("Token du bot Telegram non configuré, impossible d'envoyer le message")
-        return False
-        
-    if not TELEGRAM_CHAT_ID:
-        logger.error("ID de chat Telegram non configuré, impossible d'envoyer le message")
-        return False
-    
-    url = f"{TELEGRAM_API_URL}/sendMessage"
-    data = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown"
-    }
-    
-    logger.info(f"Envoi du message Telegram à l'URL: {url}")
-    logger.info(f"Données: {data}")
-    
-    try:
-        response = requests.post(url, json=data)
-        response_json = response.json()
-        
-        if response.status_code == 200 and response_json.get('ok'):
-            logger.info(f"Message envoyé avec succès sur Telegram au chat {TELEGRAM_CHAT_ID}")
-            return True
-        else:
-            logger.error(f"Erreur Telegram: {response.status_code} - {response_json}")
-            return False
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erreur lors de l'envoi du message Telegram: {e}")
-        if hasattr(e, 'response') and e.response:
-            try:
-                error_detail = e.response.json()
-                logger.error(f"Détails de l'erreur: {error_detail}")
-            except:
-                logger.error(f"Contenu de la réponse: {e.response.text}")
-        return False
-
-async def process_and_send_data(min_id=None):
-    """Récupère les données, les formate et les envoie via Telegram"""
-    global last_processed_id
-    csv_file = None
+def index_addresses(records):
+    """Intègre les adresses nouvellement stockées au cache de consultation, à la liste de
+    surveillance et au flux en direct"""
+    address_cache.update(records)
+    watchlist.add_safes(records)
+    for record in records:
+        live_feed.publish("address", record.as_dict())
+
+# Archive locale de toutes les transactions observées (segments NDJSON en ajout seul)
+tx_archive = TransactionArchive()
+
+# Agrégats glissants des transactions détectées (volumes par jeton, émetteurs, destinataires)
+transaction_analytics = TransactionAnalytics()
+
+def record_transactions(new_transactions, new_keys):
+    """Intègre les transactions détectées au cache de consultation, à l'archive et aux statistiques"""
+    transaction_cache.update(new_transactions, new_keys)
+    with observe_stage("archive"):
+        tx_archive.append(list(reversed(new_transactions)))
+    with observe_stage("analytics"):
+        transaction_analytics.record(new_transactions)
+    # Du plus ancien au plus récent
+    for tx in reversed(new_transactions):
+        live_feed.publish("transaction", tx)
+
+# Réseau principal (API_URL): état dans DATA_DIR, chats de TELEGRAM_CHAT_ID et du fichier des
+# abonnements. Il passe par le même pipeline que les réseaux supplémentaires, avec en plus
+# les résumés, la liste de surveillance, l'archive, les statistiques et les caches.
+# Sans token, aucun envoi n'est tenté.
+dispatcher = telegram_dispatcher if TELEGRAM_BOT_TOKEN else None
+main_network = NetworkMonitor(
+    None, API_URL, API_KEY, dispatcher, format_data, format_transactions,
+    chat_ids=TELEGRAM_CHAT_ID, subscriptions_file=SUBSCRIPTIONS_FILE, directory=DATA_DIR,
+    digest_window=DIGEST_WINDOW, on_addresses=index_addresses, on_transactions=record_transactions,
+    priority=watchlist.is_priority,
+)
+address_store = main_network.address_store
+checkpoints = main_network.checkpoints
+
+# Suivi des événements poussés par webhook et index de leurs clés d'idempotence (clés
+# mémorisées une fois les événements livrés, clés des événements en cours de traitement)
+push_monitor = PushMonitor()
+seen_events = SeenIndex()
+pending_events = set()
+
+async def process_pushed_events(events):
+    """Fait passer des événements poussés dans le même pipeline que la vérification périodique
     
+    Les envois se font sous le verrou du flux concerné pour ne jamais concurrencer le poller.
+    Les clés d'idempotence ne sont mémorisées qu'une fois les événements livrés: un lot
+    renvoyé par le publieur après un échec est traité de nouveau, et la vérification
+    périodique du type en échec reprend aussitôt.
+    """
+    addresses = [record for _, kind, record in events if kind == "address"]
+    transfers = [record for _, kind, record in events if kind == "transfer"]
+    delivered = set()
     try:
-        # Si min_id n'est pas spécifié, utiliser le dernier ID traité
-        if min_id is None:
-            with id_lock:
-                min_id = last_processed_id
-                logger.info(f"Utilisation du dernier ID traité: {min_id}")
-        else:
-            logger.info(f"Utilisation de l'ID spécifié: {min_id}")
-        
-        # Vérification si c'est le premier démarrage après une mise à jour du code
-        # On continue le traitement même au premier démarrage pour vérifier les nouvelles adresses
-        logger.info("Vérification des nouvelles adresses, même au premier démarrage")
-            
-        # Récupération des données
-        data = await fetch_api_data()
-        if not data:
-            logger.error("Aucune donnée reçue de l'API")
-            return False
-        
-        # Log pour déboguer la structure des données reçues
-        logger.info(f"Structure des données reçues: {type(data)}")
-        if isinstance(data, dict):
-            logger.info(f"Clés dans les données: {list(data.keys())}")
-            if "addresses" in data:
-                logger.info(f"Type de 'addresses': {type(data['addresses'])}")
-                if isinstance(data['addresses'], dict):
-                    logger.info(f"Nombre d'adresses: {len(data['addresses'])}")
-                    # Afficher quelques exemples d'adresses
-                    sample_keys = list(data['addresses'].keys())[:2]
-                    for key in sample_keys:
-                        logger.info(f"Exemple d'adresse - Clé: {key}, Valeur: {data['addresses'][key]}")
-        
-        # Extraction des données pour CSV
-        csv_data = extract_data_for_csv(data)
-        logger.info(f"Nombre d'adresses extraites pour CSV: {len(csv_data) if csv_data else 0}")
-        
-        if not csv_data:
-            logger.error("Aucune donnée extraite pour le CSV")
-            return False
-        
-        # Afficher quelques exemples d'adresses extraites
-        for i, item in enumerate(csv_data[:2]):
-            logger.info(f"Exemple d'adresse extraite {i+1}: {item}")
-        
-        # Sauvegarde des données dans un fichier CSV temporaire
-        csv_file = save_to_csv(csv_data, keep_file=False)
-        
-        # Formatage du message avec filtrage par ID
-        message = format_data(csv_data, min_id)
-        
-        # Envoi du message via Telegram seulement s'il y a de nouvelles données
-        if "Aucune nouvelle adresse" not in message:
-            # Trouver le plus grand ID dans les données filtrées
-            filtered_data = [item for item in csv_data if int(item['id']) > int(min_id)]
-            logger.info(f"Nombre d'adresses après filtrage (ID > {min_id}): {len(filtered_data)}")
-            
-            if filtered_data:
-                # Afficher quelques exemples d'adresses filtrées
-                for i, item in enumerate(filtered_data[:2]):
-                    logger.info(f"Exemple d'adresse filtrée {i+1}: {item}")
-                
-                max_id = max([int(item['id']) for item in filtered_data])
-                logger.info(f"Nouvel ID maximum détecté: {max_id}")
-                
-                # Envoyer le message
-                success = await send_telegram_message(message)
-                logger.info(f"Résultat de l'envoi du message: {'Succès' if success else 'Échec'}")
-                
-                # Mettre à jour le dernier ID traité seulement si l'envoi a réussi
-                if success:
-                    with id_lock:
-                        last_processed_id = max_id
-                    logger.info(f"Dernier ID traité mis à jour: {last_processed_id}")
-                
-                # Supprimer le fichier CSV temporaire après l'envoi du message
-                if csv_file:
-                    delete_csv_file(csv_file)
-                    
-                return success
-            else:
-                logger.info("Aucune nouvelle adresse après filtrage")
-                if csv_file:
-                    delete_csv_file(csv_file)
-                return True
-        else:
-            logger.info("Aucune nouvelle adresse à envoyer")
-            # Supprimer le fichier CSV temporaire s'il n'y a pas de nouvelles données
-            if csv_file:
-                delete_csv_file(csv_file)
-            return True
+        if addresses and await main_network.ingest_addresses(addresses):
+            delivered.add("address")
+        if transfers and await main_network.ingest_transactions(transfers):
+            delivered.add("transfer")
     except Exception as e:
-        logger.error(f"Erreur lors du traitement et de l'envoi des données: {e}")
-        # Supprimer le fichier CSV temporaire en cas d'erreur
-        if csv_file:
-            delete_csv_file(csv_file)
-        return False
+        logger.error(f"Erreur lors du traitement des événements poussés: {e}")
+    finally:
+        seen_events.add_many(key for key, kind, _ in events if kind in delivered)
+        pending_events.difference_update(key for key, _, _ in events)
+        for kind in {kind for _, kind, _ in events} - delivered:
+            logger.warning(f"Événements poussés de type {kind} non livrés, reprise de la vérification périodique")
+            push_monitor.expire(kind)
 
-# Variable globale pour stocker le hash de la dernière transaction traitée
-last_transaction_hash = None
+async def load_address_cache(index):
+    """Complète l'index des adresses depuis le stockage local (alimenté par le leader)"""
+    loop = asyncio.get_running_loop()
+    address_store.refresh()
+    records = await loop.run_in_executor(None, lambda: address_store.get_addresses(min_id=index.last_id))
+    index.add(records)
 
-# Verrou pour éviter les problèmes de concurrence avec les transactions
-tx_lock = threading.Lock()
+async def load_transaction_cache(index):
+    """Complète l'index des transactions depuis l'API, jusqu'aux transactions déjà indexées"""
+    catch_up = TransactionCatchUp(main_network.fetch_transactions_data, index, concurrency=1)
+    new_transactions, new_keys = await catch_up.collect_new()
+    index.add(new_transactions, new_keys)
 
-async def process_and_send_transactions():
-    """Récupère les transactions, les formate et les envoie via Telegram"""
-    global last_transaction_hash
+# Caches des endpoints de consultation, alimentés par les pollers
+address_cache = QueryCache("addresses", AddressIndex(), load_address_cache)
+transaction_cache = QueryCache("transactions", TransactionIndex(), load_transaction_cache)
+
+# Ordonnanceur des vérifications périodiques (un flux par source de données), suspendues
+# pour le réseau principal tant que les événements arrivent par webhook
+scheduler = Scheduler()
+main_network.add_feeds(scheduler, skip={
+    FEED_ADDRESSES: lambda: push_monitor.is_active("address"),
+    FEED_TRANSACTIONS: lambda: push_monitor.is_active("transfer"),
+})
+
+# Réseaux BCReader supplémentaires (NETWORKS_FILE): leurs flux partagent la boucle, le client
+# HTTP et la file d'envoi Telegram, chacun avec son état et ses chats
+networks = load_networks(dispatcher, format_data, format_transactions, default_chat_ids=TELEGRAM_CHAT_ID)
+for network in networks:
+    network.add_feeds(scheduler)
+
+async def start_polling():
+    """Reprend l'état des pollers depuis le stockage partagé puis démarre la vérification périodique
     
-    try:
-        # Récupération des données de transactions
-        with tx_lock:
-            current_last_tx_hash = last_transaction_hash
-            
-        logger.info(f"Vérification des nouvelles transactions depuis le hash: {current_last_tx_hash}")
-        
-        # Même au premier démarrage, on vérifie les nouvelles transactions
-        logger.info("Vérification des nouvelles transactions, même au premier démarrage")
-        
-        # Récupération des données
-        transactions_data = await fetch_transactions_data(page=1, limit=20)
-        if not transactions_data or "error" in transactions_data:
-            logger.error("Aucune donnée de transaction reçue de l'API")
-            return False
-        
-        # Formatage du message avec filtrage par hash de transaction
-        message = format_transactions(transactions_data, current_last_tx_hash)
-        
-        # Envoi du message via Telegram seulement s'il y a de nouvelles transactions
-        if "Aucune nouvelle transaction" not in message:
-            # Envoyer le message
-            success = await send_telegram_message(message)
-            
-            # Mettre à jour le dernier hash de transaction traité seulement si l'envoi a réussi
-            if success and transactions_data["data"]:
-                # Prendre le hash de la première transaction (la plus récente) comme nouveau dernier hash
-                # Les transactions sont généralement triées par ordre chronologique inverse (la plus récente en premier)
-                first_tx = transactions_data["data"][0]
-                new_tx_hash = f"{first_tx['from']}_{first_tx['to']}_{first_tx['valueFormatted']}"
-                
-                with tx_lock:
-                    last_transaction_hash = new_tx_hash
-                logger.info(f"Dernier hash de transaction mis à jour: {last_transaction_hash}")
-                logger.info(f"Mémorisé pour éviter les doublons: {len(transactions_data['data'])} transactions traitées")
-                
-                return success
-            else:
-                logger.info("Aucune nouvelle transaction après filtrage ou échec d'envoi")
-                return False
-        else:
-            logger.info("Aucune nouvelle transaction à envoyer")
-            return True
-    except Exception as e:
-        logger.error(f"Erreur lors du traitement et de l'envoi des transactions: {e}")
-        return False
+    Appelé à chaque élection: l'instance précédemment leader a pu faire avancer les
+    curseurs et le stockage des adresses.
+    """
+    for network in [main_network] + networks:
+        network.resume()
+    
+    # Les safes déjà connus font partie de la liste de surveillance
+    for batch in address_store.iter_addresses():
+        watchlist.add_safes(batch)
+    
+    # Démarrer la vérification périodique de chaque flux sur la boucle de l'application
+    scheduler.start()
+    logger.info("Surveillance des nouvelles adresses ET transactions activée")
+
+async def stop_polling():
+    """Arrête la vérification périodique, vide les résumés en attente et rend la main sur l'archive"""
+    await scheduler.stop()
+    # Les notifications en attente de résumé partent avant de rendre la main
+    for network in [main_network] + networks:
+        await network.stop()
+    tx_archive.close()
+
+# Une seule instance (le leader) vérifie les sources et envoie les notifications
+leader = LeaderElection(on_elected=start_polling, on_demoted=stop_polling)
+
+def not_leader_response():
+    """Réponse des endpoints réservés au leader quand l'instance ne l'est pas"""
+    return JSONResponse(
+        {"error": "Instance non leader, réessayez plus tard", "leader": leader.status()["leader"]},
+        status_code=503, headers={"Retry-After": str(int(leader.heartbeat) or 1)}
+    )
 
 @app.get("/")
 async def root():
@@ -458,12 +276,18 @@ async def root():
 @app.get("/send-update")
 async def send_update(background_tasks: BackgroundTasks, min_id: int = None):
     """Déclenche l'envoi d'une mise à jour via Telegram"""
-    # Si min_id n'est pas spécifié, on utilisera le dernier ID traité dans process_and_send_data
-    background_tasks.add_task(process_and_send_data, min_id)
+    if not leader.is_leader:
+        return not_leader_response()
     
+    # Si min_id n'est pas spécifié, on rejoint la vérification périodique éventuellement en cours
     if min_id is None:
-        with id_lock:
-            current_id = last_processed_id
+        background_tasks.add_task(scheduler.trigger, "addresses")
+    else:
+        background_tasks.add_task(scheduler.run_exclusive, "addresses", min_id)
+    
+    if min_id is None:
+        with main_network.id_lock:
+            current_id = main_network.last_processed_id
         return {"message": f"Mise à jour en cours d'envoi (adresses avec ID > {current_id})"}    
     else:
         return {"message": f"Mise à jour en cours d'envoi (adresses avec ID > {min_id})"}
@@ -471,90 +295,320 @@ async def send_update(background_tasks: BackgroundTasks, min_id: int = None):
 @app.get("/send-transactions-update")
 async def send_transactions_update(background_tasks: BackgroundTasks):
     """Déclenche l'envoi d'une mise à jour des transactions via Telegram"""
-    background_tasks.add_task(process_and_send_transactions)
+    if not leader.is_leader:
+        return not_leader_response()
     
-    with tx_lock:
-        current_hash = last_transaction_hash
+    background_tasks.add_task(scheduler.trigger, "transactions")
     
-    if current_hash:
-        return {"message": f"Mise à jour des transactions en cours d'envoi (depuis le hash {current_hash[:15]}...)"}    
+    if len(main_network.seen_transactions):
+        return {"message": f"Mise à jour des transactions en cours d'envoi ({len(main_network.seen_transactions)} transactions déjà vues)"}
     else:
         return {"message": "Première mise à jour des transactions en cours d'envoi"}
 
+@app.post("/ingest", status_code=202)
+async def ingest_events(request: Request, background_tasks: BackgroundTasks):
+    """Reçoit un lot signé d'événements (adresses créées, transferts) poussé par un publieur
+    
+    La signature HMAC-SHA256 du corps est attendue dans l'en-tête X-Signature. Les
+    événements déjà livrés ou en cours de traitement (même clé d'idempotence) sont
+    ignorés. Tant que des événements d'un type arrivent, la vérification périodique de
+    ce type est suspendue; elle reprend d'elle-même après INGEST_FALLBACK_AFTER secondes
+    sans événement de ce type.
+    """
+    if not INGEST_SECRET:
+        return JSONResponse({"error": "Ingestion désactivée (INGEST_SECRET non configuré)"}, status_code=503)
+    if not leader.is_leader:
+        return not_leader_response()
+    
+    body = await request.body()
+    if not verify_signature(INGEST_SECRET, body, request.headers.get(SIGNATURE_HEADER)):
+        logger.warning("Lot d'événements rejeté: signature invalide")
+        return JSONResponse({"error": "Signature invalide"}, status_code=401)
+    
+    try:
+        events = parse_events(json.loads(body))
+    except ValueError as e:
+        return JSONResponse({"error": f"Lot invalide: {e}"}, status_code=400)
+    
+    # Déduplication par clé d'idempotence
+    fresh = []
+    for key, kind, record in events:
+        if key not in seen_events and key not in pending_events:
+            pending_events.add(key)
+            fresh.append((key, kind, record))
+    push_monitor.record(kind for _, kind, _ in events)
+    
+    if fresh:
+        background_tasks.add_task(process_pushed_events, fresh)
+    
+    logger.info("Lot d'événements reçu: %d nouveaux, %d doublons", len(fresh), len(events) - len(fresh))
+    return {"accepted": len(fresh), "duplicates": len(events) - len(fresh)}
+
+@app.get("/metrics")
+async def metrics():
+    """Métriques Prometheus du pipeline de notification"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/scheduler")
+async def scheduler_status():
+    """État des flux vérifiés périodiquement (intervalle courant et raison du dernier ajustement)"""
+    return scheduler.status()
+
+@app.get("/networks")
+async def networks_status():
+    """Réseaux supplémentaires surveillés: curseurs, chats et état des appels à leur API"""
+    return [network.status() for network in networks]
+
+@app.get("/live")
+async def live(request: Request, last_event_id: str = None):
+    """Flux Server-Sent Events des nouvelles adresses et transactions
+    
+    La reprise se fait par l'en-tête Last-Event-ID (envoyé par EventSource à la
+    reconnexion) ou le paramètre last_event_id. Seul le leader détecte et publie les
+    événements: les autres instances répondent 503.
+    """
+    if not leader.is_leader:
+        return not_leader_response()
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        live_feed.stream(resume_from), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/live/status")
+async def live_status():
+    """Abonnés du flux en direct et dernier événement publié"""
+    return live_feed.status()
+
+@app.get("/upstream")
+async def upstream_status():
+    """État des protections des appels à l'API BCReader (disjoncteur, budget de réessais, p95)"""
+    return main_network.upstream.status()
+
+@app.get("/leader")
+async def leader_status():
+    """Instance leader (seule à vérifier les sources et à envoyer les notifications)"""
+    return leader.status()
+
+@app.get("/subscriptions")
+async def list_subscriptions():
+    """Chats abonnés, leurs filtres et les messages en attente de nouvel essai par chat"""
+    return {
+        "subscriptions": [subscription.as_dict() for subscription in main_network.subscriptions.all()],
+        "pending_retries": main_network.fan_out.status(),
+    }
+
+@app.post("/subscriptions/reload")
+async def reload_subscriptions():
+    """Relit le fichier des abonnements"""
+    subscriptions = main_network.subscriptions
+    subscriptions.load()
+    return {"subscriptions": len(subscriptions), "filters": len(subscriptions.groups())}
+
+@app.get("/addresses")
+async def query_addresses(issuer: str = None, min_id: int = 0, prefix: str = None, limit: int = 100):
+    """Adresses connues, triées par ID, servies depuis le cache en mémoire"""
+    index = await address_cache.get()
+    items = index.query(issuer=issuer, min_id=min_id, prefix=prefix, limit=max(1, min(limit, QUERY_MAX_LIMIT)))
+    return {"count": len(items), "items": [item.as_dict() for item in items]}
+
+@app.get("/transactions")
+async def query_transactions(address: str = None, token: str = None, since: str = None, limit: int = 100):
+    """Transactions récentes (la plus récente d'abord), servies depuis le cache en mémoire"""
+    since_ts = parse_timestamp(since)
+    if since and since_ts is None:
+        return JSONResponse({"error": f"Paramètre since invalide: {since}"}, status_code=400)
+    index = await transaction_cache.get()
+    items = index.query(address=address, token=token, since=since_ts, limit=max(1, min(limit, QUERY_MAX_LIMIT)))
+    return {"count": len(items), "items": items}
+
+@app.get("/stats")
+async def transaction_stats(window: str = None, top: int = 10):
+    """Volumes par jeton et principaux émetteurs/destinataires sur 1 min, 1 h et 24 h
+    
+    Les agrégats sont tenus en mémoire par le leader, qui détecte les transactions: les
+    autres instances répondent 503.
+    """
+    if not leader.is_leader:
+        return not_leader_response()
+    if window and window not in WINDOWS:
+        return JSONResponse({"error": f"Fenêtre inconnue: {window} ({', '.join(WINDOWS)})"}, status_code=400)
+    return transaction_analytics.stats(window, top=max(1, min(top, QUERY_MAX_LIMIT)))
+
+@app.get("/digest")
+async def digest_status():
+    """Notifications en attente de résumé et résumés envoyés, par flux"""
+    return {FEED_ADDRESSES: main_network.address_digest.status(),
+            FEED_TRANSACTIONS: main_network.transaction_digest.status()}
+
+@app.get("/watchlist")
+async def watchlist_status():
+    """Adresses surveillées et nombre de safes détectés"""
+    return watchlist.status()
+
+@app.post("/watchlist/reload")
+async def reload_watchlist():
+    """Relit le fichier de la liste de surveillance"""
+    if not watchlist.load():
+        return JSONResponse({"error": "Lecture de la liste de surveillance impossible"}, status_code=500)
+    return {"addresses": watchlist.status()["addresses"]}
+
+@app.get("/export/transactions")
+async def export_transactions(start: str = Query(None, alias="from"), end: str = Query(None, alias="to"),
+                              address: str = None):
+    """Export NDJSON des transactions archivées d'une période, filtrées par adresse
+    
+    Seuls les segments et blocs de l'archive dont l'index peut correspondre sont lus.
+    """
+    start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+    if (start and start_ts is None) or (end and end_ts is None):
+        return JSONResponse({"error": "Paramètres from/to invalides (secondes epoch ou ISO 8601)"}, status_code=400)
+    
+    # Hors leader, l'index de l'archive est complété depuis les fichiers écrits par le leader
+    if not leader.is_leader:
+        await asyncio.get_running_loop().run_in_executor(None, tx_archive.refresh)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return StreamingResponse(
+        tx_archive.iter_ndjson(start_ts, end_ts, address), media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=transactions_{timestamp}.ndjson"}
+    )
+
+def iter_csv(min_id=None, issuer=None, compress=False):
+    """Génère le CSV des adresses par blocs, directement depuis le stockage local"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['id', 'address', 'issuer'])
+    
+    for batch in address_store.iter_addresses(min_id=min_id, issuer=issuer):
+        writer.writerows((item.id, item.address, item.issuer) for item in batch)
+        chunk = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        yield compressor.compress(chunk) if compressor else chunk
+    
+    chunk = buffer.getvalue().encode('utf-8')
+    if compressor:
+        yield compressor.compress(chunk) + compressor.flush()
+    elif chunk:
+        yield chunk
+
 @app.get("/get-csv")
-async def get_csv():
-    """Endpoint pour générer et télécharger un fichier CSV des données actuelles"""
+async def get_csv(request: Request, min_id: int = None, issuer: str = None):
+    """Endpoint pour télécharger un fichier CSV des adresses connues
+    
+    Le CSV est produit en flux depuis le stockage local, rafraîchi depuis l'API au plus
+    une fois par CSV_SNAPSHOT_TTL secondes. L'ETag permet de répondre 304 tant que
+    l'ensemble des adresses n'a pas changé.
+    """
     try:
-        # Récupération des données
-        data = await fetch_api_data()
-        if not data:
-            return Response(content="Aucune donnée disponible", media_type="text/plain")
-            
-        # Extraction des données pour CSV
-        csv_data = extract_data_for_csv(data)
-        if not csv_data:
-            return Response(content="Aucune donnée extraite pour le CSV", media_type="text/plain")
-        
-        # Génération du CSV avec keep_file=True pour conserver le fichier
-        csv_file = save_to_csv(csv_data, keep_file=True)
+        # Hors leader, le stockage partagé est tenu à jour par le leader
+        if not leader.is_leader:
+            address_store.refresh()
+        # Rafraîchissement du stockage local si l'instantané est trop ancien
+        elif main_network.synced_at is None or time.monotonic() - main_network.synced_at > CSV_SNAPSHOT_TTL:
+            if not await main_network.sync_addresses() and not address_store.count():
+                return Response(content="Aucune donnée disponible", media_type="text/plain")
         
-        if not csv_file:
-            return Response(content="Impossible de générer le fichier CSV", media_type="text/plain", status_code=500)
+        compress = "gzip" in request.headers.get("accept-encoding", "")
+        etag = f'"{address_store.high_water_mark}-{address_store.count()}{"-gz" if compress else ""}"'
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
         
-        # Lecture du contenu du fichier CSV
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            csv_content = f.read()
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
         
-        # Création de la réponse avec le contenu CSV
-        response = Response(content=csv_content)
-        response.headers["Content-Disposition"] = f"attachment; filename={os.path.basename(csv_file)}"
-        response.headers["Content-Type"] = "text/csv"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        headers["Content-Disposition"] = f"attachment; filename=bcreader_data_{timestamp}.csv"
+        if compress:
+            headers["Content-Encoding"] = "gzip"
         
-        return response
+        return StreamingResponse(iter_csv(min_id, issuer, compress), media_type="text/csv", headers=headers)
     except Exception as e:
         logger.error(f"Erreur lors de la génération du CSV: {e}")
         return Response(content=f"Erreur: {str(e)}", media_type="text/plain", status_code=500)
 
-def periodic_check():
-    """Fonction exécutée périodiquement pour vérifier les nouvelles adresses et transactions"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def admin_error(request):
+    """Réponse d'erreur si la requête ne porte pas le jeton d'administration, None sinon"""
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "Diagnostics désactivés (ADMIN_TOKEN non configuré)"}, status_code=503)
+    if not verify_admin_token(ADMIN_TOKEN, request.headers.get("Authorization")):
+        logger.warning("Accès aux diagnostics refusé: jeton d'administration invalide")
+        return JSONResponse({"error": "Jeton d'administration invalide"}, status_code=401,
+                            headers={"WWW-Authenticate": "Bearer"})
+    return None
+
+@app.get("/debug/profile")
+async def debug_profile(request: Request, seconds: float = 10, mode: str = "sampling",
+                        interval: float = PROFILE_SAMPLE_INTERVAL, top: int = 50):
+    """Profile l'application en cours d'exécution pendant `seconds` secondes
     
-    while True:
-        try:
-            # Vérification des nouvelles adresses
-            logger.info("Vérification périodique des nouvelles adresses...")
-            loop.run_until_complete(process_and_send_data())
-            
-            # Vérification des nouvelles transactions
-            logger.info("Vérification périodique des nouvelles transactions...")
-            loop.run_until_complete(process_and_send_transactions())
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la vérification périodique: {e}")
-        
-        # Attendre 60 secondes avant la prochaine vérification
-        time.sleep(60)
+    En mode sampling, les piles de tous les threads sont retournées au format replié
+    (flamegraph.pl, speedscope); en mode cprofile, les fonctions de la boucle asyncio
+    triées par temps cumulé.
+    """
+    error = admin_error(request)
+    if error is not None:
+        return error
+    if mode not in PROFILE_MODES:
+        return JSONResponse({"error": f"Mode inconnu, valeurs possibles: {', '.join(PROFILE_MODES)}"}, status_code=400)
+    try:
+        report = await diagnostics.profile(seconds, mode, interval, top=max(1, top))
+    except DiagnosticsBusyError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return PlainTextResponse(report)
+
+@app.post("/debug/memory/start")
+async def debug_memory_start(request: Request, frames: int = 1):
+    """Active le suivi des allocations (tracemalloc) et prend le relevé de référence"""
+    error = admin_error(request)
+    if error is not None:
+        return error
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, diagnostics.start_memory, max(1, min(frames, 50)))
+
+@app.get("/debug/memory")
+async def debug_memory(request: Request, group: str = "lineno", top: int = 20):
+    """Allocations qui ont grossi depuis le relevé précédent, et plus grosses allocations"""
+    error = admin_error(request)
+    if error is not None:
+        return error
+    if group not in MEMORY_GROUPS:
+        return JSONResponse({"error": f"Regroupement inconnu, valeurs possibles: {', '.join(MEMORY_GROUPS)}"},
+                            status_code=400)
+    loop = asyncio.get_running_loop()
+    report = await loop.run_in_executor(None, diagnostics.memory_diff, group, max(1, top))
+    if report is None:
+        return JSONResponse({"error": "Suivi mémoire inactif (POST /debug/memory/start)"}, status_code=409)
+    return report
+
+@app.post("/debug/memory/stop")
+async def debug_memory_stop(request: Request):
+    """Désactive le suivi des allocations"""
+    error = admin_error(request)
+    if error is not None:
+        return error
+    return diagnostics.stop_memory()
 
 @app.on_event("startup")
 async def startup_event():
     """Exécuté au démarrage de l'application"""
     logger.info("Application démarrée")
     
-    # Initialiser le dernier ID traité à une valeur qui permettra de détecter les nouvelles adresses
-    global last_processed_id, last_transaction_hash
-    last_processed_id = 0  # Valeur basse pour détecter les nouvelles adresses
-    logger.info(f"Dernier ID traité initialisé à: {last_processed_id}")
-    
-    # Initialiser le hash de la dernière transaction à None pour détecter les nouvelles transactions
-    last_transaction_hash = None
-    logger.info("Hash de la dernière transaction initialisé à None pour détecter les nouvelles transactions")
-    
-    # Démarrer la vérification périodique dans un thread séparé
-    thread = threading.Thread(target=periodic_check, daemon=True)
-    thread.start()
-    logger.info("Vérification périodique démarrée (toutes les 60 secondes)")
-    logger.info("Surveillance des nouvelles adresses ET transactions activée")
+    # Les pollers ne démarrent que sur l'instance élue leader; les autres servent l'API
+    await leader.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Exécuté à l'arrêt de l'application"""
+    await leader.stop()
+    await telegram_dispatcher.aclose()
+    await http_client.aclose()
+    for network in [main_network] + networks:
+        network.close()
+    leader.close()
+    logger.info("Application arrêtée")
 
 
 if __name__ == "__main__":
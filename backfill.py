@@ -0,0 +1,329 @@
+"""Chargement de l'historique complet des adresses et des transactions BCReader
+
+Les adresses sont lues en une réponse décodée au fil de l'eau et insérées par lots
+dans le stockage local. Les pages de /api/all-transactions sont récupérées en
+parallèle, à débit borné, puis écrites par lots dans l'archive des transactions. Un
+point de reprise est enregistré après chaque lot: une exécution interrompue reprend
+à la page suivant le dernier lot écrit.
+
+Le bail de leader est pris pendant le chargement, pour que l'archive n'ait qu'un seul
+écrivain: le chargement refuse de démarrer si une instance du service est leader.
+
+Les transactions déjà archivées par le service ne sont pas écrites une seconde fois:
+le chargement n'écrit que l'historique antérieur à la plus ancienne transaction de
+l'archive (relevée au premier lancement). Les transactions manquées pendant un arrêt
+du service, plus récentes, ne sont donc pas rattrapées.
+
+L'archive est en ajout seul: chaque lot y est écrit du plus ancien au plus récent, mais
+l'historique, chargé des pages récentes vers les anciennes, suit les transactions déjà
+archivées. L'archive n'est donc pas globalement chronologique; l'index temporel (bornes
+par bloc) garde les recherches par période exactes.
+
+Usage:
+    python backfill.py --concurrency 8 --rate 10 --page-size 100
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+import httpx
+import ijson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from logging_config import configure_logging, stop_logging
+from http_client import HttpClient
+from records import AddressPayloadNormalizer
+from address_store import AddressStore
+from checkpoint_store import CheckpointStore
+from transactions import SeenIndex, is_identified, transaction_key
+from leader import LeaderElection
+from resilience import CircuitOpenError, ResilientUpstream, raise_for_retryable_status
+from telegram_dispatcher import TokenBucket
+from tx_archive import TransactionArchive
+from query_cache import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+API_KEY = os.getenv("API_KEY")
+API_URL = os.getenv("API_URL")
+
+# Pages de transactions récupérées simultanément
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "8"))
+# Requêtes par seconde au plus vers l'API BCReader
+BACKFILL_RATE = float(os.getenv("BACKFILL_RATE", "10"))
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "100"))
+# Transactions écrites (et point de reprise enregistré) par lot
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))
+
+# Curseurs du chargement dans les points de reprise
+CURSOR_PAGE = "backfill:transactions:page"
+CURSOR_KEYS = "backfill:transactions:keys"
+CURSOR_DONE = "backfill:transactions:done"
+# Plus ancienne transaction de l'archive au premier lancement ("" une fois dépassée)
+CURSOR_ANCHOR = "backfill:transactions:anchor"
+
+
+class BackfillError(Exception):
+    """Le chargement ne peut pas continuer (le point de reprise reste sur le dernier lot écrit)"""
+
+
+class TransactionBackfill:
+    """Parcourt toutes les pages de transactions, de la plus récente à la plus ancienne
+
+    Des tâches concurrentes se partagent les numéros de page; les pages reçues dans le
+    désordre attendent que toutes les précédentes soient arrivées, puis sont écrites
+    par lots de `batch_size` transactions. La première page incomplète marque la fin
+    de l'historique. Les transactions qui précèdent (dans l'ordre de l'API) la plus
+    ancienne transaction déjà archivée, `anchor`, et cette transaction elle-même sont
+    écartées. Les transactions arrivées pendant le chargement décalent la
+    pagination: les doublons qui en résultent entre pages voisines sont écartés pour
+    les transactions identifiées (hash, ou bloc et index de log). Sans identifiant, un
+    doublon ne se distingue pas d'un transfert identique: les deux sont conservés.
+    """
+
+    def __init__(self, fetch_page, archive, checkpoints, page_size=BACKFILL_PAGE_SIZE,
+                 concurrency=BACKFILL_CONCURRENCY, rate=BACKFILL_RATE, batch_size=BACKFILL_BATCH_SIZE,
+                 max_pages=None):
+        self.fetch_page = fetch_page
+        self.archive = archive
+        self.checkpoints = checkpoints
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate)
+        self.batch_size = batch_size
+        self.max_pages = max_pages
+        # Clés des dernières transactions identifiées écrites, pour écarter les doublons dus au décalage
+        self.seen = SeenIndex(capacity=page_size * self.concurrency * 4)
+        self.written = 0
+        self.duplicates = 0
+        self.archived = 0
+        self.anchor = None
+        self._pages = {}
+        self._batch = []
+        self._next_page = 1
+        self._end_page = None
+        self._last_written = 0
+
+    def _resume(self):
+        self._last_written = int(self.checkpoints.get_cursor(CURSOR_PAGE, "0"))
+        self._next_page = self._last_written + 1
+        self.seen.add_many(json.loads(self.checkpoints.get_cursor(CURSOR_KEYS, "[]")))
+        if self._last_written:
+            anchor = self.checkpoints.get_cursor(CURSOR_ANCHOR, "")
+            self.anchor = json.loads(anchor) if anchor else None
+            logger.info(f"Reprise du chargement des transactions après la page {self._last_written}")
+        else:
+            self.anchor = self.archive.first()
+        if self.anchor is not None:
+            logger.info(f"Transactions déjà archivées écartées jusqu'à: {self.anchor}")
+
+    def _is_archived(self, tx):
+        """True si la transaction précède la plus ancienne transaction archivée ou est celle-ci"""
+        if self.anchor is None:
+            return False
+        if transaction_key(tx) == transaction_key(self.anchor):
+            self.anchor = None
+            return True
+        timestamp, anchor_timestamp = parse_timestamp(tx.get("timestamp")), parse_timestamp(self.anchor.get("timestamp"))
+        if timestamp is not None and anchor_timestamp is not None and timestamp < anchor_timestamp:
+            # Transaction plus ancienne que l'ancre: l'ancre n'apparaît plus dans l'historique
+            self.anchor = None
+            return False
+        return True
+
+    def _flush(self, page):
+        """Écrit le lot en attente et enregistre le point de reprise (pages <= page écrites)"""
+        if self._batch:
+            # Du plus ancien au plus récent dans le lot, comme les ajouts du service
+            self.archive.append(list(reversed(self._batch)))
+            self.written += len(self._batch)
+            self._batch = []
+        self.checkpoints.set_cursor(CURSOR_KEYS, json.dumps(self.seen.keys()))
+        self.checkpoints.set_cursor(CURSOR_ANCHOR, json.dumps(self.anchor) if self.anchor is not None else "")
+        self.checkpoints.set_cursor(CURSOR_PAGE, page)
+
+    def _drain(self):
+        """Ajoute au lot les pages reçues qui suivent sans trou la dernière page traitée"""
+        page = self._last_written + 1
+        while page in self._pages and (self._end_page is None or page <= self._end_page):
+            for tx in self._pages.pop(page):
+                if self._is_archived(tx):
+                    self.archived += 1
+                    continue
+                if is_identified(tx):
+                    key = transaction_key(tx)
+                    if key in self.seen:
+                        self.duplicates += 1
+                        continue
+                    self.seen.add_many([key])
+                self._batch.append(tx)
+            self._last_written = page
+            if len(self._batch) >= self.batch_size:
+                self._flush(page)
+                logger.info("Chargement: %d pages, %d transactions écrites", page, self.written,
+                            extra={"feed": "transactions", "page": page, "count": self.written})
+            page += 1
+
+    def _last_page(self):
+        if self.max_pages is None:
+            return self._end_page
+        return min(self.max_pages, self._end_page or self.max_pages)
+
+    async def _worker(self):
+        while True:
+            last_page = self._last_page()
+            if last_page is not None and self._next_page > last_page:
+                return
+            page = self._next_page
+            self._next_page += 1
+            await self.bucket.acquire()
+            result = await self.fetch_page(page, self.page_size)
+            transactions = result.get("data") or []
+            if len(transactions) < self.page_size:
+                self._end_page = page if self._end_page is None else min(self._end_page, page)
+            self._pages[page] = transactions
+            self._drain()
+
+    async def run(self, restart=False):
+        """Charge l'historique; retourne le nombre de transactions écrites par cette exécution"""
+        if restart:
+            for name, value in ((CURSOR_PAGE, 0), (CURSOR_KEYS, "[]"), (CURSOR_DONE, ""), (CURSOR_ANCHOR, "")):
+                self.checkpoints.set_cursor(name, value)
+        if self.checkpoints.get_cursor(CURSOR_DONE):
+            logger.info("Historique des transactions déjà chargé (--restart pour recommencer)")
+            return 0
+        self._resume()
+
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Les pages complètes déjà reçues sont écrites même si le chargement s'interrompt
+            self._flush(self._last_written)
+
+        if self._end_page is not None:
+            self.checkpoints.set_cursor(CURSOR_DONE, "1")
+            if self.anchor is not None:
+                logger.warning("La plus ancienne transaction de l'archive n'a pas été retrouvée dans l'historique: "
+                               "aucune transaction écrite")
+        logger.info(f"Chargement des transactions terminé: {self._last_written} pages, {self.written} "
+                    f"transactions écrites, {self.archived} déjà archivées, {self.duplicates} doublons écartés")
+        return self.written
+
+
+async def backfill_addresses(client, upstream, store, batch_size=BACKFILL_BATCH_SIZE):
+    """Insère par lots toutes les adresses d'ID supérieur au plus grand ID connu
+
+    Le stockage sert de point de reprise: une nouvelle exécution ne réinsère que les
+    adresses au-delà du plus grand ID déjà enregistré.
+    """
+    normalizer = AddressPayloadNormalizer()
+    min_id = store.high_water_mark
+    headers = {"accept": "application/json", "x-api-key": API_KEY}
+
+    async def download():
+        async with client.stream("GET", f"{API_URL}/api/config/addresses", headers=headers) as response:
+            raise_for_retryable_status(response)
+            response.raise_for_status()
+            return [record async for record in normalizer.iter_records(response.aiter_bytes()) if record.id > min_id]
+
+    records = await upstream.call(download, hedge=False)
+    records.sort(key=lambda record: record.id)
+    inserted = 0
+    for start in range(0, len(records), batch_size):
+        inserted += store.add_new(records[start:start + batch_size])
+    logger.info(f"Chargement des adresses terminé: {normalizer.last_count} lues, {inserted} nouvelles")
+    return inserted
+
+
+async def run(args):
+    client = HttpClient(max_concurrency_per_host=args.concurrency)
+    upstream = ResilientUpstream()
+    headers = {"accept": "application/json", "x-api-key": API_KEY}
+
+    async def fetch_page(page, limit):
+        async def request_page():
+            response = await client.get(f"{API_URL}/api/all-transactions",
+                                        params={"page": page, "limit": limit}, headers=headers)
+            raise_for_retryable_status(response)
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            return await upstream.call(request_page)
+        except (httpx.HTTPError, ValueError, asyncio.TimeoutError, CircuitOpenError) as e:
+            raise BackfillError(f"Page {page} des transactions indisponible: {e}") from e
+
+    leader = LeaderElection()
+    if leader.enabled and not await asyncio.get_running_loop().run_in_executor(None, leader.try_acquire):
+        leader.close()
+        raise BackfillError(f"Le bail de leader est détenu par {leader.lease_holder()}: "
+                            f"arrêtez le service avant de charger l'historique")
+    await leader.start()
+
+    archive = TransactionArchive()
+    checkpoints = CheckpointStore()
+    store = AddressStore()
+    started = time.monotonic()
+    try:
+        if not args.skip_addresses:
+            try:
+                await backfill_addresses(client, upstream, store, args.batch_size)
+            except (httpx.HTTPError, ijson.JSONError, ValueError, asyncio.TimeoutError, CircuitOpenError) as e:
+                raise BackfillError(f"Chargement des adresses impossible: {e}") from e
+        if not args.skip_transactions:
+            backfill = TransactionBackfill(
+                fetch_page, archive, checkpoints, page_size=args.page_size, concurrency=args.concurrency,
+                rate=args.rate, batch_size=args.batch_size, max_pages=args.max_pages
+            )
+            await backfill.run(restart=args.restart)
+    finally:
+        archive.close()
+        checkpoints.close()
+        store.close()
+        await leader.stop()
+        leader.close()
+        await client.aclose()
+        logger.info(f"Chargement de l'historique: {time.monotonic() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge l'historique des adresses et des transactions BCReader")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY, help="Pages récupérées simultanément")
+    parser.add_argument("--rate", type=float, default=BACKFILL_RATE, help="Requêtes par seconde au plus")
+    parser.add_argument("--page-size", type=int, default=BACKFILL_PAGE_SIZE, help="Transactions par page")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE,
+                        help="Enregistrements écrits par lot (et entre deux points de reprise)")
+    parser.add_argument("--max-pages", type=int, default=None, help="Nombre maximal de pages de transactions")
+    parser.add_argument("--restart", action="store_true", help="Ignore le point de reprise des transactions")
+    parser.add_argument("--skip-addresses", action="store_true", help="Ne charge pas les adresses")
+    parser.add_argument("--skip-transactions", action="store_true", help="Ne charge pas les transactions")
+    args = parser.parse_args()
+
+    configure_logging()
+    if not API_URL or not API_KEY:
+        logger.error("API_URL et API_KEY doivent être définis")
+        sys.exit(1)
+    try:
+        asyncio.run(run(args))
+    except BackfillError as e:
+        logger.error(f"Chargement interrompu: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        logger.warning("Chargement interrompu, reprise possible au prochain lancement")
+        sys.exit(1)
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
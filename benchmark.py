@@ -0,0 +1,340 @@
+"""Banc d'essai de bout en bout du pipeline de notification
+
+Démarre un serveur local qui simule l'API BCReader et l'API Telegram (latence, taux
+d'erreur et volume configurables), fait tourner le vrai pipeline de app.py contre ce
+serveur, puis mesure le débit, les latences détection → livraison (p50/p99) et la
+mémoire résidente maximale. Chaque scénario s'exécute dans un processus séparé pour
+que les mesures mémoire ne se mélangent pas.
+
+Usage:
+    python benchmark.py --sizes 1000,100000 --burst-addresses 200 --burst-transactions 200
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+
+BENCH_TOKEN = "bench-token"
+BENCH_CHAT_ID = "1"
+BENCH_ISSUER = "BenchIssuer"
+BENCH_TOKEN_SYMBOL = "BENCH"
+
+ADDRESS_ID_PATTERN = re.compile(r"ID: (\d+)")
+TX_VALUE_PATTERN = re.compile(r"Montant: (\d+) " + BENCH_TOKEN_SYMBOL)
+
+
+def create_mock_app(initial_addresses, latency, error_rate):
+    """Application simulant BCReader (/api/...) et Telegram (/bot<token>/sendMessage)"""
+    from fastapi import FastAPI, Request, Response
+    from fastapi.responses import JSONResponse
+
+    mock = FastAPI()
+    state = {
+        "addresses": [
+            {"id": i, "address": f"0x{i:040x}", "issuer": BENCH_ISSUER} for i in range(1, initial_addresses + 1)
+        ],
+        # Historique initial de transactions, pour que le pipeline ait des transactions déjà vues
+        "transactions": [
+            {"from": f"0x{seq:040x}", "to": f"0x{seq + 1:040x}",
+             "valueFormatted": str(seq), "tokenSymbol": BENCH_TOKEN_SYMBOL}
+            for seq in range(1, 21)
+        ],
+        "created": {},
+        "delivered": {},
+        "version": 0,
+        "payload": None,
+        "requests": 0,
+        "errors": 0,
+        "messages": 0,
+    }
+
+    def address_payload():
+        # Le corps JSON est mis en cache entre deux rafales, comme un serveur réel
+        if state["payload"] is None:
+            state["payload"] = json.dumps(state["addresses"]).encode("utf-8")
+        return state["payload"]
+
+    async def simulate_upstream():
+        state["requests"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            state["errors"] += 1
+            return JSONResponse({"error": "erreur simulée"}, status_code=503)
+        return None
+
+    @mock.get("/api/config/addresses")
+    async def addresses(request: Request):
+        error = await simulate_upstream()
+        if error is not None:
+            return error
+        etag = f'"v{state["version"]}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=address_payload(), media_type="application/json", headers={"ETag": etag})
+
+    @mock.get("/api/all-transactions")
+    async def transactions(page: int = 1, limit: int = 20):
+        error = await simulate_upstream()
+        if error is not None:
+            return error
+        # Les transactions les plus récentes en premier
+        ordered = state["transactions"][::-1]
+        return {"data": ordered[(page - 1) * limit:page * limit]}
+
+    @mock.post(f"/bot{BENCH_TOKEN}/sendMessage")
+    async def send_message(request: Request):
+        payload = await request.json()
+        now = time.time()
+        state["messages"] += 1
+        text = payload.get("text", "")
+        for address_id in ADDRESS_ID_PATTERN.findall(text):
+            state["delivered"].setdefault(f"a{address_id}", now)
+        for value in TX_VALUE_PATTERN.findall(text):
+            state["delivered"].setdefault(f"t{value}", now)
+        return {"ok": True, "result": {}}
+
+    @mock.post("/_bench/burst")
+    async def burst(addresses: int = 0, transactions: int = 0):
+        now = time.time()
+        next_id = len(state["addresses"]) + 1
+        for address_id in range(next_id, next_id + addresses):
+            state["addresses"].append({"id": address_id, "address": f"0x{address_id:040x}", "issuer": BENCH_ISSUER})
+            state["created"][f"a{address_id}"] = now
+        next_tx = len(state["transactions"]) + 1
+        for seq in range(next_tx, next_tx + transactions):
+            state["transactions"].append({
+                "from": f"0x{seq:040x}", "to": f"0x{seq + 1:040x}",
+                "valueFormatted": str(seq), "tokenSymbol": BENCH_TOKEN_SYMBOL,
+            })
+            state["created"][f"t{seq}"] = now
+        if addresses:
+            state["version"] += 1
+            state["payload"] = None
+        return {"addresses": len(state["addresses"]), "transactions": len(state["transactions"])}
+
+    @mock.post("/_bench/reset")
+    async def reset():
+        state["created"].clear()
+        state["delivered"].clear()
+        state["requests"] = state["errors"] = state["messages"] = 0
+        return {"ok": True}
+
+    @mock.get("/_bench/results")
+    async def results():
+        latencies = [
+            state["delivered"][key] - created
+            for key, created in state["created"].items() if key in state["delivered"]
+        ]
+        deliveries = [state["delivered"][key] for key in state["created"] if key in state["delivered"]]
+        return {
+            "expected": len(state["created"]),
+            "delivered": len(latencies),
+            "latencies": latencies,
+            "first_created": min(state["created"].values(), default=None),
+            "last_delivered": max(deliveries, default=None),
+            "upstream_requests": state["requests"],
+            "upstream_errors": state["errors"],
+            "telegram_messages": state["messages"],
+        }
+
+    return mock
+
+
+def serve_mock(port, initial_addresses, latency, error_rate):
+    """Point d'entrée du processus du serveur simulé"""
+    import uvicorn
+    uvicorn.run(create_mock_app(initial_addresses, latency, error_rate),
+                host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_pipeline(mock_url, data_dir, scenario, result_queue):
+    """Point d'entrée du processus qui fait tourner le vrai pipeline de app.py"""
+    import resource
+
+    os.environ.update({
+        "API_URL": mock_url,
+        "API_KEY": "bench",
+        "TELEGRAM_API_BASE": mock_url,
+        "TELEGRAM_BOT_TOKEN": BENCH_TOKEN,
+        "TELEGRAM_CHAT_ID": BENCH_CHAT_ID,
+        "DATA_DIR": data_dir,
+        "ADDRESS_POLL_INTERVAL": str(scenario["poll_interval"]),
+        "TX_POLL_INTERVAL": str(scenario["poll_interval"]),
+        "POLL_MIN_INTERVAL": str(scenario["poll_interval"] / 2),
+        "POLL_MAX_INTERVAL": str(scenario["poll_interval"] * 2),
+        "TELEGRAM_CHAT_RATE": str(scenario["telegram_rate"]),
+        "TELEGRAM_GLOBAL_RATE": str(scenario["telegram_rate"]),
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import httpx
+    import app as bot
+
+    async def wait_until(predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if await predicate():
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    async def main():
+        async with httpx.AsyncClient(base_url=mock_url, timeout=60) as control:
+            started = time.perf_counter()
+            await bot.startup_event()
+
+            # Premier cycle: synchronisation initiale des adresses existantes (non envoyées,
+            # le suivi commence au plus grand ID connu)
+            async def warmed_up():
+                return all(feed.runs >= 1 for feed in bot.scheduler.feeds.values())
+            await wait_until(warmed_up, scenario["timeout"])
+            initial_sync = time.perf_counter() - started
+            await control.post("/_bench/reset")
+
+            # Rafale de nouvelles adresses et transactions
+            await control.post("/_bench/burst", params={
+                "addresses": scenario["burst_addresses"],
+                "transactions": scenario["burst_transactions"],
+            })
+
+            async def all_delivered():
+                results = (await control.get("/_bench/results")).json()
+                return results["delivered"] >= results["expected"]
+            completed = await wait_until(all_delivered, scenario["timeout"])
+            results = (await control.get("/_bench/results")).json()
+
+            await bot.shutdown_event()
+
+        latencies = results.pop("latencies")
+        duration = None
+        if results["first_created"] and results["last_delivered"]:
+            duration = results["last_delivered"] - results["first_created"]
+        result_queue.put({
+            "completed": completed,
+            "initial_sync_seconds": initial_sync,
+            "delivered": results["delivered"],
+            "expected": results["expected"],
+            "throughput_per_second": results["delivered"] / duration if duration else None,
+            "latency_p50_seconds": percentile(latencies, 0.50),
+            "latency_p99_seconds": percentile(latencies, 0.99),
+            "upstream_requests": results["upstream_requests"],
+            "upstream_errors": results["upstream_errors"],
+            "telegram_messages": results["telegram_messages"],
+            # ru_maxrss est exprimé en kilo-octets sous Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        })
+
+    asyncio.run(main())
+
+
+def run_scenario(scenario):
+    """Exécute un scénario: serveur simulé et pipeline dans deux processus séparés"""
+    context = multiprocessing.get_context("spawn")
+    port = free_port()
+    mock_url = f"http://127.0.0.1:{port}"
+    server = context.Process(
+        target=serve_mock,
+        args=(port, scenario["initial_addresses"], scenario["latency"], scenario["error_rate"]),
+        daemon=True,
+    )
+    server.start()
+    try:
+        # Attente du démarrage du serveur simulé
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    break
+            except OSError:
+                time.sleep(0.1)
+
+        result_queue = context.Queue()
+        with tempfile.TemporaryDirectory() as data_dir:
+            pipeline = context.Process(target=run_pipeline, args=(mock_url, data_dir, scenario, result_queue))
+            pipeline.start()
+            result = result_queue.get(timeout=scenario["timeout"] * 2 + 60)
+            pipeline.join()
+        return result
+    finally:
+        server.terminate()
+        server.join()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du pipeline BCReader -> Telegram")
+    parser.add_argument("--sizes", default="1000,100000",
+                        help="Nombres d'adresses existantes, séparés par des virgules (ex: 1000,100000,1000000)")
+    parser.add_argument("--burst-addresses", type=int, default=200, help="Nouvelles adresses par rafale")
+    parser.add_argument("--burst-transactions", type=int, default=200, help="Nouvelles transactions par rafale")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence simulée de l'API amont (secondes)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses amont en erreur")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Intervalle de vérification (secondes)")
+    parser.add_argument("--telegram-rate", type=float, default=1000, help="Débit Telegram autorisé (messages/s)")
+    parser.add_argument("--timeout", type=float, default=120, help="Durée maximale d'un scénario (secondes)")
+    parser.add_argument("--output", default="benchmark_results.jsonl",
+                        help="Fichier JSON Lines auquel les résultats sont ajoutés")
+    args = parser.parse_args()
+
+    run = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "scenarios": [],
+    }
+    for size in (int(value) for value in args.sizes.split(",") if value):
+        scenario = {
+            "initial_addresses": size,
+            "burst_addresses": args.burst_addresses,
+            "burst_transactions": args.burst_transactions,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "poll_interval": args.poll_interval,
+            "telegram_rate": args.telegram_rate,
+            "timeout": args.timeout,
+        }
+        print(f"Scénario: {size} adresses existantes, rafale de {args.burst_addresses} adresses "
+              f"et {args.burst_transactions} transactions...")
+        result = run_scenario(scenario)
+        print(json.dumps(result, indent=2))
+        run["scenarios"].append({"scenario": scenario, "result": result})
+
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    print(f"Résultats ajoutés à {args.output}")
+
+
+if __name__ == "__main__":
+    main()
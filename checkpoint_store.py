@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import logging
+import threading
+
+from address_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Nombre de clés de transactions vues conservées sur disque
+CHECKPOINT_SEEN_CAPACITY = int(os.getenv("CHECKPOINT_SEEN_CAPACITY", os.getenv("TX_SEEN_CAPACITY", "10000")))
+
+
+class CheckpointStore:
+    """Points de reprise des pollers (curseurs et transactions vues) dans SQLite
+
+    La base est en mode WAL avec synchronous=NORMAL: chaque validation est atomique et
+    survit à un arrêt brutal du processus, tandis que les fsync sont regroupés au moment
+    des checkpoints du journal plutôt qu'à chaque écriture.
+    """
+
+    def __init__(self, path=None, seen_capacity=CHECKPOINT_SEEN_CAPACITY):
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, "checkpoints.db")
+        self.path = path
+        self.seen_capacity = seen_capacity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_transactions ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE)"
+            )
+        logger.info(f"Points de reprise ouverts: {path}")
+
+    def get_cursor(self, name, default=None):
+        """Retourne la valeur mémorisée d'un curseur, ou default s'il n'existe pas"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_cursor(self, name, value):
+        """Mémorise la valeur d'un curseur (écriture atomique)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cursors (name, value) VALUES (?, ?)", (name, str(value))
+            )
+
+    def load_seen(self):
+        """Retourne les clés de transactions vues, de la plus ancienne à la plus récente"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM seen_transactions ORDER BY seq DESC LIMIT ?", (self.seen_capacity,)
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def add_seen(self, keys):
+        """Ajoute des clés vues en une seule transaction et purge les plus anciennes"""
+        if not keys:
+            return
+        with self._lock, self._conn:
+            # Une clé revue est déplacée en fin de liste, comme dans l'index LRU en mémoire
+            self._conn.executemany("DELETE FROM seen_transactions WHERE key = ?", ((key,) for key in keys))
+            self._conn.executemany("INSERT INTO seen_transactions (key) VALUES (?)", ((key,) for key in keys))
+            self._conn.execute(
+                "DELETE FROM seen_transactions WHERE seq <= (SELECT MAX(seq) FROM seen_transactions) - ?",
+                (self.seen_capacity,)
+            )
+
+    def clear(self):
+        """Efface tous les points de reprise"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cursors")
+            self._conn.execute("DELETE FROM seen_transactions")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,193 @@
+import os
+import io
+import sys
+import hmac
+import time
+import pstats
+import asyncio
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Jeton des endpoints de diagnostic (en-tête "Authorization: Bearer <jeton>"); sans jeton, ils sont désactivés
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Durée maximale (secondes) d'un profilage
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Intervalle (secondes) entre deux échantillons du profilage par échantillonnage
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+PROFILE_MODES = ("sampling", "cprofile")
+MEMORY_GROUPS = ("lineno", "filename", "traceback")
+
+
+class DiagnosticsBusyError(Exception):
+    """Un profilage est déjà en cours"""
+
+
+def verify_admin_token(token, authorization):
+    """Vérifie l'en-tête Authorization (schéma Bearer) en temps constant"""
+    if not token or not authorization:
+        return False
+    scheme, _, value = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(value.strip().encode("utf-8"), token.encode("utf-8"))
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def sample_stacks(seconds, interval=PROFILE_SAMPLE_INTERVAL):
+    """Échantillonne les piles de tous les threads (sauf celui-ci) pendant `seconds` secondes
+
+    Fonction bloquante, à exécuter dans un thread dédié: les threads observés ne sont
+    pas ralentis en dehors de la lecture de leurs piles.
+
+    Returns:
+        (Counter des piles repliées "thread;fichier:fonction;..." , nombre d'échantillons)
+    """
+    own = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(labels))] += 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+class Diagnostics:
+    """Profilage à la demande de l'application en cours d'exécution
+
+    - échantillonnage: les piles de tous les threads sont relevées à intervalle régulier
+      depuis un thread dédié, puis rendues au format replié (une pile par ligne suivie
+      de son nombre d'échantillons, lisible par flamegraph.pl ou speedscope);
+    - cProfile: toutes les fonctions exécutées par la boucle asyncio sont tracées pendant
+      la durée demandée (surcoût important, mais temps cumulés exacts);
+    - mémoire: tracemalloc n'est activé qu'à la demande; chaque relevé est comparé au
+      précédent pour faire apparaître les lignes dont les allocations grossissent.
+
+    Aucun de ces outils ne coûte quoi que ce soit tant qu'il n'est pas utilisé.
+    """
+
+    def __init__(self, max_seconds=PROFILE_MAX_SECONDS):
+        self.max_seconds = max_seconds
+        self.profiling = None
+        self._snapshot = None
+
+    async def profile(self, seconds, mode="sampling", interval=PROFILE_SAMPLE_INTERVAL, top=50):
+        """Profile l'application pendant `seconds` secondes et retourne le rapport texte"""
+        if self.profiling is not None:
+            raise DiagnosticsBusyError(f"Profilage {self.profiling} déjà en cours")
+        seconds = max(0.1, min(seconds, self.max_seconds))
+        self.profiling = mode
+        logger.info(f"Profilage {mode} démarré pour {seconds:.1f}s")
+        try:
+            if mode == "cprofile":
+                return await self._cprofile(seconds, top)
+            return await self._sampling(seconds, max(0.001, interval))
+        finally:
+            self.profiling = None
+
+    async def _sampling(self, seconds, interval):
+        loop = asyncio.get_running_loop()
+        # Thread dédié: le pool d'exécution par défaut peut être occupé par l'application
+        result = loop.create_future()
+
+        def run():
+            try:
+                value = sample_stacks(seconds, interval)
+            except Exception as e:
+                loop.call_soon_threadsafe(result.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(result.set_result, value)
+
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+        stacks, samples = await result
+        lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+        logger.info(f"Profilage par échantillonnage terminé: {samples} échantillons, {len(stacks)} piles")
+        return "\n".join(lines) + "\n"
+
+    async def _cprofile(self, seconds, top):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        return stream.getvalue()
+
+    def start_memory(self, frames=1):
+        """Active tracemalloc (`frames` niveaux de pile par allocation) et prend le relevé de référence"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(max(1, frames))
+        self._snapshot = self._take_snapshot()
+        logger.info(f"Suivi des allocations mémoire activé ({frames} niveaux de pile)")
+        return self.memory_status()
+
+    def stop_memory(self):
+        tracemalloc.stop()
+        self._snapshot = None
+        logger.info("Suivi des allocations mémoire désactivé")
+        return self.memory_status()
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def memory_diff(self, group="lineno", top=20):
+        """Relevé des allocations comparé au précédent (le nouveau relevé devient la référence)"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = self._take_snapshot()
+        previous, self._snapshot = self._snapshot, snapshot
+        differences = snapshot.compare_to(previous, group) if previous is not None else []
+        return {
+            **self.memory_status(),
+            "growth": [
+                {
+                    "location": str(stat.traceback) if group != "traceback"
+                    else [line.strip() for line in stat.traceback.format()],
+                    "size": stat.size,
+                    "size_diff": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in differences[:top]
+            ],
+            "largest": [
+                {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+
+    def memory_status(self):
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else None,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+        }
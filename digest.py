@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+import logging
+from collections import Counter
+
+from query_cache import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Fenêtre (secondes) de regroupement des notifications d'un flux (0: envoi immédiat)
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "0"))
+# Éléments en attente à partir desquels le résumé part sans attendre la fin de la fenêtre
+DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", "100"))
+# Lignes détaillées d'un résumé (au-delà, un envoi regroupé est résumé)
+DIGEST_TOP = int(os.getenv("DIGEST_TOP", "10"))
+# Adresse publique de l'API, pour le lien vers la liste complète dans les résumés
+PUBLIC_URL = os.getenv("PUBLIC_URL", "").rstrip("/")
+
+
+def _amount(tx):
+    try:
+        return float(tx.get("valueFormatted"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _format_amount(value):
+    return f"{value:,.2f}".replace(",", " ")
+
+
+class Digest:
+    """Regroupe les éléments détectés d'un flux pour les envoyer en un seul message
+
+    Le premier élément mis en attente ouvre une fenêtre de `window` secondes; à son
+    terme, ou dès que `threshold` éléments attendent, tout le lot est transmis à `send`
+    (coroutine `send(items, keys, detected_at)` qui retourne True si l'envoi a réussi).
+    Un lot non livré est remis en attente pour la fenêtre suivante. `run` exécute la
+    vidange déclenchée par la fin de la fenêtre (par exemple sous le verrou du flux).
+    """
+
+    def __init__(self, name, send, window=DIGEST_WINDOW, threshold=DIGEST_THRESHOLD, run=None):
+        self.name = name
+        self.send = send
+        self.window = window
+        self.threshold = max(1, threshold)
+        self.run = run
+        self.items = []
+        self.keys = []
+        # Instant de détection (horloge monotone) et date du plus ancien élément en attente
+        self.detected_at = None
+        self.opened_at = None
+        self.digests = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self._timer = None
+        self._task = None
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, items, keys=None, detected_at=None):
+        """Met des éléments en attente (et ouvre la fenêtre si aucun n'attendait)"""
+        if not items:
+            return
+        self.items.extend(items)
+        self.keys.extend(keys or ())
+        if self.detected_at is None:
+            self.detected_at = detected_at or time.monotonic()
+            self.opened_at = time.time()
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._expire)
+
+    def is_due(self):
+        return len(self.items) >= self.threshold
+
+    def _expire(self):
+        self._timer = None
+        run = self.run or (lambda func: func())
+        self._task = asyncio.ensure_future(run(self.flush))
+
+    async def flush(self):
+        """Envoie le lot en attente; retourne False s'il n'a pas pu être livré"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.items:
+            return True
+        items, keys, detected_at, opened_at = self.items, self.keys, self.detected_at, self.opened_at
+        self.items, self.keys, self.detected_at, self.opened_at = [], [], None, None
+
+        try:
+            success = await self.send(items, keys, detected_at)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi du résumé {self.name}: {e}")
+            success = False
+        if success:
+            self.digests += 1
+            self.coalesced += len(items)
+            logger.info("Résumé %s envoyé: %d éléments regroupés", self.name, len(items),
+                        extra={"feed": self.name, "count": len(items)})
+            return True
+
+        # Remis en tête de l'attente, avec les éléments arrivés entre-temps
+        logger.warning(f"Échec d'envoi du résumé {self.name}, {len(items)} éléments remis en attente")
+        pending_items, pending_keys = self.items, self.keys
+        self.items, self.keys = items + pending_items, keys + pending_keys
+        self.detected_at, self.opened_at = detected_at, opened_at
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._expire)
+        return False
+
+    def close(self):
+        """Abandonne l'attente (les éléments non livrés ne sont pas mémorisés comme envoyés)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.items:
+            logger.warning(f"{len(self.items)} éléments du résumé {self.name} abandonnés")
+        self.items, self.keys, self.detected_at, self.opened_at = [], [], None, None
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "threshold": self.threshold,
+            "pending": len(self.items),
+            "pending_since": self.opened_at,
+            "digests_sent": self.digests,
+            "items_coalesced": self.coalesced,
+            "priority_bypassed": self.bypassed,
+        }
+
+
+def summarize_addresses(records, top=DIGEST_TOP):
+    """Résumé d'un lot de nouvelles adresses (AddressRecord triés par ID)"""
+    records = sorted(records, key=lambda record: record.id)
+    issuers = Counter(record.issuer or "?" for record in records)
+    message = f"📊 {len(records)} New Safes Deployed 📊\n\n"
+    message += f"🔢 IDs {records[0].id} → {records[-1].id}\n\n"
+    message += "🏢 Par émetteur:\n"
+    for issuer, count in issuers.most_common(top):
+        message += f"• {issuer}: {count}\n"
+    if len(issuers) > top:
+        message += f"• … et {len(issuers) - top} autres émetteurs\n"
+
+    message += "\n"
+    for record in records[:top]:
+        message += f"🔹 ID: {record.id} — {record.address}\n"
+    if len(records) > top:
+        message += f"… et {len(records) - top} autres adresses\n"
+
+    if PUBLIC_URL:
+        message += f"\n🔗 Liste complète: {PUBLIC_URL}/addresses?min_id={records[0].id - 1}&limit={len(records)}\n"
+    return message
+
+
+def summarize_transactions(transactions, top=DIGEST_TOP, since=None):
+    """Résumé d'un lot de transactions: volumes par jeton et plus gros montants
+
+    `since` (secondes epoch) sert de début au lien d'export pour les transactions sans
+    horodatage.
+    """
+    tokens = {}
+    for tx in transactions:
+        totals = tokens.setdefault(str(tx.get("tokenSymbol", "")), [0, 0.0])
+        totals[0] += 1
+        totals[1] += _amount(tx)
+
+    message = f"💰 {len(transactions)} Nouvelles Transactions 💰\n\n"
+    message += "💶 Par jeton:\n"
+    for token, (count, volume) in sorted(tokens.items(), key=lambda item: item[1][1], reverse=True):
+        message += f"• {token}: {count} transactions, {_format_amount(volume)}\n"
+
+    message += "\n🏆 Plus gros montants:\n"
+    for tx in sorted(transactions, key=_amount, reverse=True)[:top]:
+        message += f"🔹 {tx.get('from')} → {tx.get('to')}: {tx.get('valueFormatted')} {tx.get('tokenSymbol')}\n"
+    if len(transactions) > top:
+        message += f"… et {len(transactions) - top} autres transactions\n"
+
+    if PUBLIC_URL:
+        start = min((parse_timestamp(tx.get("timestamp")) or since or time.time()) for tx in transactions)
+        message += f"\n🔗 Liste complète: {PUBLIC_URL}/export/transactions?from={int(start) - 1}\n"
+    return message
@@ -0,0 +1,82 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Configuration du client HTTP partagé
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_MAX_CONCURRENCY_PER_HOST = int(os.getenv("HTTP_MAX_CONCURRENCY_PER_HOST", "5"))
+
+
+class HttpClient:
+    """Client HTTP asynchrone partagé par tous les appels sortants (BCReader, Telegram)
+
+    Les connexions sont conservées (keep-alive) dans un pool par hôte, HTTP/2 est
+    négocié quand le serveur le supporte et le nombre de requêtes simultanées
+    vers un même hôte est borné par un sémaphore.
+    """
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 max_connections=HTTP_MAX_CONNECTIONS, max_keepalive=HTTP_MAX_KEEPALIVE,
+                 max_concurrency_per_host=HTTP_MAX_CONCURRENCY_PER_HOST):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self._client = None
+        self._semaphores = {}
+
+    def _get_client(self):
+        """Crée le client au premier appel (il doit naître dans la boucle de l'application)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(http2=True, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def _get_semaphore(self, url):
+        """Retourne le sémaphore qui borne la concurrence vers l'hôte de l'URL"""
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency_per_host)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def request(self, method, url, **kwargs):
+        """Envoie une requête en respectant la limite de concurrence de l'hôte"""
+        async with self._get_semaphore(url):
+            return await self._get_client().request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Ouvre une réponse lue au fil de l'eau (le créneau de concurrence est tenu jusqu'à la fin)"""
+        async with self._get_semaphore(url):
+            async with self._get_client().stream(method, url, **kwargs) as response:
+                yield response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        """Ferme les connexions du pool"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Client HTTP fermé")
+        self._client = None
+        self._semaphores = {}
+
+
+# Instance partagée par toute l'application
+http_client = HttpClient()
@@ -0,0 +1,140 @@
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import logging
+
+from records import AddressRecord
+
+logger = logging.getLogger(__name__)
+
+# Configuration de l'ingestion par webhook
+INGEST_SECRET = os.getenv("INGEST_SECRET")
+# Délai sans événement poussé au-delà duquel la vérification périodique reprend
+INGEST_FALLBACK_AFTER = float(os.getenv("INGEST_FALLBACK_AFTER", "300"))
+
+# En-tête portant la signature HMAC-SHA256 du corps de la requête
+SIGNATURE_HEADER = "X-Signature"
+
+ADDRESS_EVENT_TYPES = ("address_created", "address.created")
+TRANSFER_EVENT_TYPES = ("transfer",)
+
+
+def sign_payload(secret, body):
+    """Calcule la signature d'un corps de requête (format "sha256=<hex>")"""
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret, body, signature):
+    """Vérifie la signature HMAC d'un lot d'événements en temps constant"""
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign_payload(secret, body), signature.strip())
+
+
+def event_key(event):
+    """Clé d'idempotence d'un événement: son champ id, sinon l'empreinte de son contenu"""
+    if event.get("id"):
+        return f"evt:{event['id']}"
+    content = json.dumps(event, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return f"evt:{hashlib.sha256(content).hexdigest()}"
+
+
+def parse_events(batch):
+    """Valide un lot d'événements
+
+    Returns:
+        Une liste de tuples (clé d'idempotence, type, données) où le type vaut
+        "address" (données AddressRecord) ou "transfer"
+    """
+    events = batch.get("events") if isinstance(batch, dict) else batch
+    if not isinstance(events, list):
+        raise ValueError("Le lot doit contenir une liste 'events'")
+
+    parsed = []
+    for event in events:
+        if not isinstance(event, dict) or not isinstance(event.get("data"), dict):
+            logger.warning(f"Événement ignoré, format invalide: {event}")
+            continue
+        data = event["data"]
+        if event.get("type") in ADDRESS_EVENT_TYPES and all(k in data for k in ["id", "address"]):
+            try:
+                record = AddressRecord(data["id"], data["address"], data.get("issuer", ""))
+            except (TypeError, ValueError):
+                logger.warning(f"Événement ignoré, ID d'adresse invalide: {data['id']}")
+                continue
+            parsed.append((event_key(event), "address", record))
+        elif event.get("type") in TRANSFER_EVENT_TYPES and all(k in data for k in ["from", "to"]):
+            parsed.append((event_key(event), "transfer", data))
+        else:
+            logger.warning(f"Événement ignoré, type ou données non reconnus: {event.get('type')}")
+    return parsed
+
+
+class PushMonitor:
+    """Suit l'arrivée des événements poussés, par type, pour savoir quelle vérification
+    périodique est encore utile
+
+    Des transferts poussés ne suspendent que la vérification des transactions, des
+    adresses poussées que celle des adresses.
+    """
+
+    def __init__(self, fallback_after=INGEST_FALLBACK_AFTER):
+        self.fallback_after = fallback_after
+        # Type d'événement ("address", "transfer") -> instant (horloge monotone) du dernier envoi
+        self.last_push = {}
+        self.received = 0
+
+    def record(self, kinds):
+        """Note l'arrivée d'événements (un type par événement)"""
+        now = time.monotonic()
+        for kind in kinds:
+            self.last_push[kind] = now
+            self.received += 1
+
+    def expire(self, kind):
+        """Reprend aussitôt la vérification périodique d'un type (événements non livrés)"""
+        self.last_push.pop(kind, None)
+
+    def is_active(self, kind):
+        """True si des événements de ce type ont été poussés récemment"""
+        last_push = self.last_push.get(kind)
+        return last_push is not None and time.monotonic() - last_push < self.fallback_after
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            "received": self.received,
+            "types": {
+                kind: {"active": self.is_active(kind), "seconds_since_last_push": now - last_push}
+                for kind, last_push in self.last_push.items()
+            },
+        }
+
+
+def main():
+    """Publieur de test: envoie un lot d'événements signé à une instance locale
+
+    Usage: python ingest.py events.json [url]
+    """
+    import httpx
+
+    if len(sys.argv) < 2 or not INGEST_SECRET:
+        print("Usage: INGEST_SECRET=... python ingest.py events.json [http://localhost:8000/ingest]")
+        sys.exit(1)
+
+    with open(sys.argv[1], "rb") as f:
+        body = f.read()
+    url = sys.argv[2] if len(sys.argv) > 2 else "http://localhost:8000/ingest"
+    response = httpx.post(url, content=body, headers={
+        "Content-Type": "application/json",
+        SIGNATURE_HEADER: sign_payload(INGEST_SECRET, body),
+    })
+    print(f"{response.status_code} {response.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+
+from address_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Élection du leader entre instances partageant DATA_DIR
+LEADER_ELECTION = os.getenv("LEADER_ELECTION", "true").lower() not in ("0", "false", "no")
+# Durée de validité du bail: une instance tombée est remplacée au plus tard après ce délai
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "15"))
+# Intervalle entre deux renouvellements du bail (ou tentatives d'acquisition)
+LEADER_HEARTBEAT_INTERVAL = float(os.getenv("LEADER_HEARTBEAT_INTERVAL", "5"))
+
+
+class LeaderElection:
+    """Élection d'un leader par bail dans une table SQLite partagée
+
+    Une seule instance à la fois détient le bail `name`: elle le renouvelle à chaque
+    battement de cœur, les autres tentent de le prendre dès qu'il a expiré. Une instance
+    qui n'arrive pas à renouveler son bail cesse immédiatement d'être leader, avant que
+    le bail puisse être repris ailleurs.
+    """
+
+    def __init__(self, name="pollers", path=None, ttl=LEADER_LEASE_TTL, heartbeat=LEADER_HEARTBEAT_INTERVAL,
+                 on_elected=None, on_demoted=None, enabled=LEADER_ELECTION):
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, "leader.db")
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.heartbeat = min(heartbeat, ttl / 2)
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.enabled = enabled
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.elected_at = None
+        # Détenteur du bail et expiration lus au dernier battement de cœur (pour status sans attente)
+        self._lease = (None, 0)
+        self._task = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=self.heartbeat, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def try_acquire(self):
+        """Prend ou renouvelle le bail s'il est libre, expiré ou déjà détenu
+
+        Appel bloquant (jusqu'à `heartbeat` secondes si la base est verrouillée): depuis la
+        boucle asyncio, il passe par un thread d'exécution.
+
+        Returns:
+            True si cette instance détient le bail
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+                if row is not None and row[0] != self.holder and row[1] > now:
+                    self._conn.execute("COMMIT")
+                    self._lease = row
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                    (self.name, self.holder, now + self.ttl)
+                )
+                self._conn.execute("COMMIT")
+                self._lease = (self.holder, now + self.ttl)
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release(self):
+        """Libère le bail pour qu'une autre instance le prenne sans attendre son expiration"""
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+
+    def current_holder(self):
+        with self._lock:
+            row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    async def _set_leader(self, leader):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            self.elected_at = time.time()
+            logger.info(f"Instance {self.holder} élue leader, démarrage des pollers")
+            if self.on_elected is not None:
+                await self.on_elected()
+        else:
+            self.elected_at = None
+            logger.warning(f"Instance {self.holder} n'est plus leader, arrêt des pollers")
+            if self.on_demoted is not None:
+                await self.on_demoted()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                held = await loop.run_in_executor(None, self.try_acquire)
+            except sqlite3.Error as e:
+                logger.error(f"Renouvellement du bail impossible: {e}")
+                held = False
+            await self._set_leader(held)
+            await asyncio.sleep(self.heartbeat)
+
+    async def start(self):
+        """Démarre le battement de cœur (sans élection, l'instance est leader d'office)"""
+        if not self.enabled:
+            await self._set_leader(True)
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrête le battement de cœur, cesse d'être leader et libère le bail"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._set_leader(False)
+        if self.enabled:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.release)
+            except sqlite3.Error as e:
+                logger.error(f"Libération du bail impossible: {e}")
+
+    def close(self):
+        self._conn.close()
+
+    def lease_holder(self):
+        """Détenteur du bail vu au dernier battement de cœur (None s'il a expiré depuis)"""
+        holder, expires_at = self._lease
+        return holder if expires_at > time.time() else None
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "instance": self.holder,
+            "is_leader": self.is_leader,
+            "leader": self.holder if self.is_leader else (self.lease_holder() if self.enabled else None),
+            "elected_at": self.elected_at,
+            "lease_ttl": self.ttl,
+            "heartbeat_interval": self.heartbeat,
+        }
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Événements conservés pour la reprise via Last-Event-ID
+LIVE_FEED_HISTORY = int(os.getenv("LIVE_FEED_HISTORY", "1000"))
+# Événements en attente par abonné au-delà desquels l'abonné est déconnecté
+LIVE_FEED_BUFFER = int(os.getenv("LIVE_FEED_BUFFER", "256"))
+# Intervalle (secondes) des commentaires de maintien de connexion
+LIVE_FEED_KEEPALIVE = float(os.getenv("LIVE_FEED_KEEPALIVE", "15"))
+
+
+class LiveSubscriber:
+    """Abonné au flux: file bornée de trames déjà sérialisées"""
+
+    def __init__(self, buffer):
+        self.queue = asyncio.Queue(buffer)
+        self.dropped = False
+
+    def offer(self, event):
+        """Dépose un événement sans jamais attendre; un abonné saturé est abandonné"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+
+class LiveFeed:
+    """Diffusion en direct (Server-Sent Events) des nouvelles adresses et transactions
+
+    Chaque événement est sérialisé une seule fois, en trame SSE partagée par tous les
+    abonnés. La publication ne bloque jamais: un abonné dont la file est pleine est
+    déconnecté, et pourra reprendre grâce à Last-Event-ID tant que les événements
+    manqués sont dans l'historique. Les identifiants sont préfixés par l'instant de
+    démarrage: un identifiant d'une instance précédente fait rejouer tout l'historique.
+    """
+
+    def __init__(self, history=LIVE_FEED_HISTORY, buffer=LIVE_FEED_BUFFER, keepalive=LIVE_FEED_KEEPALIVE):
+        self.buffer = buffer
+        self.keepalive = keepalive
+        self.boot = int(time.time())
+        self.sequence = 0
+        self.dropped = 0
+        # Événements récents (numéro, trame), pour la reprise
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+
+    def publish(self, kind, data):
+        """Sérialise un événement et le distribue à tous les abonnés"""
+        self.sequence += 1
+        event_id = f"{self.boot}-{self.sequence}"
+        payload = json.dumps({"id": event_id, "type": kind, "data": data}, ensure_ascii=False, default=str)
+        event = (self.sequence, f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n".encode("utf-8"))
+        self._history.append(event)
+        for subscriber in self._subscribers:
+            subscriber.offer(event)
+
+    def _resume_after(self, last_event_id):
+        """Numéro du dernier événement reçu par le client (0: tout l'historique)"""
+        if not last_event_id:
+            return self.sequence
+        boot, _, sequence = last_event_id.partition("-")
+        if boot != str(self.boot) or not sequence.isdigit():
+            return 0
+        return int(sequence)
+
+    async def stream(self, last_event_id=None):
+        """Génère les trames SSE d'un abonné, en commençant par celles manquées"""
+        subscriber = LiveSubscriber(self.buffer)
+        self._subscribers.add(subscriber)
+        try:
+            yield b"retry: 3000\n\n"
+            last = self._resume_after(last_event_id)
+            if self._history and last < self._history[0][0] - 1:
+                logger.warning(f"Reprise du flux en direct incomplète: événements antérieurs à "
+                               f"{self._history[0][0]} perdus")
+            for sequence, frame in list(self._history):
+                if sequence > last:
+                    last = sequence
+                    yield frame
+
+            while True:
+                try:
+                    sequence, frame = await asyncio.wait_for(subscriber.queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    if subscriber.dropped:
+                        break
+                    yield b": keepalive\n\n"
+                    continue
+                if sequence > last:
+                    last = sequence
+                    yield frame
+                if subscriber.dropped and subscriber.queue.empty():
+                    break
+            self.dropped += 1
+            logger.warning(f"Abonné du flux en direct déconnecté (file de {self.buffer} événements saturée)")
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def status(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "last_event_id": f"{self.boot}-{self.sequence}" if self.sequence else None,
+            "history": len(self._history),
+            "dropped_subscribers": self.dropped,
+        }
@@ -0,0 +1,183 @@
+import os
+import re
+import copy
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Configuration des journaux
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Échantillonnage des messages répétitifs (INFO et en dessous): au plus LOG_SAMPLE_BURST
+# occurrences d'un même message par fenêtre de LOG_SAMPLE_WINDOW secondes
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "5"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Variables d'environnement dont la valeur ne doit jamais apparaître dans les journaux
+SECRET_ENV_VARS = ("TELEGRAM_BOT_TOKEN", "API_KEY", "INGEST_SECRET", "ADMIN_TOKEN")
+REDACTED = "***"
+# Les valeurs trop courtes ne sont pas masquées: elles apparaîtraient dans n'importe quel texte
+MIN_SECRET_LENGTH = 6
+# Jeton dans les URL de l'API Telegram (https://api.telegram.org/bot<jeton>/sendMessage)
+TELEGRAM_TOKEN_PATTERN = re.compile(r"/bot[^/\s\"']+")
+
+# Attributs standards d'un LogRecord: tout le reste provient de extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled_out"}
+
+
+def redact(text, secrets=()):
+    """Masque les secrets connus et le jeton des URL Telegram"""
+    for secret in secrets:
+        text = text.replace(secret, REDACTED)
+    return TELEGRAM_TOKEN_PATTERN.sub(f"/bot{REDACTED}", text)
+
+
+class SamplingFilter(logging.Filter):
+    """Limite le volume des messages répétitifs
+
+    Deux messages sont considérés identiques s'ils ont le même logger et le même gabarit
+    (avant interpolation des arguments). Les avertissements et erreurs ne sont jamais
+    échantillonnés. Le nombre de messages écartés est reporté sur le suivant émis.
+    """
+
+    def __init__(self, window=LOG_SAMPLE_WINDOW, burst=LOG_SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.burst <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.window:
+                suppressed = counter[2] if counter is not None else 0
+                self._counters[key] = [now, 1, 0]
+            elif counter[1] < self.burst:
+                counter[1] += 1
+                suppressed, counter[2] = counter[2], 0
+            else:
+                counter[2] += 1
+                return False
+        if suppressed:
+            record.sampled_out = suppressed
+        return True
+
+
+class RedactingFormatter(logging.Formatter):
+    """Formatage texte classique, secrets masqués"""
+
+    def __init__(self, fmt=TEXT_FORMAT, secrets=()):
+        super().__init__(fmt)
+        self.secrets = secrets
+
+    def format(self, record):
+        text = super().format(record)
+        sampled_out = getattr(record, "sampled_out", 0)
+        if sampled_out:
+            text += f" ({sampled_out} messages identiques écartés)"
+        return redact(text, self.secrets)
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par message, avec les champs passés dans extra={...}, secrets masqués"""
+
+    def __init__(self, secrets=()):
+        super().__init__()
+        self.secrets = secrets
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "sampled_out", 0):
+            entry["sampled_out"] = record.sampled_out
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return redact(json.dumps(entry, ensure_ascii=False, default=str), self.secrets)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Dépose les messages dans la file sans les formater
+
+    QueueHandler interpole le message avant de le déposer; ici l'interpolation, le
+    formatage et le masquage sont laissés au thread d'écriture. Une file pleine fait
+    perdre le message plutôt que de bloquer la boucle asyncio.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return copy.copy(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Installe la journalisation asynchrone sur le logger racine (idempotent)
+
+    Les appels de journalisation se limitent à l'échantillonnage et au dépôt dans une
+    file; un thread dédié formate et écrit les messages sur la sortie d'erreur.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    secrets = tuple(
+        value for value in (os.getenv(name) for name in SECRET_ENV_VARS)
+        if value and len(value) >= MIN_SECRET_LENGTH
+    )
+    stream_handler = logging.StreamHandler()
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter(secrets))
+    else:
+        stream_handler.setFormatter(RedactingFormatter(secrets=secrets))
+
+    queue_handler = DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
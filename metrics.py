@@ -0,0 +1,98 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Durée de chaque étape du pipeline de notification
+STAGE_DURATION = Histogram(
+    "bcreader_stage_duration_seconds",
+    "Durée des étapes du pipeline (requête amont, extraction, formatage, envoi Telegram...)",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Réponses et erreurs de l'API BCReader
+UPSTREAM_RESPONSES = Counter(
+    "bcreader_upstream_responses_total",
+    "Réponses reçues de l'API BCReader par code de statut",
+    ["endpoint", "status"],
+)
+UPSTREAM_ERRORS = Counter(
+    "bcreader_upstream_errors_total",
+    "Erreurs réseau ou HTTP lors des requêtes vers l'API BCReader",
+    ["endpoint", "error"],
+)
+UPSTREAM_PAYLOAD_BYTES = Histogram(
+    "bcreader_upstream_payload_bytes",
+    "Taille des réponses de l'API BCReader",
+    ["endpoint"],
+    buckets=(0, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8),
+)
+
+# Enregistrements traités: lus, nouveaux et envoyés
+RECORDS = Counter(
+    "bcreader_records_total",
+    "Enregistrements traités par flux et par état (seen, new, sent)",
+    ["feed", "state"],
+)
+
+# Retard du curseur des adresses: plus grand ID connu moins dernier ID envoyé
+CURSOR_LAG = Gauge(
+    "bcreader_address_cursor_lag",
+    "Nombre d'IDs d'adresses connus mais pas encore envoyés, par flux",
+    ["feed"],
+)
+
+# Délai entre la détection d'un élément et la confirmation de son envoi
+DETECTION_TO_DELIVERY = Histogram(
+    "bcreader_detection_to_delivery_seconds",
+    "Délai entre la détection d'un nouvel élément et sa livraison sur Telegram",
+    ["feed"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+# Résultat de la diffusion d'un message à chaque chat abonné
+SUBSCRIBER_DELIVERIES = Counter(
+    "bcreader_subscriber_deliveries_total",
+    "Envois aux chats abonnés par flux et par résultat (delivered, failed, pending)",
+    ["feed", "outcome"],
+)
+DELIVERY_OUTCOMES = {True: "delivered", False: "failed", None: "pending"}
+
+# Messages d'un chat en échec alors que d'autres chats ont été livrés: gardés pour un
+# nouvel essai, renvoyés avec le message suivant du chat, ou perdus (file pleine, désabonnement)
+SUBSCRIBER_RETRIES = Counter(
+    "bcreader_subscriber_retries_total",
+    "Messages gardés pour un nouvel essai par chat, par flux et par résultat (kept, resent, lost)",
+    ["feed", "outcome"],
+)
+
+
+@contextmanager
+def observe_stage(stage):
+    """Mesure la durée d'un bloc dans l'histogramme des étapes"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_upstream_response(endpoint, response, stream=False):
+    """Compte une réponse de l'API amont et sa taille
+
+    Pour une réponse lue en flux (`stream`), seul le statut est compté: la taille est
+    relevée une fois le corps consommé (`response.num_bytes_downloaded`).
+    """
+    UPSTREAM_RESPONSES.labels(endpoint, str(response.status_code)).inc()
+    if not stream:
+        UPSTREAM_PAYLOAD_BYTES.labels(endpoint).observe(len(response.content))
+
+
+def record_upstream_error(endpoint, error):
+    UPSTREAM_ERRORS.labels(endpoint, type(error).__name__).inc()
+
+
+def render_metrics():
+    """Retourne le contenu de /metrics et son type MIME"""
+    return generate_latest(), CONTENT_TYPE_LATEST
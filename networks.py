@@ -0,0 +1,582 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+
+import httpx
+import ijson
+
+from http_client import http_client
+from records import AddressPayloadNormalizer, select_new
+from address_store import DATA_DIR, AddressStore
+from checkpoint_store import CheckpointStore
+from transactions import SeenIndex, TransactionCatchUp, transaction_keys
+from subscriptions import FEED_ADDRESSES, FEED_TRANSACTIONS, FanOut, SubscriptionRegistry
+from resilience import CircuitOpenError, ResilientUpstream, raise_for_retryable_status
+from scheduler import ADDRESS_POLL_INTERVAL, TX_POLL_INTERVAL
+from digest import DIGEST_TOP, Digest, summarize_addresses, summarize_transactions
+from metrics import (
+    CURSOR_LAG, DELIVERY_OUTCOMES, DETECTION_TO_DELIVERY, RECORDS, STAGE_DURATION, SUBSCRIBER_DELIVERIES,
+    UPSTREAM_PAYLOAD_BYTES, observe_stage, record_upstream_error, record_upstream_response
+)
+
+logger = logging.getLogger(__name__)
+
+# Fichier des réseaux BCReader supplémentaires (liste JSON, voir load_networks)
+NETWORKS_FILE = os.getenv("NETWORKS_FILE", os.path.join(DATA_DIR, "networks.json"))
+
+NETWORK_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Marqueur retourné quand l'API répond 304 Not Modified
+NOT_MODIFIED = object()
+
+
+class NetworkMonitor:
+    """Surveillance d'un réseau BCReader: adresses et transactions, de l'API aux chats
+
+    Le réseau principal (`name` None) et les réseaux supplémentaires passent par ce même
+    pipeline. Chaque réseau a son propre état (stockage des adresses, curseur et
+    transactions vues dans `directory`), ses propres flux dans l'ordonnanceur, ses propres
+    protections d'appel (disjoncteur, délai) et ses chats destinataires. Le client HTTP,
+    la file d'envoi Telegram et la boucle asyncio sont partagés: un réseau lent n'occupe
+    que ses propres tâches.
+
+    Les traitements propres au réseau principal sont des points d'extension optionnels:
+    `on_addresses(records)` reçoit les adresses nouvellement stockées, `on_transactions
+    (transactions, keys)` les transactions détectées (une seule fois chacune, même si leur
+    envoi échoue), `priority(address)` désigne les adresses envoyées sans attendre le
+    résumé, et `digest_window` active le regroupement des notifications.
+    """
+
+    def __init__(self, name, api_url, api_key, dispatcher, render_addresses, render_transactions,
+                 chat_ids=None, subscriptions_file=None, address_interval=ADDRESS_POLL_INTERVAL,
+                 transaction_interval=TX_POLL_INTERVAL, directory=None, digest_window=0,
+                 on_addresses=None, on_transactions=None, priority=None):
+        self.name = name
+        self.api_url = (api_url or "").rstrip("/")
+        self.api_key = api_key
+        self.dispatcher = dispatcher
+        self.render_addresses = render_addresses
+        self.render_transactions = render_transactions
+        self.address_interval = address_interval
+        self.transaction_interval = transaction_interval
+        self.on_addresses = on_addresses
+        self.on_transactions = on_transactions
+        self.priority = priority or (lambda address: False)
+        self.directory = directory or os.path.join(DATA_DIR, "networks", name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.address_store = AddressStore(os.path.join(self.directory, "addresses.db"))
+        self.checkpoints = CheckpointStore(os.path.join(self.directory, "checkpoints.db"))
+        # Transactions déjà envoyées (ou en attente de résumé), et déjà passées à on_transactions
+        self.seen_transactions = SeenIndex()
+        self.recorded_transactions = SeenIndex()
+        self.upstream = ResilientUpstream()
+        self.normalizer = AddressPayloadNormalizer()
+        self.subscriptions = SubscriptionRegistry(path=subscriptions_file, default_chat_ids=chat_ids)
+        self.fan_out = FanOut(dispatcher, self.subscriptions)
+        self.last_processed_id = None
+        self.id_lock = threading.Lock()
+        # Dernière synchronisation réussie des adresses et détection de la plus ancienne
+        # adresse pas encore envoyée (horloge monotone)
+        self.synced_at = None
+        self.addresses_detected_at = None
+        self.scheduler = None
+        # Regroupement des notifications en rafale, vidé sous le verrou du flux
+        self.address_digest = Digest(self.feed(FEED_ADDRESSES), self.send_address_digest, window=digest_window,
+                                     run=lambda flush: self.run_with(FEED_ADDRESSES, flush))
+        self.transaction_digest = Digest(self.feed(FEED_TRANSACTIONS), self.send_transaction_digest,
+                                         window=digest_window,
+                                         run=lambda flush: self.run_with(FEED_TRANSACTIONS, flush))
+
+    def feed(self, feed):
+        """Nom du flux de ce réseau (ordonnanceur et métriques)"""
+        return feed if self.name is None else f"{self.name}:{feed}"
+
+    @property
+    def prefix(self):
+        """Préfixe des messages de journal du réseau"""
+        return "" if self.name is None else f"Réseau {self.name}: "
+
+    @property
+    def headers(self):
+        return {"accept": "application/json", "x-api-key": self.api_key}
+
+    def resume(self):
+        """Reprend le curseur et les transactions vues mémorisés (appelé à chaque élection)
+
+        L'instance précédemment leader a pu faire avancer les curseurs et le stockage des
+        adresses. Au tout premier démarrage, le suivi des adresses commence au plus grand
+        ID connu après la première synchronisation.
+        """
+        cursor = self.checkpoints.get_cursor("last_processed_id")
+        with self.id_lock:
+            self.last_processed_id = int(cursor) if cursor is not None else None
+        self.address_store.refresh()
+        # Transactions vues: déjà envoyées, donc déjà passées à on_transactions
+        self.seen_transactions.clear()
+        self.seen_transactions.add_many(self.checkpoints.load_seen())
+        self.recorded_transactions.clear()
+        self.recorded_transactions.add_many(self.seen_transactions.keys())
+        logger.info(f"{self.prefix}dernier ID traité {self.last_processed_id}, "
+                    f"{len(self.seen_transactions)} transactions vues")
+
+    def add_feeds(self, scheduler, skip=None):
+        """Ajoute les flux du réseau à l'ordonnanceur
+
+        `skip` associe éventuellement à un flux (FEED_ADDRESSES, FEED_TRANSACTIONS) la
+        fonction qui suspend sa vérification périodique.
+        """
+        skip = skip or {}
+        self.scheduler = scheduler
+        scheduler.add_feed(self.feed(FEED_ADDRESSES), self.process_addresses, self.address_interval,
+                           activity=lambda: self.address_store.high_water_mark, skip=skip.get(FEED_ADDRESSES))
+        scheduler.add_feed(self.feed(FEED_TRANSACTIONS), self.process_transactions, self.transaction_interval,
+                           activity=lambda: self.seen_transactions.added, skip=skip.get(FEED_TRANSACTIONS))
+
+    async def run_with(self, feed, func, *args):
+        """Exécute une coroutine sous le verrou d'un flux du réseau"""
+        return await self.scheduler.feeds[self.feed(feed)].run_with(func, *args)
+
+    async def fetch_address_updates(self, min_id=0):
+        """Récupère les adresses d'ID supérieur à min_id via une requête conditionnelle
+
+        La réponse est décodée au fil de l'eau: seules les adresses au-delà de min_id sont
+        conservées en mémoire.
+
+        Returns:
+            Un tuple (adresses | NOT_MODIFIED | None en cas d'échec, etag, last_modified)
+        """
+        endpoint = self.feed(FEED_ADDRESSES)
+        headers = self.headers
+        etag, last_modified = self.address_store.get_validators()
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        async def download():
+            started = time.perf_counter()
+            async with http_client.stream("GET", f"{self.api_url}/api/config/addresses", headers=headers) as response:
+                STAGE_DURATION.labels("fetch_addresses").observe(time.perf_counter() - started)
+                record_upstream_response(endpoint, response, stream=True)
+                if response.status_code == 304:
+                    return NOT_MODIFIED, etag, last_modified
+                raise_for_retryable_status(response)
+                response.raise_for_status()
+
+                # Décodage en flux: seules les adresses au-delà de min_id sont conservées
+                with observe_stage("extract"):
+                    records = [
+                        record async for record in self.normalizer.iter_records(response.aiter_bytes())
+                        if record.id > min_id
+                    ]
+                # Taille relevée une fois le corps consommé
+                UPSTREAM_PAYLOAD_BYTES.labels(endpoint).observe(response.num_bytes_downloaded)
+                logger.info("%sDonnées récupérées avec succès depuis l'API: %d adresses", self.prefix,
+                            self.normalizer.last_count, extra={"feed": endpoint, "count": self.normalizer.last_count})
+                RECORDS.labels(endpoint, "seen").inc(self.normalizer.last_count)
+
+                if not self.normalizer.last_count:
+                    logger.error(f"{self.prefix}aucune donnée extraite de la réponse de l'API")
+                    return None, None, None
+                return records, response.headers.get("etag"), response.headers.get("last-modified")
+
+        try:
+            # Le décodeur garde l'état de la forme détectée: pas de requête de couverture ici
+            return await self.upstream.call(download, hedge=False)
+        except (httpx.HTTPError, ijson.JSONError, ValueError, asyncio.TimeoutError, CircuitOpenError) as e:
+            record_upstream_error(endpoint, e)
+            logger.error(f"{self.prefix}erreur lors de la requête des adresses: {e}")
+            return None, None, None
+
+    async def fetch_transactions_data(self, page=1, limit=20):
+        """Récupère une page de transactions depuis l'API BCReader"""
+        endpoint = self.feed(FEED_TRANSACTIONS)
+
+        async def request_page():
+            response = await http_client.get(
+                f"{self.api_url}/api/all-transactions", params={"page": page, "limit": limit}, headers=self.headers
+            )
+            record_upstream_response(endpoint, response)
+            raise_for_retryable_status(response)
+            return response
+
+        try:
+            with observe_stage("fetch_transactions"):
+                response = await self.upstream.call(request_page)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError, asyncio.TimeoutError, CircuitOpenError) as e:
+            record_upstream_error(endpoint, e)
+            logger.error(f"{self.prefix}erreur lors de la requête des transactions: {e}")
+            return {"error": str(e)}
+
+    async def notify(self, feed, items, render):
+        """Diffuse des éléments aux chats abonnés, chacun recevant ceux qui passent ses filtres
+
+        Returns:
+            False si aucun chat n'a pu être livré (les éléments seront renvoyés au prochain
+            cycle), True sinon
+        """
+        if self.dispatcher is None:
+            logger.error("Token du bot Telegram non configuré, impossible d'envoyer le message")
+            return False
+        if not len(self.subscriptions):
+            logger.error(f"{self.prefix}aucun chat Telegram abonné, impossible d'envoyer le message")
+            return False
+
+        title = "" if self.name is None else f"🌐 *{self.name}*\n\n"
+        # Mise en file: découpage, limitation de débit et réessais sont gérés par le dispatcher
+        with observe_stage("telegram_send"):
+            results = await self.fan_out.publish(feed, items, lambda selected: title + render(selected))
+        for outcome in results.values():
+            SUBSCRIBER_DELIVERIES.labels(self.feed(feed), DELIVERY_OUTCOMES[outcome]).inc()
+        return not results or any(outcome is not False for outcome in results.values())
+
+    def _update_cursor_lag(self):
+        if self.last_processed_id is not None:
+            CURSOR_LAG.labels(self.feed(FEED_ADDRESSES)).set(self.address_store.high_water_mark - self.last_processed_id)
+
+    async def sync_addresses(self):
+        """Intègre les nouvelles adresses de l'API dans le stockage local
+
+        Seul le delta (IDs au-delà du plus grand ID connu) est intégré, et une réponse
+        304 de l'API ne déclenche aucune analyse.
+
+        Returns:
+            True si le stockage local est à jour, False en cas d'échec
+        """
+        records, etag, last_modified = await self.fetch_address_updates(self.address_store.high_water_mark)
+        if records is None:
+            return False
+        if records is NOT_MODIFIED:
+            logger.info(f"{self.prefix}aucune modification côté API, pas d'analyse nécessaire")
+        else:
+            with observe_stage("store"):
+                self.store_new_addresses(records)
+                self.address_store.set_validators(etag, last_modified)
+        self.synced_at = time.monotonic()
+        return True
+
+    def store_new_addresses(self, records):
+        """Intègre des adresses au stockage local en notant l'instant de leur détection"""
+        fresh, _, _ = select_new(records, self.address_store.high_water_mark)
+        inserted = self.address_store.add_new(fresh)
+        if self.on_addresses is not None:
+            self.on_addresses(fresh)
+        if inserted:
+            RECORDS.labels(self.feed(FEED_ADDRESSES), "new").inc(inserted)
+            if self.addresses_detected_at is None:
+                self.addresses_detected_at = time.monotonic()
+        self._update_cursor_lag()
+        return inserted
+
+    async def send_new_addresses(self, min_id=None):
+        """Envoie les adresses du stockage local non encore envoyées"""
+        # Les envois automatiques passent par le résumé, pas un envoi demandé depuis un ID
+        automatic = min_id is None
+
+        if min_id is None:
+            with self.id_lock:
+                initialized = self.last_processed_id is None
+                if initialized:
+                    # Premier démarrage (ou points de reprise effacés): l'historique existant n'est pas envoyé
+                    self.last_processed_id = self.address_store.high_water_mark
+                min_id = self.last_processed_id
+            if initialized:
+                self.save_address_cursor()
+                self._update_cursor_lag()
+                logger.info("%sSuivi des adresses à partir de l'ID %d", self.prefix, min_id)
+                return True
+            logger.info("%sUtilisation du dernier ID traité: %d", self.prefix, min_id)
+        else:
+            logger.info("%sUtilisation de l'ID spécifié: %s", self.prefix, min_id)
+
+        # Adresses non encore envoyées, lues depuis l'index local
+        new_addresses = self.address_store.get_addresses(min_id=min_id)
+        logger.info("%sNombre d'adresses après filtrage (ID > %s): %d", self.prefix, min_id, len(new_addresses))
+        if not new_addresses:
+            return True
+
+        max_id = new_addresses[-1].id
+        if automatic and self.address_digest.enabled:
+            return await self.digest_new_addresses(new_addresses, max_id)
+
+        success = await self.deliver_addresses(new_addresses, min_id)
+        # Le dernier ID traité n'avance que si l'envoi a réussi
+        if success:
+            with self.id_lock:
+                self.last_processed_id = max(self.last_processed_id or 0, max_id)
+            self.save_address_cursor()
+            if self.addresses_detected_at is not None:
+                DETECTION_TO_DELIVERY.labels(self.feed(FEED_ADDRESSES)).observe(
+                    time.monotonic() - self.addresses_detected_at)
+                self.addresses_detected_at = None
+            self._update_cursor_lag()
+        return success
+
+    async def deliver_addresses(self, records, min_id, summarize=False):
+        """Diffuse des adresses aux chats abonnés
+
+        Avec summarize, une sélection de plus de DIGEST_TOP adresses est envoyée sous forme de résumé.
+        """
+        # Formatage (une fois par sélection d'adresses distincte) et diffusion aux abonnés
+        def render(selected):
+            with observe_stage("format_addresses"):
+                if summarize and len(selected) > DIGEST_TOP:
+                    return summarize_addresses(selected)
+                return self.render_addresses(selected, min_id)
+        success = await self.notify(FEED_ADDRESSES, records, render)
+        logger.info("%sRésultat de l'envoi du message: %s", self.prefix, "Succès" if success else "Échec",
+                    extra={"feed": self.feed(FEED_ADDRESSES), "delivered": bool(success)})
+        if success:
+            RECORDS.labels(self.feed(FEED_ADDRESSES), "sent").inc(len(records))
+        return success
+
+    def save_address_cursor(self):
+        """Mémorise le dernier ID traité, sauf si des adresses attendent encore leur résumé"""
+        if len(self.address_digest):
+            return
+        self.checkpoints.set_cursor("last_processed_id", self.last_processed_id)
+        logger.info("%sDernier ID traité mis à jour: %d", self.prefix, self.last_processed_id,
+                    extra={"feed": self.feed(FEED_ADDRESSES), "cursor": self.last_processed_id})
+
+    async def digest_new_addresses(self, new_addresses, max_id):
+        """Mode résumé: les adresses prioritaires partent immédiatement, les autres attendent le résumé
+
+        Le dernier ID traité avance aussitôt en mémoire (les adresses en attente ne sont pas
+        relues au cycle suivant), mais n'est mémorisé qu'une fois l'attente vidée.
+        """
+        detected_at = self.addresses_detected_at or time.monotonic()
+        urgent = [record for record in new_addresses if self.priority(record.address)]
+        pending = [record for record in new_addresses if not self.priority(record.address)]
+        with self.id_lock:
+            self.last_processed_id = max(self.last_processed_id or 0, max_id)
+        self.addresses_detected_at = None
+
+        if urgent:
+            self.address_digest.bypassed += len(urgent)
+            if await self.deliver_addresses(urgent, 0):
+                DETECTION_TO_DELIVERY.labels(self.feed(FEED_ADDRESSES)).observe(time.monotonic() - detected_at)
+            else:
+                # Non livrées, elles partiront avec le résumé
+                pending = urgent + pending
+
+        self.address_digest.add(pending, detected_at=detected_at)
+        if self.address_digest.is_due():
+            await self.address_digest.flush()
+        self.save_address_cursor()
+        self._update_cursor_lag()
+        return True
+
+    async def send_address_digest(self, records, keys, detected_at):
+        """Envoie le résumé des adresses en attente"""
+        success = await self.deliver_addresses(records, 0, summarize=True)
+        if success:
+            DETECTION_TO_DELIVERY.labels(self.feed(FEED_ADDRESSES)).observe(time.monotonic() - detected_at)
+            self.save_address_cursor()
+        return success
+
+    async def process_addresses(self, min_id=None):
+        """Intègre les nouvelles adresses de l'API et envoie celles qui n'ont pas encore été envoyées"""
+        try:
+            if not await self.sync_addresses():
+                return False
+            return await self.send_new_addresses(min_id)
+        except Exception as e:
+            logger.error(f"{self.prefix}erreur lors du traitement des adresses: {e}")
+            return False
+
+    def record_transactions(self, new_transactions, new_keys):
+        """Passe les transactions détectées à on_transactions
+
+        Une transaction dont l'envoi a échoué est collectée de nouveau au cycle suivant: elle
+        n'est transmise qu'une fois.
+        """
+        if self.on_transactions is None:
+            return
+        fresh = [(tx, key) for tx, key in zip(new_transactions, new_keys) if key not in self.recorded_transactions]
+        if not fresh:
+            return
+        self.recorded_transactions.add_many(reversed([key for _, key in fresh]))
+        self.on_transactions([tx for tx, _ in fresh], [key for _, key in fresh])
+
+    async def send_new_transactions(self, new_transactions, new_keys, detected_at=None):
+        """Envoie des transactions non encore vues puis les mémorise"""
+        if not new_transactions:
+            return True
+
+        detected_at = detected_at or time.monotonic()
+        RECORDS.labels(self.feed(FEED_TRANSACTIONS), "new").inc(len(new_transactions))
+
+        if not self.transaction_digest.enabled:
+            return await self.deliver_transactions(new_transactions, new_keys, detected_at)
+
+        # Mode résumé: les transactions d'adresses prioritaires partent immédiatement, les
+        # autres attendent le résumé
+        urgent, urgent_keys, pending, pending_keys = [], [], [], []
+        for tx, key in zip(new_transactions, new_keys):
+            if self.priority(tx.get("from")) or self.priority(tx.get("to")):
+                urgent.append(tx)
+                urgent_keys.append(key)
+            else:
+                pending.append(tx)
+                pending_keys.append(key)
+
+        # Les transactions en attente ne doivent pas être collectées de nouveau au cycle suivant
+        # (elles ne sont mémorisées sur disque qu'une fois envoyées)
+        self.seen_transactions.add_many(reversed(new_keys))
+        if urgent:
+            self.transaction_digest.bypassed += len(urgent)
+            if not await self.deliver_transactions(urgent, urgent_keys, detected_at):
+                # Non livrées, elles partiront avec le résumé
+                pending, pending_keys = urgent + pending, urgent_keys + pending_keys
+
+        self.transaction_digest.add(pending, pending_keys, detected_at)
+        if self.transaction_digest.is_due():
+            await self.transaction_digest.flush()
+        return True
+
+    async def deliver_transactions(self, transactions, keys, detected_at, summarize=False):
+        """Diffuse des transactions aux chats abonnés puis les mémorise si l'envoi a réussi
+
+        Avec summarize, une sélection de plus de DIGEST_TOP transactions est envoyée sous forme de résumé.
+        """
+        # Date de détection, début du lien d'export pour les transactions sans horodatage
+        since = time.time() - (time.monotonic() - detected_at)
+
+        # Formatage (une fois par sélection de transactions distincte) et diffusion aux abonnés
+        def render(selected):
+            with observe_stage("format_transactions"):
+                if summarize and len(selected) > DIGEST_TOP:
+                    return summarize_transactions(selected, since=since)
+                return self.render_transactions({"data": selected})
+        success = await self.notify(FEED_TRANSACTIONS, transactions, render)
+
+        if success:
+            # Du plus ancien au plus récent: l'ordre des clés situe la frontière du prochain rattrapage
+            self.seen_transactions.add_many(reversed(keys))
+            self.checkpoints.add_seen(self.seen_transactions.ordered(keys))
+            logger.info("%sMémorisé pour éviter les doublons: %d transactions traitées", self.prefix, len(keys),
+                        extra={"feed": self.feed(FEED_TRANSACTIONS), "count": len(keys)})
+            RECORDS.labels(self.feed(FEED_TRANSACTIONS), "sent").inc(len(transactions))
+            DETECTION_TO_DELIVERY.labels(self.feed(FEED_TRANSACTIONS)).observe(time.monotonic() - detected_at)
+        else:
+            logger.info(f"{self.prefix}échec d'envoi, les transactions seront renvoyées au prochain cycle")
+        return success
+
+    async def send_transaction_digest(self, transactions, keys, detected_at):
+        """Envoie le résumé des transactions en attente"""
+        return await self.deliver_transactions(transactions, keys, detected_at, summarize=True)
+
+    async def process_transactions(self):
+        """Rattrape les nouvelles transactions et les envoie
+
+        Les pages de l'API sont parcourues jusqu'à rejoindre les transactions déjà vues,
+        pour qu'une rafale de plus d'une page ne soit pas perdue.
+        """
+        try:
+            logger.info("%sVérification des nouvelles transactions (%d déjà vues)", self.prefix,
+                        len(self.seen_transactions))
+            catch_up = TransactionCatchUp(self.fetch_transactions_data, self.seen_transactions)
+            try:
+                new_transactions, new_keys = await catch_up.collect_new()
+            except RuntimeError as e:
+                logger.error(f"{self.prefix}aucune donnée de transaction reçue de l'API: {e}")
+                return False
+            RECORDS.labels(self.feed(FEED_TRANSACTIONS), "seen").inc(catch_up.read)
+            self.record_transactions(new_transactions, new_keys)
+            return await self.send_new_transactions(new_transactions, new_keys, time.monotonic())
+        except Exception as e:
+            logger.error(f"{self.prefix}erreur lors du traitement des transactions: {e}")
+            return False
+
+    async def ingest_addresses(self, records):
+        """Fait passer des adresses poussées dans le pipeline, sous le verrou du flux
+
+        Sans dernier ID traité (premier démarrage, points de reprise effacés), le suivi
+        commence juste avant la plus petite adresse poussée encore inconnue: elle est
+        envoyée, l'historique ne l'est pas.
+        """
+        RECORDS.labels(self.feed(FEED_ADDRESSES), "seen").inc(len(records))
+        with self.id_lock:
+            initialized = self.last_processed_id is None
+            if initialized:
+                fresh, high_water_mark, _ = select_new(records, self.address_store.high_water_mark)
+                self.last_processed_id = fresh[0].id - 1 if fresh else high_water_mark
+        if initialized:
+            self.save_address_cursor()
+            logger.info("%sSuivi des adresses à partir de l'ID %d", self.prefix, self.last_processed_id)
+        self.store_new_addresses(records)
+        return await self.run_with(FEED_ADDRESSES, self.send_new_addresses)
+
+    async def ingest_transactions(self, transfers):
+        """Fait passer des transferts poussés dans le pipeline, sous le verrou du flux"""
+        candidates = [(tx, key) for tx, key in zip(transfers, transaction_keys(transfers, self.seen_transactions))
+                      if key not in self.seen_transactions]
+        new_transactions, new_keys = [tx for tx, _ in candidates], [key for _, key in candidates]
+        self.record_transactions(new_transactions, new_keys)
+        return await self.run_with(FEED_TRANSACTIONS, self.send_new_transactions, new_transactions, new_keys)
+
+    async def stop(self):
+        """Vide les résumés en attente (appelé après l'arrêt de l'ordonnanceur)"""
+        for digest in (self.address_digest, self.transaction_digest):
+            await digest.flush()
+            digest.close()
+
+    def close(self):
+        self.address_store.close()
+        self.checkpoints.close()
+
+    def status(self):
+        return {
+            "name": self.name,
+            "api_url": self.api_url,
+            "last_processed_id": self.last_processed_id,
+            "known_addresses": self.address_store.high_water_mark,
+            "seen_transactions": len(self.seen_transactions),
+            "chats": [subscription.chat_id for subscription in self.subscriptions.all()],
+            "upstream": self.upstream.status(),
+        }
+
+
+def load_networks(dispatcher, render_addresses, render_transactions, default_chat_ids=None, path=NETWORKS_FILE):
+    """Crée les réseaux décrits dans le fichier des réseaux
+
+    Le fichier est une liste JSON d'objets: `name` et `api_url` (obligatoires), `api_key`
+    ou `api_key_env` (nom de la variable d'environnement qui contient la clé), `chat_ids`
+    (IDs séparés par des virgules, TELEGRAM_CHAT_ID par défaut), `subscriptions_file`,
+    `address_interval` et `transaction_interval` (secondes).
+    """
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Lecture des réseaux impossible ({path}): {e}")
+        return []
+
+    networks = []
+    names = set()
+    for entry in entries if isinstance(entries, list) else []:
+        name = entry.get("name") if isinstance(entry, dict) else None
+        if not name or not NETWORK_NAME_PATTERN.match(name) or name in names or not entry.get("api_url"):
+            logger.warning(f"Réseau ignoré (name unique [A-Za-z0-9_-] et api_url requis): {entry}")
+            continue
+        api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env") or "")
+        chat_ids = entry.get("chat_ids", default_chat_ids)
+        if isinstance(chat_ids, list):
+            chat_ids = ",".join(str(chat_id) for chat_id in chat_ids)
+        names.add(name)
+        networks.append(NetworkMonitor(
+            name, entry["api_url"], api_key, dispatcher, render_addresses, render_transactions,
+            chat_ids=chat_ids, subscriptions_file=entry.get("subscriptions_file"),
+            address_interval=float(entry.get("address_interval", ADDRESS_POLL_INTERVAL)),
+            transaction_interval=float(entry.get("transaction_interval", TX_POLL_INTERVAL)),
+        ))
+    logger.info(f"{len(networks)} réseaux supplémentaires configurés")
+    return networks
@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime
+
+from records import select_new
+from transactions import SeenIndex, transaction_keys
+
+logger = logging.getLogger(__name__)
+
+# Durée (secondes) au-delà de laquelle le cache, s'il n'a pas été alimenté par le poller,
+# est rechargé à la lecture suivante
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))
+# Nombre de transactions récentes conservées en mémoire
+TX_CACHE_CAPACITY = int(os.getenv("TX_CACHE_CAPACITY", "10000"))
+# Nombre maximal de résultats renvoyés par une requête
+QUERY_MAX_LIMIT = 1000
+
+
+def parse_timestamp(value):
+    """Convertit un horodatage (secondes ou millisecondes epoch, ou ISO 8601) en secondes epoch"""
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        try:
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    # Au-delà de l'an 33658 en secondes: il s'agit de millisecondes
+    return number / 1000 if number > 1e12 else number
+
+
+class AddressIndex:
+    """Adresses en mémoire, triées par ID, avec index par émetteur et par préfixe d'adresse"""
+
+    def __init__(self):
+        self.last_id = 0
+        self._records = []
+        self._ids = []
+        self._by_issuer = {}
+        # Adresses en minuscules triées, pour les recherches par préfixe
+        self._by_address = []
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, records):
+        """Ajoute les adresses d'ID supérieur au plus grand ID indexé
+
+        Returns:
+            Le nombre d'adresses ajoutées
+        """
+        delta, self.last_id, _ = select_new(records, self.last_id)
+        for record in delta:
+            self._records.append(record)
+            self._ids.append(record.id)
+            issuer_records = self._by_issuer.setdefault(record.issuer.casefold(), ([], []))
+            issuer_records[0].append(record)
+            issuer_records[1].append(record.id)
+        if len(delta) == 1:
+            insort(self._by_address, (delta[0].address.lower(), delta[0].id, delta[0]))
+        elif delta:
+            # Deux séquences triées: le tri fusionne en temps linéaire
+            self._by_address.extend(sorted((record.address.lower(), record.id, record) for record in delta))
+            self._by_address.sort()
+        return len(delta)
+
+    def query(self, issuer=None, min_id=0, prefix=None, limit=100):
+        """Adresses d'ID supérieur à min_id, filtrées par émetteur et préfixe, triées par ID"""
+        if prefix:
+            prefix = prefix.lower()
+            start = bisect_left(self._by_address, (prefix,))
+            matches = []
+            for address, record_id, record in self._by_address[start:]:
+                if not address.startswith(prefix):
+                    break
+                if record_id > min_id and (not issuer or record.issuer.casefold() == issuer.casefold()):
+                    matches.append(record)
+            matches.sort(key=lambda record: record.id)
+            return matches[:limit]
+
+        if issuer:
+            records, ids = self._by_issuer.get(issuer.casefold(), ([], []))
+        else:
+            records, ids = self._records, self._ids
+        start = bisect_right(ids, min_id)
+        return records[start:start + limit]
+
+
+class TransactionIndex:
+    """Transactions récentes en mémoire (capacité bornée), indexées par adresse"""
+
+    def __init__(self, capacity=TX_CACHE_CAPACITY):
+        self.capacity = capacity
+        # Clés indexées, dans le même ordre et avec la même capacité que les entrées
+        self._keys = SeenIndex(capacity)
+        # Entrées (clé, horodatage, transaction), de la plus ancienne à la plus récente
+        self._entries = deque()
+        self._by_address = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def recent(self, count):
+        return self._keys.recent(count)
+
+    def next_rank(self, base):
+        return self._keys.next_rank(base)
+
+    def add(self, transactions, keys=None):
+        """Ajoute des transactions (ordre de l'API: la plus récente d'abord)
+
+        Returns:
+            Le nombre de transactions ajoutées
+        """
+        keys = keys if keys is not None else transaction_keys(transactions, self._keys)
+        added = []
+        now = time.time()
+        for tx, key in reversed(list(zip(transactions, keys))):
+            if key in self._keys:
+                continue
+            entry = (key, parse_timestamp(tx.get("timestamp")) or now, tx)
+            added.append(key)
+            self._entries.append(entry)
+            for address in {str(tx.get("from", "")).lower(), str(tx.get("to", "")).lower()}:
+                self._by_address.setdefault(address, deque()).append(entry)
+        self._keys.add_many(added)
+        while len(self._entries) > self.capacity:
+            self._evict()
+        return len(added)
+
+    def _evict(self):
+        key, _, tx = self._entries.popleft()
+        for address in {str(tx.get("from", "")).lower(), str(tx.get("to", "")).lower()}:
+            entries = self._by_address.get(address)
+            if entries and entries[0][0] == key:
+                entries.popleft()
+            if not entries:
+                self._by_address.pop(address, None)
+
+    def query(self, address=None, token=None, since=None, limit=100):
+        """Transactions les plus récentes d'abord, filtrées par adresse, jeton et date"""
+        entries = self._by_address.get(address.lower(), ()) if address else self._entries
+        token = token.upper() if token else None
+        results = []
+        for _, timestamp, tx in reversed(entries):
+            if since is not None and timestamp < since:
+                continue
+            if token and str(tx.get("tokenSymbol", "")).upper() != token:
+                continue
+            results.append(tx)
+            if len(results) >= limit:
+                break
+        return results
+
+
+class QueryCache:
+    """Index en mémoire alimenté par le poller, rechargé à la lecture s'il a expiré
+
+    Les lectures servent l'index courant sans attente tant qu'il a moins de `ttl`
+    secondes. Au-delà (ou au premier accès), l'index est considéré comme expiré et la
+    lecture attend son rechargement par `loader(index)`; les lectures simultanées
+    rejoignent le même rechargement.
+    """
+
+    def __init__(self, name, index, loader, ttl=QUERY_CACHE_TTL):
+        self.name = name
+        self.index = index
+        self.loader = loader
+        self.ttl = ttl
+        self.updated_at = None
+        self.refreshes = 0
+        self._inflight = None
+
+    def is_fresh(self):
+        return self.updated_at is not None and time.monotonic() - self.updated_at < self.ttl
+
+    def update(self, *args, **kwargs):
+        """Alimente l'index (appelé par le poller) et le marque comme frais
+
+        Tant que l'index n'a jamais été chargé, les mises à jour sont ignorées: la première
+        lecture le chargera entièrement.
+        """
+        if self.updated_at is None:
+            return 0
+        added = self.index.add(*args, **kwargs)
+        self.updated_at = time.monotonic()
+        return added
+
+    async def _refresh(self):
+        try:
+            await self.loader(self.index)
+            self.updated_at = time.monotonic()
+            self.refreshes += 1
+        except Exception as e:
+            # L'index courant reste servi; un nouvel essai aura lieu à la lecture suivante
+            logger.error(f"Rechargement du cache {self.name} impossible: {e}")
+
+    async def get(self):
+        """Retourne l'index, rechargé au préalable s'il a expiré"""
+        if not self.is_fresh():
+            if self._inflight is None or self._inflight.done():
+                self._inflight = asyncio.ensure_future(self._refresh())
+            await asyncio.shield(self._inflight)
+        return self.index
+
+    def status(self):
+        return {
+            "size": len(self.index),
+            "age": None if self.updated_at is None else time.monotonic() - self.updated_at,
+            "ttl": self.ttl,
+            "refreshes": self.refreshes,
+        }
@@ -0,0 +1,287 @@
+import heapq
+import logging
+
+import ijson
+
+logger = logging.getLogger(__name__)
+
+# Formes possibles de la réponse de /api/config/addresses
+SHAPE_LIST = "list"            # [{"id": ..., "address": ...}, ...]
+SHAPE_ADDRESSES = "addresses"  # {"addresses": {"<id>": {"address": ...}, ...}}
+SHAPE_ITEMS = "items"          # {"items": [{"id": ..., "address": ...}, ...]}
+SHAPE_OBJECT = "object"        # {"<clé>": {"id": ..., "address": ...} ou {"address": ...}, ...}
+
+
+class AddressRecord:
+    """Adresse normalisée: l'ID est converti en entier une seule fois, à l'ingestion"""
+
+    __slots__ = ("id", "address", "issuer")
+
+    def __init__(self, record_id, address, issuer=""):
+        self.id = int(record_id)
+        self.address = address
+        self.issuer = issuer or ""
+
+    def __getitem__(self, key):
+        # Accès par clé conservé pour le code qui manipulait des dictionnaires
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        return isinstance(other, AddressRecord) and (
+            (self.id, self.address, self.issuer) == (other.id, other.address, other.issuer)
+        )
+
+    def __repr__(self):
+        return f"AddressRecord(id={self.id}, address={self.address!r}, issuer={self.issuer!r})"
+
+    def as_dict(self):
+        return {"id": self.id, "address": self.address, "issuer": self.issuer}
+
+
+def _record(record_id, info):
+    try:
+        return AddressRecord(record_id, info.get("address", ""), info.get("issuer", ""))
+    except (TypeError, ValueError):
+        logger.warning(f"Adresse ignorée, ID invalide: {record_id}")
+        return None
+
+
+def _normalize_item(item):
+    """Normalise un élément de liste ({"id", "address", "issuer"})"""
+    if isinstance(item, dict) and "id" in item and "address" in item:
+        return _record(item["id"], item)
+    return None
+
+
+def _normalize_address_entry(key, info):
+    """Normalise une entrée du dictionnaire 'addresses' (l'ID est la clé)"""
+    if isinstance(info, dict) and "address" in info:
+        return _record(key, info)
+    return None
+
+
+def _normalize_object_entry(key, value):
+    """Normalise une propriété d'un objet quelconque"""
+    if isinstance(value, dict) and "id" in value and "address" in value:
+        return _record(value["id"], value)
+    if isinstance(value, dict) and "address" in value:
+        # Cas où l'ID est la clé et les autres infos sont dans la valeur
+        return _record(key, value)
+    return None
+
+
+def detect_shape(data):
+    """Détermine la forme d'une réponse déjà décodée (None si elle est inexploitable)"""
+    if isinstance(data, list):
+        return SHAPE_LIST
+    if isinstance(data, dict) and "error" not in data:
+        if "addresses" in data and isinstance(data["addresses"], dict):
+            return SHAPE_ADDRESSES
+        if "items" in data and isinstance(data["items"], list):
+            return SHAPE_ITEMS
+        return SHAPE_OBJECT
+    return None
+
+
+def iter_records(data, shape):
+    """Parcourt les adresses normalisées d'une réponse déjà décodée"""
+    if shape == SHAPE_LIST:
+        records = (_normalize_item(item) for item in data)
+    elif shape == SHAPE_ADDRESSES:
+        records = (_normalize_address_entry(key, value) for key, value in data["addresses"].items())
+    elif shape == SHAPE_ITEMS:
+        records = (_normalize_item(item) for item in data["items"])
+    elif shape == SHAPE_OBJECT:
+        records = (_normalize_object_entry(key, value) for key, value in data.items())
+    else:
+        return
+    for record in records:
+        if record is not None:
+            yield record
+
+
+def extract_data_for_csv(data):
+    """Extrait les données pertinentes pour le CSV (id, address, issuer)"""
+    return [record.as_dict() for record in iter_records(data, detect_shape(data))]
+
+
+def select_new(records, cursor, limit=None):
+    """Sélectionne en un seul passage les adresses d'ID strictement supérieur à cursor
+
+    Si limit est fourni, seules les `limit` adresses de plus petits IDs sont conservées
+    (tas borné, sans tri de l'ensemble).
+
+    Returns:
+        Un tuple (adresses retenues triées par ID, plus grand ID rencontré, nombre
+        d'adresses au-delà de cursor)
+    """
+    high_water_mark = cursor
+    count = 0
+    selected = []
+    for record in records:
+        if record.id <= cursor:
+            continue
+        count += 1
+        if record.id > high_water_mark:
+            high_water_mark = record.id
+        if limit is None:
+            selected.append(record)
+        elif len(selected) < limit:
+            heapq.heappush(selected, (-record.id, record))
+        elif record.id < -selected[0][0]:
+            heapq.heapreplace(selected, (-record.id, record))
+
+    if limit is not None:
+        selected = [record for _, record in selected]
+    selected.sort(key=lambda record: record.id)
+    return selected, high_water_mark, count
+
+
+class _AsyncChunkReader:
+    """Adapte un itérateur asynchrone d'octets à l'interface read() attendue par ijson"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+
+    async def read(self, size=-1):
+        # ijson appelle read(0) pour déterminer le type des données, sans rien consommer
+        if size == 0:
+            return b""
+        # Un bloc vide signifie la fin du flux pour ijson: les blocs vides sont sautés
+        async for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+async def _read_value(events, event, value):
+    """Construit la valeur JSON qui commence par l'événement (event, value)"""
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1 if event in ("start_map", "start_array") else 0
+    while depth:
+        _, event, value = await events.__anext__()
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+    return builder.value
+
+
+async def _iter_entries(events):
+    """Parcourt les propriétés d'un objet dont l'événement start_map vient d'être lu
+
+    Produit (clé, premier événement de la valeur, valeur de l'événement); une valeur
+    objet ou liste doit être entièrement lue (_read_value) avant la propriété suivante.
+    """
+    while True:
+        _, event, value = await events.__anext__()
+        if event == "end_map":
+            return
+        _, first_event, first_value = await events.__anext__()
+        yield value, first_event, first_value
+
+
+async def _iter_items(events):
+    """Parcourt les éléments d'une liste dont l'événement start_array vient d'être lu"""
+    while True:
+        _, event, value = await events.__anext__()
+        if event == "end_array":
+            return
+        yield await _read_value(events, event, value)
+
+
+class AddressPayloadNormalizer:
+    """Décode la réponse des adresses en flux et produit des enregistrements normalisés
+
+    La réponse est toujours décodée au fil de l'eau, sans jamais être chargée entière en
+    mémoire. Au premier appel, la forme est déterminée pendant le décodage, avec la même
+    priorité que detect_shape: une liste, sinon la propriété "addresses", puis "items",
+    sinon chaque propriété de premier niveau est une adresse. Les adresses candidates
+    d'un objet attendent la fin de celui-ci, sauf "addresses" qui est décodé en flux.
+    La forme est ensuite mémorisée pour décoder directement le chemin des adresses. Si la
+    forme mémorisée ne produit plus aucun enregistrement, elle est oubliée et sera
+    déterminée à nouveau au prochain appel.
+    """
+
+    def __init__(self):
+        self.shape = None
+        # Nombre d'enregistrements produits lors du dernier décodage
+        self.last_count = 0
+
+    async def iter_records(self, chunks):
+        """Produit les enregistrements normalisés à partir d'un itérateur asynchrone d'octets"""
+        self.last_count = 0
+        reader = _AsyncChunkReader(chunks)
+        if self.shape is None:
+            records = self._detect_and_iter(reader)
+        elif self.shape in (SHAPE_LIST, SHAPE_ITEMS):
+            prefix = "item" if self.shape == SHAPE_LIST else "items.item"
+            records = (_normalize_item(item) async for item in ijson.items_async(reader, prefix, use_float=True))
+        else:
+            prefix = "addresses" if self.shape == SHAPE_ADDRESSES else ""
+            normalize = _normalize_address_entry if self.shape == SHAPE_ADDRESSES else _normalize_object_entry
+            records = (normalize(key, value)
+                       async for key, value in ijson.kvitems_async(reader, prefix, use_float=True))
+
+        async for record in records:
+            if record is not None:
+                self.last_count += 1
+                yield record
+
+        if self.shape is not None and not self.last_count:
+            logger.warning(f"Aucune adresse décodée avec la forme {self.shape}, nouvelle détection au prochain appel")
+            self.shape = None
+
+    async def _detect_and_iter(self, reader):
+        """Détermine la forme pendant le décodage et produit les adresses dans le même passage"""
+        events = ijson.parse_async(reader, use_float=True).__aiter__()
+        _, event, _ = await events.__anext__()
+        if event == "start_array":
+            self._detected(SHAPE_LIST)
+            async for item in _iter_items(events):
+                yield _normalize_item(item)
+            return
+        if event != "start_map":
+            logger.warning("Réponse des adresses inexploitable (ni liste ni objet)")
+            return
+
+        # Même priorité que detect_shape: "error" écarte la réponse, puis "addresses" (objet),
+        # "items" (liste), sinon chaque propriété est une adresse. Tant que la forme n'est pas
+        # connue, les adresses candidates ("items" et propriétés de premier niveau) attendent
+        # la fin de l'objet: seul "addresses" est décodé en flux dès qu'il apparaît.
+        items = None
+        entries = []
+        failed = False
+        async for key, event, value in _iter_entries(events):
+            if self.shape is None and key == "addresses" and event == "start_map" and not failed:
+                self._detected(SHAPE_ADDRESSES)
+                async for entry_key, entry_event, entry_value in _iter_entries(events):
+                    yield _normalize_address_entry(entry_key, await _read_value(events, entry_event, entry_value))
+            elif self.shape is None and key == "items" and event == "start_array" and items is None:
+                items = [_normalize_item(item) async for item in _iter_items(events)]
+            else:
+                value = await _read_value(events, event, value)
+                if self.shape is None and key == "error":
+                    logger.warning(f"Réponse des adresses en erreur: {value}")
+                    failed = True
+                elif self.shape is None:
+                    record = _normalize_object_entry(key, value)
+                    if record is not None:
+                        entries.append(record)
+
+        if self.shape is not None or failed:
+            return
+        if items is not None:
+            self._detected(SHAPE_ITEMS)
+            candidates = items
+        else:
+            self._detected(SHAPE_OBJECT)
+            candidates = entries
+        for record in candidates:
+            yield record
+
+    def _detected(self, shape):
+        self.shape = shape
+        logger.info(f"Forme de la réponse des adresses détectée: {shape}")
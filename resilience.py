@@ -0,0 +1,196 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Délai maximal (secondes) d'un appel à l'API amont, réessais compris
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "30"))
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+# Délai de base de l'attente entre deux essais (gigue complète, doublé à chaque essai)
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+# Réessais autorisés en proportion des appels (budget partagé par tous les appels)
+UPSTREAM_RETRY_RATIO = float(os.getenv("UPSTREAM_RETRY_RATIO", "0.2"))
+# Échecs consécutifs qui ouvrent le disjoncteur, et durée d'ouverture (secondes)
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+# Requête de couverture envoyée quand la première dépasse le p95 des latences observées
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "false").lower() in ("1", "true", "yes")
+
+# Codes de statut pour lesquels un nouvel essai a du sens
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """L'API amont est considérée indisponible: l'appel échoue sans être tenté"""
+
+
+class RetryableStatusError(httpx.HTTPStatusError):
+    """Réponse amont en erreur temporaire (429, 5xx)"""
+
+
+def raise_for_retryable_status(response):
+    if response.status_code in RETRYABLE_STATUSES or response.status_code >= 500:
+        raise RetryableStatusError(
+            f"Erreur temporaire de l'API amont: {response.status_code}",
+            request=response.request, response=response
+        )
+
+
+class CircuitBreaker:
+    """Disjoncteur: ouvert après `threshold` échecs consécutifs, un essai est permis après `reset_timeout`"""
+
+    def __init__(self, threshold=UPSTREAM_BREAKER_THRESHOLD, reset_timeout=UPSTREAM_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def check(self):
+        if self.state == "open":
+            raise CircuitOpenError("Disjoncteur ouvert: API amont indisponible")
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Disjoncteur refermé: l'API amont répond de nouveau")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or (self.opened_at is None and self.failures >= self.threshold):
+            logger.warning(f"Disjoncteur ouvert pour {self.reset_timeout:.0f}s après {self.failures} échecs")
+            self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """Budget de réessais partagé: chaque appel crédite `ratio` réessai, chaque réessai en consomme un"""
+
+    def __init__(self, ratio=UPSTREAM_RETRY_RATIO, minimum=10):
+        self.ratio = ratio
+        self.capacity = minimum
+        self.balance = float(minimum)
+
+    def deposit(self):
+        self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def withdraw(self):
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class LatencyTracker:
+    """Latences des derniers appels réussis, pour estimer le p95"""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+
+    def p95(self):
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class ResilientUpstream:
+    """Appels à l'API amont bornés dans le temps, réessayés, protégés par un disjoncteur
+
+    Chaque appel a un délai global (`deadline`), réessais compris. Les erreurs réseau et
+    les statuts temporaires sont réessayés avec une attente à gigue complète, dans la
+    limite du budget de réessais partagé. Tant que le disjoncteur est ouvert, les appels
+    échouent immédiatement. En option, une seconde requête identique est envoyée quand
+    la première dépasse le p95 des latences observées; la première réponse l'emporte.
+    """
+
+    def __init__(self, deadline=UPSTREAM_DEADLINE, max_attempts=UPSTREAM_MAX_ATTEMPTS,
+                 backoff_base=UPSTREAM_BACKOFF_BASE, hedge=UPSTREAM_HEDGE, breaker=None, budget=None):
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.latency = LatencyTracker()
+        self.hedged = 0
+
+    async def _attempt(self, func, hedge):
+        started = time.monotonic()
+        threshold = self.latency.p95() if hedge else None
+        if threshold is None:
+            result = await func()
+        else:
+            tasks = [asyncio.ensure_future(func())]
+            try:
+                done, _ = await asyncio.wait(tasks, timeout=threshold)
+                if not done:
+                    self.hedged += 1
+                    tasks.append(asyncio.ensure_future(func()))
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                result = done.pop().result()
+            finally:
+                # La requête perdante (ou les deux si l'appel est annulé) est abandonnée
+                for task in tasks:
+                    task.cancel()
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    async def _call(self, func, hedge):
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            self.breaker.check()
+            try:
+                result = await self._attempt(func, hedge)
+            except (httpx.TransportError, RetryableStatusError) as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts or not self.budget.withdraw():
+                    raise
+                delay = random.uniform(0, self.backoff_base * 2 ** (attempt - 1))
+                logger.warning(f"Appel amont en échec ({e}), essai {attempt + 1} dans {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call(self, func, hedge=None):
+        """Exécute `func()` (coroutine qui effectue un appel idempotent) avec les protections
+
+        Raises:
+            asyncio.TimeoutError si le délai global est dépassé, CircuitOpenError si le
+            disjoncteur est ouvert, ou la dernière erreur de l'appel
+        """
+        hedge = self.hedge if hedge is None else hedge
+        try:
+            return await asyncio.wait_for(self._call(func, hedge), self.deadline)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise asyncio.TimeoutError(f"Délai de {self.deadline:.0f}s dépassé pour l'appel amont")
+
+    def status(self):
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retry_budget": round(self.budget.balance, 2),
+            "p95_latency": self.latency.p95(),
+            "hedged_requests": self.hedged,
+        }
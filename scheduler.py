@@ -0,0 +1,191 @@
+import os
+import time
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Configuration des intervalles de vérification
+ADDRESS_POLL_INTERVAL = float(os.getenv("ADDRESS_POLL_INTERVAL", "60"))
+TX_POLL_INTERVAL = float(os.getenv("TX_POLL_INTERVAL", "60"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "10"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "300"))
+POLL_BACKOFF_FACTOR = float(os.getenv("POLL_BACKOFF_FACTOR", "2"))
+
+
+class Feed:
+    """Flux vérifié périodiquement (adresses, transactions...)
+
+    Une seule exécution du flux est en cours à un instant donné: un déclenchement qui
+    arrive pendant une exécution attend son résultat au lieu d'en lancer une seconde.
+
+    L'intervalle s'adapte à l'activité observée: il revient au plancher dès que de
+    nouveaux éléments sont détectés (la fonction `activity` retourne un compteur qui
+    augmente avec les éléments détectés), et est multiplié par `backoff_factor` jusqu'au
+    plafond après une exécution sans nouveauté ou en erreur.
+
+    La fonction optionnelle `skip` permet de suspendre la vérification périodique (par
+    exemple tant que les données arrivent par webhook).
+    """
+
+    def __init__(self, name, func, interval, jitter=POLL_JITTER, activity=None, skip=None,
+                 min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 backoff_factor=POLL_BACKOFF_FACTOR):
+        self.name = name
+        self.func = func
+        self.activity = activity
+        self.skip = skip
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.backoff_factor = backoff_factor
+        self.interval = interval
+        self.interval_reason = "intervalle initial"
+        self.jitter = jitter
+        self.runs = 0
+        self.last_run = None
+        self.last_result = None
+        self._inflight = None
+        self._lock = None
+        self._wakeup = None
+
+    @property
+    def wakeup(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    @property
+    def lock(self):
+        # Créé à la demande pour appartenir à la boucle de l'application
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def next_delay(self):
+        """Intervalle avant la prochaine exécution, avec une gigue de ±jitter"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _adapt(self, result, activity_before):
+        """Ajuste l'intervalle selon le résultat de l'exécution"""
+        previous = self.interval
+        if result is False:
+            self.interval = min(self.max_interval, self.interval * self.backoff_factor)
+            self.interval_reason = "erreur"
+        elif self.activity is not None and self.activity() != activity_before:
+            self.interval = self.min_interval
+            self.interval_reason = "nouveaux éléments"
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff_factor)
+            self.interval_reason = "aucune nouveauté"
+
+        if self.interval != previous:
+            logger.info("Intervalle du flux %s: %.0fs -> %.0fs (%s)",
+                        self.name, previous, self.interval, self.interval_reason,
+                        extra={"feed": self.name, "interval": self.interval})
+            if self.interval < previous:
+                # Réveiller la boucle périodique pour appliquer tout de suite le nouvel intervalle
+                self.wakeup.set()
+
+    async def _run(self, *args, **kwargs):
+        async with self.lock:
+            started = time.monotonic()
+            activity_before = self.activity() if self.activity is not None else None
+            try:
+                result = await self.func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Erreur lors de la vérification du flux {self.name}: {e}")
+                result = False
+            self.runs += 1
+            self.last_run = time.time()
+            self.last_result = result
+            duration = time.monotonic() - started
+            logger.info("Flux %s vérifié en %.2fs", self.name, duration,
+                        extra={"feed": self.name, "duration": duration})
+            self._adapt(result, activity_before)
+            return result
+
+    async def sleep(self):
+        """Attend l'intervalle courant, ou moins si l'intervalle est réduit entre-temps"""
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), self.next_delay())
+        except asyncio.TimeoutError:
+            pass
+
+    async def trigger(self):
+        """Lance une exécution, ou rejoint celle déjà en cours"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._run())
+        return await asyncio.shield(self._inflight)
+
+    async def run_exclusive(self, *args, **kwargs):
+        """Exécute le flux avec des arguments spécifiques, après l'exécution en cours"""
+        return await self._run(*args, **kwargs)
+
+    async def run_with(self, func, *args, **kwargs):
+        """Exécute une autre coroutine sous le verrou du flux, sans ajuster l'intervalle"""
+        async with self.lock:
+            return await func(*args, **kwargs)
+
+    def status(self):
+        return {
+            "interval": self.interval,
+            "interval_reason": self.interval_reason,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_result": self.last_result,
+            "running": self._lock is not None and self._lock.locked(),
+            "suspended": self.skip is not None and self.skip(),
+        }
+
+
+class Scheduler:
+    """Ordonnanceur asyncio: chaque flux tourne dans sa propre tâche sur la boucle de l'application"""
+
+    def __init__(self):
+        self.feeds = {}
+        self._tasks = {}
+
+    def add_feed(self, name, func, interval, **options):
+        self.feeds[name] = Feed(name, func, interval, **options)
+        return self.feeds[name]
+
+    async def trigger(self, name):
+        return await self.feeds[name].trigger()
+
+    async def run_exclusive(self, name, *args, **kwargs):
+        return await self.feeds[name].run_exclusive(*args, **kwargs)
+
+    async def _loop(self, feed):
+        while True:
+            if feed.skip is not None and feed.skip():
+                logger.debug("Vérification périodique du flux %s suspendue", feed.name)
+            else:
+                logger.info("Vérification périodique du flux %s...", feed.name)
+                await feed.trigger()
+            await feed.sleep()
+
+    def start(self):
+        """Démarre une tâche par flux"""
+        for name, feed in self.feeds.items():
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._loop(feed))
+                logger.info(f"Flux {name} planifié toutes les {feed.interval:.0f} secondes "
+                            f"(entre {feed.min_interval:.0f} et {feed.max_interval:.0f} selon l'activité)")
+
+    async def stop(self):
+        """Arrête les tâches périodiques et attend la fin des exécutions en cours"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+        inflight = [feed._inflight for feed in self.feeds.values() if feed._inflight is not None]
+        await asyncio.gather(*inflight, return_exceptions=True)
+        logger.info("Ordonnanceur arrêté")
+
+    def status(self):
+        return {name: feed.status() for name, feed in self.feeds.items()}
@@ -0,0 +1,228 @@
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+
+from address_store import DATA_DIR
+from metrics import SUBSCRIBER_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Fichier des abonnements (liste JSON de {"chat_id", "issuers", "min_amount", "tokens"})
+SUBSCRIPTIONS_FILE = os.getenv("SUBSCRIPTIONS_FILE", os.path.join(DATA_DIR, "subscriptions.json"))
+# Messages gardés par chat pour un nouvel essai après un échec d'envoi (au-delà, les plus anciens sont perdus)
+FANOUT_RETRY_LIMIT = int(os.getenv("FANOUT_RETRY_LIMIT", "20"))
+# Délai (secondes) au-delà duquel la diffusion n'attend plus un chat lent
+FANOUT_SEND_TIMEOUT = float(os.getenv("FANOUT_SEND_TIMEOUT", "30"))
+
+FEED_ADDRESSES = "addresses"
+FEED_TRANSACTIONS = "transactions"
+
+
+def _amount(tx):
+    try:
+        return float(tx.get("valueFormatted"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Subscription:
+    """Abonnement d'un chat Telegram, avec ses filtres (None ou vide: aucun filtre)
+
+    - issuers: émetteurs des nouvelles adresses à recevoir
+    - min_amount: montant minimal des transactions
+    - tokens: symboles des jetons des transactions
+    """
+
+    def __init__(self, chat_id, issuers=None, min_amount=None, tokens=None):
+        self.chat_id = str(chat_id)
+        self.issuers = frozenset(issuer.casefold() for issuer in issuers or ())
+        self.min_amount = float(min_amount) if min_amount is not None else None
+        self.tokens = frozenset(token.upper() for token in tokens or ())
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict) or not data.get("chat_id"):
+            raise ValueError(f"Abonnement invalide: {data}")
+        return cls(data["chat_id"], data.get("issuers"), data.get("min_amount"), data.get("tokens"))
+
+    def as_dict(self):
+        return {
+            "chat_id": self.chat_id,
+            "issuers": sorted(self.issuers),
+            "min_amount": self.min_amount,
+            "tokens": sorted(self.tokens),
+        }
+
+    @property
+    def filter_key(self):
+        """Clé commune à tous les abonnements qui ont les mêmes filtres"""
+        return (self.issuers, self.min_amount, self.tokens)
+
+    def matches(self, feed, item):
+        if feed == FEED_ADDRESSES:
+            return not self.issuers or (item.issuer or "").casefold() in self.issuers
+        if self.tokens and str(item.get("tokenSymbol", "")).upper() not in self.tokens:
+            return False
+        if self.min_amount is not None:
+            amount = _amount(item)
+            return amount is not None and amount >= self.min_amount
+        return True
+
+
+class SubscriptionRegistry:
+    """Registre des abonnements, regroupés par filtres identiques
+
+    Les abonnements viennent de TELEGRAM_CHAT_ID (un ou plusieurs IDs séparés par des
+    virgules, sans filtre) et du fichier SUBSCRIPTIONS_FILE. Les groupes sont calculés à
+    chaque modification du registre, pas à chaque diffusion.
+    """
+
+    def __init__(self, path=SUBSCRIPTIONS_FILE, default_chat_ids=None):
+        self.path = path
+        self._subscriptions = {}
+        self._groups = []
+        for chat_id in (default_chat_ids or "").split(","):
+            if chat_id.strip():
+                self._subscriptions[chat_id.strip()] = Subscription(chat_id.strip())
+        self.load()
+
+    def load(self):
+        """Recharge le fichier des abonnements (les abonnements du fichier l'emportent)"""
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    entries = json.load(f)
+                for entry in entries:
+                    subscription = Subscription.from_dict(entry)
+                    self._subscriptions[subscription.chat_id] = subscription
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"Lecture des abonnements impossible ({self.path}): {e}")
+        self._regroup()
+        logger.info(f"{len(self._subscriptions)} abonnements chargés ({len(self._groups)} filtres distincts)")
+
+    def _regroup(self):
+        groups = {}
+        for subscription in self._subscriptions.values():
+            groups.setdefault(subscription.filter_key, []).append(subscription)
+        # (abonnement représentatif du filtre, IDs des chats concernés)
+        self._groups = [(members[0], [member.chat_id for member in members]) for members in groups.values()]
+
+    def groups(self):
+        return self._groups
+
+    def all(self):
+        return list(self._subscriptions.values())
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+class FanOut:
+    """Diffuse un lot d'éléments à tous les abonnés concernés
+
+    Le lot est filtré une fois par filtre distinct et le message rendu une fois par
+    sélection distincte, puis mis aussitôt dans la file de chaque chat du dispatcher
+    (qui borne le débit vers Telegram). La diffusion attend les livraisons au plus
+    send_timeout: les messages d'un chat lent restent dans sa file sans retenir les
+    autres chats.
+
+    Un lot livré à au moins un chat est considéré comme envoyé par l'appelant: le
+    message d'un chat en échec est alors gardé (au plus `retry_limit` par chat) et remis
+    en file avant le message suivant de ce chat.
+    """
+
+    def __init__(self, dispatcher, registry, send_timeout=FANOUT_SEND_TIMEOUT, retry_limit=FANOUT_RETRY_LIMIT):
+        self.dispatcher = dispatcher
+        self.registry = registry
+        self.send_timeout = send_timeout
+        self.retry_limit = max(1, retry_limit)
+        # Chat -> messages (flux, texte) à renvoyer, du plus ancien au plus récent
+        self._retries = {}
+
+    def _keep(self, chat_id, feed, message):
+        """Garde le message d'un chat en échec pour un nouvel essai"""
+        retries = self._retries.setdefault(chat_id, deque())
+        if len(retries) >= self.retry_limit:
+            lost_feed, _ = retries.popleft()
+            logger.error(f"Message {lost_feed} perdu pour le chat {chat_id}: "
+                         f"{self.retry_limit} messages déjà en attente de nouvel essai")
+            SUBSCRIBER_RETRIES.labels(lost_feed, "lost").inc()
+        retries.append((feed, message))
+        SUBSCRIBER_RETRIES.labels(feed, "kept").inc()
+
+    def _drop_unsubscribed(self, chat_ids):
+        for chat_id in [chat_id for chat_id in self._retries if chat_id not in chat_ids]:
+            for feed, _ in self._retries.pop(chat_id):
+                logger.warning(f"Message {feed} abandonné pour le chat {chat_id}, qui n'est plus abonné")
+                SUBSCRIBER_RETRIES.labels(feed, "lost").inc()
+
+    async def _send(self, chat_id, message):
+        """Remet en file les messages à réessayer du chat, puis `message`; retourne le résultat de ce dernier"""
+        retries = [(feed, text, self.dispatcher.enqueue(chat_id, text)) for feed, text in self._retries.pop(chat_id, ())]
+        delivery = self.dispatcher.enqueue(chat_id, message)
+        for feed, text, retry in retries:
+            if all(await retry):
+                SUBSCRIBER_RETRIES.labels(feed, "resent").inc()
+            else:
+                self._keep(chat_id, feed, text)
+        return all(await delivery)
+
+    def _keep_if_failed(self, chat_id, feed, message, task):
+        """Garde le message d'un envoi terminé après la fin de la diffusion s'il a échoué"""
+        if task.cancelled() or task.exception() is not None or not task.result():
+            logger.error(f"Échec de l'envoi au chat {chat_id} terminé après la diffusion, nouvel essai au prochain message")
+            self._keep(chat_id, feed, message)
+
+    async def publish(self, feed, items, render):
+        """Envoie à chaque chat le message rendu à partir des éléments qui le concernent
+
+        Returns:
+            Un dictionnaire {chat_id: True | False | None} (None: envoi toujours en cours)
+        """
+        rendered = {}
+        sends = {}
+        messages = {}
+        subscribed = set()
+        for subscription, chat_ids in self.registry.groups():
+            subscribed.update(chat_ids)
+            selected = [item for item in items if subscription.matches(feed, item)]
+            if not selected:
+                continue
+            selection = tuple(id(item) for item in selected)
+            if selection not in rendered:
+                rendered[selection] = render(selected)
+            for chat_id in chat_ids:
+                messages[chat_id] = rendered[selection]
+                sends[chat_id] = asyncio.ensure_future(self._send(chat_id, rendered[selection]))
+        self._drop_unsubscribed(subscribed)
+
+        if not sends:
+            return {}
+        done, _ = await asyncio.wait(sends.values(), timeout=self.send_timeout)
+        results = {}
+        for chat_id, task in sends.items():
+            if task not in done:
+                logger.warning(f"Envoi au chat {chat_id} toujours en cours après {self.send_timeout:.0f}s")
+                results[chat_id] = None
+                task.add_done_callback(
+                    lambda task, chat_id=chat_id: self._keep_if_failed(chat_id, feed, messages[chat_id], task)
+                )
+            elif task.exception() is not None:
+                logger.error(f"Erreur lors de l'envoi au chat {chat_id}: {task.exception()}")
+                results[chat_id] = False
+            else:
+                results[chat_id] = task.result()
+
+        # Lot livré à d'autres chats: l'appelant ne le renverra pas, les chats en échec le recevront
+        # avec leur prochain message
+        if any(outcome is not False for outcome in results.values()):
+            for chat_id, outcome in results.items():
+                if outcome is False:
+                    logger.warning(f"Envoi {feed} au chat {chat_id} en échec, nouvel essai avec son prochain message")
+                    self._keep(chat_id, feed, messages[chat_id])
+        return results
+
+    def status(self):
+        return {chat_id: len(retries) for chat_id, retries in self._retries.items()}
@@ -0,0 +1,215 @@
+import os
+import time
+import asyncio
+import logging
+
+import httpx
+
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+# Limites Telegram: ~30 messages/s au total, 1 message/s par chat, 20 messages/min par groupe
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE_PER_MIN = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MIN", "20"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+
+# Taille maximale d'un message Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def split_message(message, limit=TELEGRAM_MESSAGE_LIMIT, separator="\n\n"):
+    """Découpe un message en morceaux d'au plus `limit` caractères
+
+    La coupure se fait entre deux enregistrements (blocs séparés par une ligne vide),
+    un enregistrement n'étant coupé que s'il dépasse à lui seul la limite.
+    """
+    if len(message) <= limit:
+        return [message]
+
+    chunks = []
+    current = ""
+    for block in message.split(separator):
+        candidate = f"{current}{separator}{block}" if current else block
+        if len(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        # Enregistrement plus long que la limite: coupure brute
+        while len(block) > limit:
+            chunks.append(block[:limit])
+            block = block[limit:]
+        current = block
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+class TokenBucket:
+    """Seau à jetons asynchrone: `rate` jetons par seconde, au plus `capacity` en réserve"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds):
+        """Vide le seau pour `seconds` secondes (demande de l'API via retry_after)"""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class TelegramDispatcher:
+    """File d'envoi asynchrone vers Telegram, limitée en débit
+
+    Chaque chat possède sa file et sa tâche d'envoi (l'ordre des messages d'un chat est
+    conservé), avec un seau à jetons par chat et un seau global partagé. Les réponses 429
+    sont réessayées après le délai `retry_after` indiqué par Telegram.
+    """
+
+    def __init__(self, api_url, global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+                 group_rate_per_min=TELEGRAM_GROUP_RATE_PER_MIN, max_retries=TELEGRAM_MAX_RETRIES):
+        self.api_url = api_url
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate_per_min / 60
+        self.max_retries = max_retries
+        self._global_bucket = None
+        self._buckets = {}
+        self._queues = {}
+        self._workers = {}
+
+    def _bucket_for(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            # Les identifiants de groupes et canaux sont négatifs
+            if str(chat_id).startswith("-"):
+                bucket = TokenBucket(self.group_rate, capacity=1)
+            else:
+                bucket = TokenBucket(self.chat_rate, capacity=1)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _queue_for(self, chat_id):
+        if self._global_bucket is None:
+            self._global_bucket = TokenBucket(self.global_rate)
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[chat_id] = queue
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id, queue))
+        return queue
+
+    def enqueue(self, chat_id, message, parse_mode="Markdown"):
+        """Met un message en file sans attendre sa livraison
+
+        Returns:
+            Un futur résolu à la liste des résultats des morceaux du message (True pour
+            chaque morceau accepté par Telegram)
+        """
+        loop = asyncio.get_running_loop()
+        queue = self._queue_for(chat_id)
+        futures = []
+        for chunk in split_message(message):
+            future = loop.create_future()
+            queue.put_nowait((chunk, parse_mode, future))
+            futures.append(future)
+        if len(futures) > 1:
+            logger.info("Message découpé en %d parties pour le chat %s", len(futures), chat_id)
+        return asyncio.gather(*futures)
+
+    async def send(self, chat_id, message, parse_mode="Markdown"):
+        """Met un message en file et attend sa livraison complète
+
+        Returns:
+            True si tous les morceaux du message ont été acceptés par Telegram
+        """
+        return all(await self.enqueue(chat_id, message, parse_mode))
+
+    def pending(self):
+        """Nombre de messages en attente d'envoi, tous chats confondus"""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def _worker(self, chat_id, queue):
+        bucket = self._bucket_for(chat_id)
+        while True:
+            chunk, parse_mode, future = await queue.get()
+            try:
+                delivered = await self._deliver(chat_id, chunk, parse_mode, bucket)
+            except Exception as e:
+                logger.error(f"Erreur inattendue lors de l'envoi Telegram au chat {chat_id}: {e}")
+                delivered = False
+            if not future.done():
+                future.set_result(delivered)
+            queue.task_done()
+
+    async def _deliver(self, chat_id, text, parse_mode, bucket):
+        """Envoie un morceau en respectant les limites, avec réessais"""
+        url = f"{self.api_url}/sendMessage"
+        data = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+
+        for attempt in range(1, self.max_retries + 1):
+            await bucket.acquire()
+            await self._global_bucket.acquire()
+            try:
+                response = await http_client.post(url, json=data)
+            except httpx.HTTPError as e:
+                delay = min(2 ** attempt, 60)
+                logger.warning(f"Erreur réseau Telegram ({e}), nouvel essai dans {delay}s")
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                response_json = response.json()
+            except ValueError:
+                response_json = {}
+
+            if response.status_code == 200 and response_json.get('ok'):
+                logger.info("Message envoyé avec succès sur Telegram au chat %s", chat_id,
+                            extra={"chat_id": chat_id, "attempt": attempt})
+                return True
+
+            if response.status_code == 429:
+                retry_after = response_json.get("parameters", {}).get("retry_after", 1)
+                logger.warning(f"Limite Telegram atteinte pour le chat {chat_id}, attente de {retry_after}s")
+                bucket.pause(retry_after)
+                continue
+
+            if response.status_code >= 500:
+                delay = min(2 ** attempt, 60)
+                logger.warning(f"Erreur serveur Telegram {response.status_code}, nouvel essai dans {delay}s")
+                await asyncio.sleep(delay)
+                continue
+
+            logger.error(f"Erreur Telegram: {response.status_code} - {response_json}")
+            return False
+
+        logger.error(f"Échec de l'envoi au chat {chat_id} après {self.max_retries} tentatives")
+        return False
+
+    async def aclose(self):
+        """Arrête les tâches d'envoi"""
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers = {}
+        self._queues = {}
+        self._global_bucket = None
@@ -3,6 +3,7 @@ import requests
 import json
 import csv
 from dotenv import load_dotenv
+from records import extract_data_for_csv
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -29,49 +30,6 @@ def fetch_api_data():
         print(f"Erreur lors de la requête API: {e}")
         return {"error": str(e)}
 
-def extract_data_for_csv(data):
-    """Extrait les données pertinentes pour le CSV (id, address, issuer)"""
-    csv_data = []
-    
-    # Vérification si les données sont une liste d'objets (comme dans la réponse de l'API)
-    if isinstance(data, list):
-        for item in data:
-            if isinstance(item, dict) and all(k in item for k in ["id", "address"]):
-                csv_data.append({
-                    "id": item["id"],
-                    "address": item["address"],
-                    "issuer": item.get("issuer", "")
-                })
-    # Si les données sont un dictionnaire
-    elif isinstance(data, dict) and not "error" in data:
-        # Si les données sont dans une propriété 'items' ou similaire
-        if "items" in data and isinstance(data["items"], list):
-            for item in data["items"]:
-                if all(k in item for k in ["id", "address"]):
-                    csv_data.append({
-                        "id": item["id"],
-                        "address": item["address"],
-                        "issuer": item.get("issuer", "")
-                    })
-        # Si les données sont un objet avec des propriétés
-        else:
-            for key, value in data.items():
-                if isinstance(value, dict) and all(k in value for k in ["id", "address"]):
-                    csv_data.append({
-                        "id": value["id"],
-                        "address": value["address"],
-                        "issuer": value.get("issuer", "")
-                    })
-                elif isinstance(value, dict) and "address" in value:
-                    # Cas où l'ID est la clé et les autres infos sont dans la valeur
-                    csv_data.append({
-                        "id": key,
-                        "address": value.get("address", ""),
-                        "issuer": value.get("issuer", "")
-                    })
-    
-    return csv_data
-
 def save_to_csv(data, filename="bcreader_data.csv"):
     """Sauvegarde les données dans un fichier CSV"""
     csv_data = extract_data_for_csv(data)
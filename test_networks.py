@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+
+from http_client import http_client
+from metrics import UPSTREAM_PAYLOAD_BYTES, UPSTREAM_RESPONSES
+from networks import NetworkMonitor
+from records import AddressRecord
+from scheduler import Scheduler
+
+
+def payload_observations(endpoint):
+    return sum(bucket.get() for bucket in UPSTREAM_PAYLOAD_BYTES.labels(endpoint)._buckets)
+
+
+def address(n):
+    return {"id": n, "address": f"0x{n:040d}", "issuer": "Issuer"}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Réponses de l'API simulée: handler(request) -> httpx.Response"""
+    state = {"handler": None}
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: state["handler"](request)))
+    monkeypatch.setattr(http_client, "_client", client)
+    monkeypatch.setattr(http_client, "_semaphores", {})
+    return state
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    network = NetworkMonitor("test", "http://up", "k", None, lambda *args: "", lambda *args: "",
+                             directory=str(tmp_path))
+    yield network
+    network.close()
+
+
+def test_sync_addresses_streams_and_stores_new_addresses(upstream, monitor):
+    upstream["handler"] = lambda request: httpx.Response(200, json=[address(n) for n in (1, 2, 3)],
+                                                         headers={"etag": '"v1"'})
+    observed = payload_observations("test:addresses")
+
+    assert asyncio.run(monitor.sync_addresses()) is True
+    assert monitor.address_store.high_water_mark == 3
+    assert monitor.address_store.get_validators()[0] == '"v1"'
+    assert UPSTREAM_RESPONSES.labels("test:addresses", "200")._value.get() >= 1
+    # Une seule mesure de taille par réponse, relevée après lecture du corps
+    assert payload_observations("test:addresses") == observed + 1
+
+
+def test_sync_addresses_not_modified(upstream, monitor):
+    upstream["handler"] = lambda request: httpx.Response(200, json=[address(1)], headers={"etag": '"v1"'})
+    asyncio.run(monitor.sync_addresses())
+
+    def not_modified(request):
+        assert request.headers["if-none-match"] == '"v1"'
+        return httpx.Response(304)
+    upstream["handler"] = not_modified
+
+    assert asyncio.run(monitor.sync_addresses()) is True
+    assert monitor.address_store.high_water_mark == 1
+
+
+def test_sync_addresses_reports_upstream_errors(upstream, monitor):
+    upstream["handler"] = lambda request: httpx.Response(404, json={"error": "absent"})
+
+    assert asyncio.run(monitor.sync_addresses()) is False
+    assert monitor.address_store.high_water_mark == 0
+
+
+def notified(monitor):
+    """Remplace la diffusion Telegram: relève les IDs des adresses envoyées"""
+    sent = []
+
+    async def notify(feed, items, render):
+        sent.extend(item.id for item in items)
+        return True
+    monitor.notify = notify
+    monitor.add_feeds(Scheduler())
+    return sent
+
+
+def test_first_ingest_without_cursor_sends_pushed_addresses_only(upstream, monitor):
+    sent = notified(monitor)
+
+    assert asyncio.run(monitor.ingest_addresses([AddressRecord(n, f"0x{n}") for n in (5, 6)])) is True
+    assert sent == [5, 6]
+    assert monitor.checkpoints.get_cursor("last_processed_id") == "6"
+
+    # L'historique synchronisé ensuite n'est pas envoyé
+    upstream["handler"] = lambda request: httpx.Response(200, json=[address(n) for n in range(1, 7)])
+    assert asyncio.run(monitor.process_addresses()) is True
+    assert sent == [5, 6]
+
+
+def test_first_ingest_with_known_addresses_skips_history(monitor):
+    sent = notified(monitor)
+    monitor.address_store.add_new([AddressRecord(n, f"0x{n}") for n in (1, 2, 3)])
+
+    asyncio.run(monitor.ingest_addresses([AddressRecord(n, f"0x{n}") for n in (3, 4)]))
+    assert sent == [4]
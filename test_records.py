@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from records import (
+    SHAPE_ADDRESSES, SHAPE_ITEMS, SHAPE_LIST, SHAPE_OBJECT, AddressPayloadNormalizer, extract_data_for_csv
+)
+
+PAYLOADS = {
+    "list": ([{"id": 1, "address": "0x1", "issuer": "A"}, {"id": "2", "address": "0x2"}, {"other": 3}], SHAPE_LIST),
+    "addresses": ({"addresses": {"3": {"address": "0x3", "issuer": "B"}, "4": {"address": "0x4"}}, "total": 2},
+                  SHAPE_ADDRESSES),
+    "items": ({"items": [{"id": 5, "address": "0x5", "issuer": "C"}, {"id": 6}], "page": 1}, SHAPE_ITEMS),
+    "object": ({"a": {"id": 7, "address": "0x7"}, "8": {"address": "0x8", "issuer": "D"}, "count": 2}, SHAPE_OBJECT),
+    "metadata_then_addresses": ({"meta": {"page": 1, "tags": [1]}, "addresses": {"9": {"address": "0x9"}}},
+                                SHAPE_ADDRESSES),
+    "metadata_then_items": ({"pagination": {"next": None}, "items": [{"id": 10, "address": "0xa"}]}, SHAPE_ITEMS),
+    "items_then_addresses": ({"items": [{"id": 11, "address": "0xb"}], "addresses": {"12": {"address": "0xc"}}},
+                             SHAPE_ADDRESSES),
+}
+
+
+async def chunked(payload, size=7):
+    """Corps de réponse découpé en petits blocs, comme reçu du réseau"""
+    body = json.dumps(payload).encode("utf-8")
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def decode(normalizer, payload):
+    async def collect():
+        return [record.as_dict() async for record in normalizer.iter_records(chunked(payload))]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("name", sorted(PAYLOADS))
+def test_detection_and_cached_shape_match_extract_data_for_csv(name):
+    payload, shape = PAYLOADS[name]
+    expected = extract_data_for_csv(payload)
+    assert expected
+
+    normalizer = AddressPayloadNormalizer()
+    assert decode(normalizer, payload) == expected
+    assert normalizer.shape == shape
+    assert normalizer.last_count == len(expected)
+
+    # Deuxième appel: décodage direct du chemin des adresses avec la forme mémorisée
+    assert decode(normalizer, payload) == expected
+    assert normalizer.shape == shape
+
+
+def test_error_payload_yields_nothing_and_keeps_detecting():
+    normalizer = AddressPayloadNormalizer()
+    payload = {"error": "quota", "addresses": {"1": {"address": "0x1"}}}
+
+    assert decode(normalizer, payload) == extract_data_for_csv(payload) == []
+    assert normalizer.shape is None
+
+
+def test_unusable_payload_yields_nothing():
+    normalizer = AddressPayloadNormalizer()
+
+    assert decode(normalizer, "not an object") == []
+    assert normalizer.shape is None
+
+
+def test_shape_is_detected_again_when_cached_shape_stops_matching():
+    normalizer = AddressPayloadNormalizer()
+    decode(normalizer, PAYLOADS["list"][0])
+    assert normalizer.shape == SHAPE_LIST
+
+    payload = PAYLOADS["addresses"][0]
+    # La forme mémorisée ne produit rien: elle est oubliée
+    assert decode(normalizer, payload) == []
+    assert normalizer.shape is None
+
+    assert decode(normalizer, payload) == extract_data_for_csv(payload)
+    assert normalizer.shape == SHAPE_ADDRESSES
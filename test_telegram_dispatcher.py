@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import telegram_dispatcher
+from http_client import http_client
+from telegram_dispatcher import TELEGRAM_MESSAGE_LIMIT, TelegramDispatcher, split_message
+
+
+def address_message(count):
+    """Message des nouvelles adresses tel que formaté pour Telegram"""
+    message = "📊 New Safe Deployed 📊\n\n"
+    for n in range(count):
+        message += f"🔹 ID: {n}\n📍 Address: 0x{n:040d}\n🏢 Issuer: Issuer {n}\n\n"
+    return message
+
+
+def test_split_message_cuts_between_records():
+    message = address_message(300)
+    chunks = split_message(message)
+
+    assert len(chunks) > 1
+    assert all(0 < len(chunk) <= TELEGRAM_MESSAGE_LIMIT and chunk.strip() for chunk in chunks)
+    # Aucun enregistrement coupé: le message se reconstitue à l'identique
+    assert "\n\n".join(chunks) == message
+    assert all(chunk.startswith(("📊", "🔹")) for chunk in chunks)
+
+
+def test_split_message_keeps_short_message_and_cuts_oversized_record():
+    assert split_message("court") == ["court"]
+    chunks = split_message("x" * 10000, limit=4096)
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 1808]
+
+
+class FakeClock:
+    """Horloge simulée: asyncio.sleep avance le temps sans attendre"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+    def __getattr__(self, name):
+        # Le reste de time et d'asyncio est utilisé tel quel
+        return getattr(asyncio, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(telegram_dispatcher, "time", fake)
+    monkeypatch.setattr(telegram_dispatcher, "asyncio", fake)
+    return fake
+
+
+@pytest.fixture
+def telegram(monkeypatch, clock):
+    """API Telegram simulée: réponses programmées, requêtes (instant, chat, texte) relevées"""
+    state = {"responses": [], "requests": []}
+
+    def handler(request):
+        data = json.loads(request.content)
+        state["requests"].append((clock.now, data["chat_id"], data["text"]))
+        if state["responses"]:
+            return state["responses"].pop(0)
+        return httpx.Response(200, json={"ok": True})
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(http_client, "_semaphores", {})
+    return state
+
+
+def run(dispatcher, *sends):
+    async def main():
+        try:
+            return await asyncio.gather(*(dispatcher.send(chat_id, message) for chat_id, message in sends))
+        finally:
+            await dispatcher.aclose()
+    return asyncio.run(main())
+
+
+def test_retry_after_is_honored(telegram, clock):
+    telegram["responses"] = [httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 3}})]
+    dispatcher = TelegramDispatcher("http://telegram", chat_rate=1, global_rate=30)
+
+    assert run(dispatcher, ("1", "bonjour")) == [True]
+    (first, _, _), (second, _, _) = telegram["requests"]
+    assert second - first >= 3
+
+
+def test_server_errors_are_retried_with_backoff(telegram, clock):
+    telegram["responses"] = [httpx.Response(503, json={"ok": False}), httpx.Response(502, json={"ok": False})]
+    dispatcher = TelegramDispatcher("http://telegram", chat_rate=100, global_rate=100)
+
+    assert run(dispatcher, ("1", "bonjour")) == [True]
+    assert len(telegram["requests"]) == 3
+    assert clock.sleeps[:2] == [2, 4]
+
+
+def test_client_errors_are_not_retried(telegram, clock):
+    telegram["responses"] = [httpx.Response(400, json={"ok": False, "description": "chat not found"})]
+    dispatcher = TelegramDispatcher("http://telegram")
+
+    assert run(dispatcher, ("1", "bonjour")) == [False]
+    assert len(telegram["requests"]) == 1
+
+
+def test_chat_bucket_spaces_messages_of_a_chat(telegram, clock):
+    dispatcher = TelegramDispatcher("http://telegram", chat_rate=1, global_rate=30)
+
+    assert run(dispatcher, ("1", "a"), ("1", "b"), ("1", "c")) == [True, True, True]
+    assert [(at, text) for at, _, text in telegram["requests"]] == [(0, "a"), (1, "b"), (2, "c")]
+
+
+def test_group_bucket_uses_group_rate(telegram, clock):
+    dispatcher = TelegramDispatcher("http://telegram", group_rate_per_min=20, global_rate=30)
+
+    run(dispatcher, ("-100", "a"), ("-100", "b"))
+    times = [at for at, _, _ in telegram["requests"]]
+    assert times[1] - times[0] == pytest.approx(3)
+
+
+def test_global_bucket_is_shared_by_all_chats(telegram, clock):
+    dispatcher = TelegramDispatcher("http://telegram", chat_rate=100, global_rate=2)
+
+    run(dispatcher, *((str(chat_id), "message") for chat_id in range(1, 5)))
+    times = sorted(at for at, _, _ in telegram["requests"])
+    assert times == pytest.approx([0, 0, 0.5, 1.0])
+
+
+def test_long_message_is_sent_in_chunks(telegram, clock):
+    dispatcher = TelegramDispatcher("http://telegram", chat_rate=1, global_rate=30)
+    message = address_message(300)
+
+    assert run(dispatcher, ("1", message)) == [True]
+    texts = [text for _, _, text in telegram["requests"]]
+    assert len(texts) > 1 and "\n\n".join(texts) == message
+    # Un morceau par seconde au plus pour ce chat
+    times = [at for at, _, _ in telegram["requests"]]
+    assert times == list(range(len(times)))
@@ -0,0 +1,172 @@
+import asyncio
+
+from backfill import TransactionBackfill
+from checkpoint_store import CheckpointStore
+from transactions import SeenIndex, TransactionCatchUp
+from tx_archive import TransactionArchive
+
+
+def transfer(sender, value, token="EURC"):
+    """Transfert tel que renvoyé par /api/all-transactions, sans hash ni bloc"""
+    return {"from": sender, "to": "0xdest", "valueFormatted": value, "tokenSymbol": token}
+
+
+def fake_api(history):
+    """Pagination de /api/all-transactions sur `history` (la plus récente d'abord)"""
+    async def fetch_page(page, limit):
+        start = (page - 1) * limit
+        return {"data": history[start:start + limit]}
+    return fetch_page
+
+
+def catch_up(history, seen, page_size=2):
+    """Rattrapage puis mémorisation des clés, comme après un envoi réussi"""
+    collector = TransactionCatchUp(fake_api(history), seen, page_size=page_size, concurrency=2)
+    new_transactions, new_keys = asyncio.run(collector.collect_new())
+    seen.add_many(reversed(new_keys))
+    return new_transactions, new_keys
+
+
+def test_identical_transfer_on_next_page_is_kept():
+    old = transfer("0xold", "1")
+    seen = SeenIndex()
+    catch_up([old], seen)
+
+    repeated = transfer("0xa", "10")
+    history = [transfer("0xb", "5"), repeated, dict(repeated), old]
+    new_transactions, new_keys = catch_up(history, seen)
+
+    assert new_transactions == history[:3]
+    assert len(set(new_keys)) == 3
+
+
+def test_new_copy_of_seen_transfer_is_new_and_old_one_is_not_resent():
+    repeated = transfer("0xa", "10")
+    seen = SeenIndex()
+    history = [repeated, transfer("0xold", "1")]
+    catch_up(history, seen)
+
+    history = [transfer("0xb", "5"), dict(repeated)] + history
+    new_transactions, new_keys = catch_up(history, seen)
+
+    assert new_transactions == history[:2]
+    assert catch_up(history, seen) == ([], [])
+
+
+def test_keys_do_not_depend_on_pagination():
+    history = [transfer("0xa", "10") for _ in range(5)] + [transfer("0xold", "1")]
+    keys = []
+    for page_size in (1, 2, 3):
+        seen = SeenIndex()
+        catch_up(history[-1:], seen)
+        keys.append(catch_up(history, seen, page_size=page_size)[1])
+
+    assert keys[0] == keys[1] == keys[2]
+    assert len(set(keys[0])) == 5
+
+
+def test_pagination_shift_drops_identified_duplicates_only():
+    seen = SeenIndex()
+    catch_up([{"hash": "0x00", "logIndex": 0}], seen)
+    page_1 = [{"hash": "0x03", "logIndex": 0}, {"hash": "0x02", "logIndex": 0}]
+    # Une transaction arrivée entre les deux requêtes décale la page 2
+    page_2 = [{"hash": "0x02", "logIndex": 0}, {"hash": "0x01", "logIndex": 0}]
+    page_3 = [{"hash": "0x00", "logIndex": 0}]
+    pages = {1: page_1, 2: page_2, 3: page_3}
+
+    async def fetch_page(page, limit):
+        return {"data": pages.get(page, [])}
+
+    collector = TransactionCatchUp(fetch_page, seen, page_size=2, concurrency=2)
+    new_transactions, _ = asyncio.run(collector.collect_new())
+
+    assert [tx["hash"] for tx in new_transactions] == ["0x03", "0x02", "0x01"]
+
+
+class ListArchive:
+    def __init__(self, transactions=()):
+        self.transactions = list(transactions)
+        self.batches = []
+
+    def append(self, transactions):
+        self.batches.append(list(transactions))
+        self.transactions.extend(transactions)
+
+    def first(self):
+        return self.transactions[0] if self.transactions else None
+
+
+def test_backfill_keeps_identical_transfers_across_pages(tmp_path):
+    repeated = transfer("0xa", "10")
+    history = [transfer("0xb", "5"), repeated, dict(repeated), transfer("0xc", "1"), dict(repeated)]
+    archive = ListArchive()
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    try:
+        backfill = TransactionBackfill(fake_api(history), archive, checkpoints, page_size=2, concurrency=2,
+                                       rate=1000, batch_size=2)
+        written = asyncio.run(backfill.run())
+    finally:
+        checkpoints.close()
+
+    assert written == len(history)
+    # Chaque lot est écrit du plus ancien au plus récent
+    assert [tx for batch in archive.batches for tx in reversed(batch)] == history
+    assert backfill.duplicates == 0
+
+
+def test_backfill_drops_identified_pagination_duplicates(tmp_path):
+    pages = {
+        1: [{"hash": "0x04", "logIndex": 0}, {"hash": "0x03", "logIndex": 0}],
+        2: [{"hash": "0x03", "logIndex": 0}, {"hash": "0x02", "logIndex": 0}],
+        3: [{"hash": "0x01", "logIndex": 0}],
+    }
+
+    async def fetch_page(page, limit):
+        return {"data": pages.get(page, [])}
+
+    archive = ListArchive()
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    try:
+        backfill = TransactionBackfill(fetch_page, archive, checkpoints, page_size=2, concurrency=2, rate=1000)
+        asyncio.run(backfill.run())
+    finally:
+        checkpoints.close()
+
+    assert [tx["hash"] for tx in archive.transactions] == ["0x01", "0x02", "0x03", "0x04"]
+    assert backfill.duplicates == 1
+
+
+def test_backfill_skips_transactions_already_archived(tmp_path):
+    history = [{"hash": f"0x{n:02d}", "logIndex": 0} for n in range(6, 0, -1)]
+    # Le service a archivé 0x04, 0x05 puis 0x06 avant le chargement
+    archive = ListArchive(reversed(history[:3]))
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    try:
+        backfill = TransactionBackfill(fake_api(history), archive, checkpoints, page_size=2, concurrency=2, rate=1000)
+        asyncio.run(backfill.run())
+    finally:
+        checkpoints.close()
+
+    assert [tx["hash"] for tx in archive.transactions] == ["0x04", "0x05", "0x06", "0x01", "0x02", "0x03"]
+    assert backfill.archived == 3
+
+
+def test_backfilled_archive_is_not_chronological_but_ranges_stay_exact(tmp_path):
+    history = [{"hash": f"0x{n:02d}", "logIndex": 0, "from": "0xa", "to": "0xb", "timestamp": 1000 + n}
+               for n in range(12, 0, -1)]
+    archive = TransactionArchive(str(tmp_path / "archive"), block_records=2)
+    # Transactions archivées par le service (les plus récentes), puis chargement de l'historique
+    archive.append(list(reversed(history[:4])))
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    try:
+        backfill = TransactionBackfill(fake_api(history), archive, checkpoints, page_size=3, concurrency=2,
+                                       rate=1000, batch_size=3)
+        asyncio.run(backfill.run())
+    finally:
+        checkpoints.close()
+
+    timestamps = [tx["timestamp"] for tx in archive.iter_range()]
+    assert sorted(timestamps) == list(range(1001, 1013))
+    assert timestamps != sorted(timestamps)
+    assert sorted(tx["timestamp"] for tx in archive.iter_range(1003, 1010)) == list(range(1003, 1011))
+    archive.close()
@@ -0,0 +1,259 @@
+import os
+import asyncio
+import logging
+import threading
+from itertools import islice
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Configuration du rattrapage des transactions
+TX_PAGE_SIZE = int(os.getenv("TX_PAGE_SIZE", "20"))
+TX_MAX_PAGES = int(os.getenv("TX_MAX_PAGES", "50"))
+TX_FETCH_CONCURRENCY = int(os.getenv("TX_FETCH_CONCURRENCY", "4"))
+TX_SEEN_CAPACITY = int(os.getenv("TX_SEEN_CAPACITY", "10000"))
+# Transactions vues les plus récentes comparées pour situer la frontière du rattrapage
+TX_BOUNDARY_MATCH = int(os.getenv("TX_BOUNDARY_MATCH", "5"))
+
+# Champs qui identifient une transaction de façon unique lorsqu'ils sont fournis par l'API
+HASH_FIELDS = ("hash", "transactionHash", "txHash")
+# Champs combinés quand l'API ne fournit pas de hash
+KEY_FIELDS = ("from", "to", "valueFormatted", "tokenSymbol", "blockNumber", "timestamp", "logIndex")
+
+
+def transaction_key(tx):
+    """Construit la clé de base d'une transaction
+
+    Le hash de transaction (et l'index de log) est utilisé s'il est présent, sinon la
+    combinaison des champs disponibles.
+    """
+    for field in HASH_FIELDS:
+        if tx.get(field):
+            return f"{str(tx[field]).lower()}:{tx.get('logIndex', '')}"
+    return "_".join(str(tx.get(field, "")).lower() for field in KEY_FIELDS)
+
+
+def is_identified(tx):
+    """True si la clé de base identifie la transaction (hash, ou numéro de bloc et index de log)
+
+    Sans ces champs, deux transferts identiques (mêmes adresses, montant et jeton) ont
+    la même clé de base.
+    """
+    if any(tx.get(field) for field in HASH_FIELDS):
+        return True
+    return tx.get("blockNumber") not in (None, "") and tx.get("logIndex") not in (None, "")
+
+
+def split_key(key):
+    """Sépare une clé "<base>#<rang>" en (base, rang)"""
+    base, _, rank = key.rpartition("#")
+    return base, int(rank) if rank.isdigit() else 0
+
+
+def transaction_keys(transactions, seen=None):
+    """Retourne les clés de transactions nouvelles (ordre de l'API: la plus récente d'abord)
+
+    Une transaction identifiée a toujours le rang 0. Les transferts identiques sans
+    identifiant sont numérotés du plus ancien au plus récent, à la suite des rangs déjà
+    présents dans `seen`: la clé d'un transfert ne dépend pas de la page où il apparaît,
+    et un nouvel exemplaire d'un transfert déjà vu obtient un rang encore inutilisé.
+    """
+    ranks = {}
+    keys = []
+    for tx in reversed(transactions):
+        base = transaction_key(tx)
+        if is_identified(tx):
+            rank = 0
+        else:
+            rank = ranks.get(base)
+            if rank is None:
+                rank = seen.next_rank(base) if seen is not None else 0
+            ranks[base] = rank + 1
+        keys.append(f"{base}#{rank}")
+    keys.reverse()
+    return keys
+
+
+class SeenIndex:
+    """Ensemble borné des clés de transactions déjà traitées
+
+    Les clés sont conservées dans leur ordre d'ajout (de la plus ancienne à la plus
+    récente transaction) et les plus anciennes sont évincées au-delà de la capacité.
+    Le plus grand rang présent de chaque clé de base est suivi pour numéroter les
+    nouveaux exemplaires d'un transfert identique.
+    """
+
+    def __init__(self, capacity=TX_SEEN_CAPACITY):
+        self.capacity = capacity
+        # Nombre total de clés ajoutées depuis le démarrage (compteur d'activité)
+        self.added = 0
+        self._keys = OrderedDict()
+        # Clé de base -> [nombre de clés présentes, plus grand rang présent]
+        self._ranks = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add_many(self, keys):
+        """Ajoute des clés (de la plus ancienne à la plus récente) en évinçant les plus anciennes
+
+        Une clé déjà présente garde sa place.
+        """
+        with self._lock:
+            for key in keys:
+                if key in self._keys:
+                    continue
+                self.added += 1
+                self._keys[key] = None
+                base, rank = split_key(key)
+                entry = self._ranks.setdefault(base, [0, rank])
+                entry[0] += 1
+                entry[1] = max(entry[1], rank)
+            while len(self._keys) > self.capacity:
+                key, _ = self._keys.popitem(last=False)
+                base, _ = split_key(key)
+                entry = self._ranks[base]
+                entry[0] -= 1
+                if not entry[0]:
+                    del self._ranks[base]
+
+    def next_rank(self, base):
+        """Premier rang inutilisé d'une clé de base"""
+        with self._lock:
+            entry = self._ranks.get(base)
+            return entry[1] + 1 if entry else 0
+
+    def recent(self, count):
+        """Retourne les `count` clés les plus récentes, de la plus récente à la plus ancienne"""
+        with self._lock:
+            return list(islice(reversed(self._keys), count))
+
+    def ordered(self, keys):
+        """Retourne celles des clés données qui sont présentes, dans leur ordre d'ajout"""
+        wanted = set(keys)
+        with self._lock:
+            return [key for key in self._keys if key in wanted]
+
+    def keys(self):
+        """Retourne les clés de la plus ancienne à la plus récente"""
+        with self._lock:
+            return list(self._keys)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._ranks.clear()
+
+
+class TransactionCatchUp:
+    """Parcourt les pages de /api/all-transactions jusqu'à rejoindre les données déjà vues
+
+    La première page est lue seule (cas courant: rien ou peu de nouveautés). Si elle ne
+    recoupe pas les transactions déjà vues, les pages suivantes sont récupérées par
+    lots concurrents jusqu'au recouvrement, à une page incomplète ou à max_pages.
+
+    Les pages lues forment une seule suite, de la plus récente à la plus ancienne. La
+    frontière avec les données déjà vues est la première transaction identifiée déjà
+    vue, ou l'endroit où la suite reprend les TX_BOUNDARY_MATCH transactions vues les
+    plus récentes. Les transactions au-dessus de la frontière sont nouvelles; leurs
+    clés sont numérotées sur tout le rattrapage à partir de cette frontière (voir
+    transaction_keys). Un décalage de pagination entre deux pages n'est écarté que
+    pour les transactions identifiées: sans identifiant, un doublon ne se distingue
+    pas d'un transfert identique, qui ne doit pas être perdu.
+
+    `seen` fournit `in`, `len`, `recent(count)` et `next_rank(base)` (SeenIndex).
+    """
+
+    def __init__(self, fetch_page, seen, page_size=TX_PAGE_SIZE, max_pages=TX_MAX_PAGES,
+                 concurrency=TX_FETCH_CONCURRENCY, boundary_match=TX_BOUNDARY_MATCH):
+        self.fetch_page = fetch_page
+        self.seen = seen
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.concurrency = max(1, concurrency)
+        self.boundary_match = max(1, boundary_match)
+        # Nombre de transactions lues lors du dernier rattrapage
+        self.read = 0
+
+    def _find_boundary(self, stream, final):
+        """Position de la plus récente transaction déjà vue dans `stream` ((transaction, base))
+
+        Retourne None si la frontière n'est pas (encore) trouvée: tant que `final` est
+        faux, une correspondance coupée par la fin de la suite attend les pages suivantes.
+        """
+        recent = [split_key(key)[0] for key in self.seen.recent(self.boundary_match)]
+        if not recent:
+            return None
+        candidate = None
+        for position, (tx, base) in enumerate(stream):
+            if is_identified(tx):
+                if f"{base}#0" in self.seen:
+                    return position
+                continue
+            if base != recent[0]:
+                continue
+            window = [base for _, base in stream[position:position + len(recent)]]
+            if window == recent[:len(window)]:
+                if len(window) == len(recent) or final:
+                    return position
+                return None
+            # La plus récente transaction vue, sans la suite attendue (ordre perturbé)
+            if candidate is None:
+                candidate = position
+        return candidate
+
+    async def collect_new(self):
+        """Retourne (nouvelles transactions, leurs clés), de la plus récente à la plus ancienne
+
+        Lève RuntimeError si une page ne peut pas être récupérée, pour ne pas avancer
+        sur un historique incomplet.
+        """
+        stream = []
+        identified = set()
+        read = 0
+        page = 1
+        boundary = None
+        complete = False
+
+        while boundary is None and not complete and page <= self.max_pages:
+            # Première page seule, puis lots de pages concurrents
+            batch_size = 1 if page == 1 else self.concurrency
+            pages = list(range(page, min(page + batch_size, self.max_pages + 1)))
+            results = await asyncio.gather(*(self.fetch_page(p, self.page_size) for p in pages))
+
+            for page_number, result in zip(pages, results):
+                if not result or "error" in result:
+                    raise RuntimeError(f"Page {page_number} des transactions indisponible")
+                transactions = result.get("data") or []
+                read += len(transactions)
+                for tx in transactions:
+                    base = transaction_key(tx)
+                    if is_identified(tx):
+                        # Un décalage de pagination entre deux pages peut dupliquer une transaction
+                        if base in identified:
+                            continue
+                        identified.add(base)
+                    stream.append((tx, base))
+
+                # Au premier démarrage (aucune transaction vue), seule la première page est prise
+                if not len(self.seen) or len(transactions) < self.page_size:
+                    complete = True
+                    break
+            page += len(pages)
+            boundary = self._find_boundary(stream, complete or page > self.max_pages)
+
+        if boundary is None and not complete:
+            logger.warning(f"Rattrapage interrompu après {self.max_pages} pages sans recouvrement")
+
+        new_transactions = [tx for tx, _ in stream[:boundary]]
+        new_keys = transaction_keys(new_transactions, self.seen)
+        self.read = read
+        logger.info("Rattrapage: %d transactions lues sur %d pages, %d nouvelles",
+                    read, page - 1, len(new_transactions),
+                    extra={"feed": "transactions", "read": read, "count": len(new_transactions)})
+        return new_transactions, new_keys
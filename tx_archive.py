@@ -0,0 +1,292 @@
+import os
+import json
+import mmap
+import time
+import base64
+import hashlib
+import logging
+import threading
+
+from address_store import DATA_DIR
+from query_cache import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Archive des transactions observées
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(DATA_DIR, "archive"))
+# Transactions par segment (au-delà, un nouveau segment est ouvert)
+ARCHIVE_SEGMENT_RECORDS = int(os.getenv("ARCHIVE_SEGMENT_RECORDS", "100000"))
+# Transactions par bloc de l'index temporel (granularité des sauts dans un segment)
+ARCHIVE_BLOCK_RECORDS = int(os.getenv("ARCHIVE_BLOCK_RECORDS", "1000"))
+
+# Filtre de Bloom des adresses d'un segment: ~10 bits par adresse (environ 1 % de faux positifs)
+BLOOM_BITS_PER_ENTRY = 10
+BLOOM_HASHES = 7
+
+
+class BloomFilter:
+    """Ensemble probabiliste compact: pas de faux négatif, quelques faux positifs"""
+
+    def __init__(self, bits, data=None):
+        self.bits = bits
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.bits for i in range(BLOOM_HASHES))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class Segment:
+    """Fichier NDJSON en ajout seul, avec son index épars
+
+    Chaque bloc de l'index couvre `block_records` lignes consécutives: position de début,
+    nombre de lignes et horodatages minimal et maximal. Les adresses du segment sont
+    résumées par un filtre de Bloom.
+    """
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.size = 0
+        self.records = 0
+        # Blocs [début, fin, horodatage min, horodatage max, lignes]
+        self.blocks = []
+        self.addresses = BloomFilter(capacity * 2 * BLOOM_BITS_PER_ENTRY)
+        self.sealed = False
+
+    @property
+    def index_path(self):
+        return self.path + ".idx"
+
+    def index(self, offset, end, timestamp, addresses, block_records):
+        """Ajoute une ligne écrite entre offset et end à l'index"""
+        if self.blocks and self.blocks[-1][4] < block_records:
+            block = self.blocks[-1]
+            block[1] = end
+            block[2] = min(block[2], timestamp)
+            block[3] = max(block[3], timestamp)
+            block[4] += 1
+        else:
+            self.blocks.append([offset, end, timestamp, timestamp, 1])
+        for address in addresses:
+            self.addresses.add(address)
+        self.records += 1
+        self.size = end
+
+    def save_index(self):
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "size": self.size,
+                "records": self.records,
+                "blocks": self.blocks,
+                "bloom_bits": self.addresses.bits,
+                "bloom": base64.b64encode(bytes(self.addresses.data)).decode("ascii"),
+            }, f)
+
+    def load_index(self):
+        """Charge l'index d'un segment scellé; False s'il est absent ou ne correspond pas au fichier"""
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("size") != os.path.getsize(self.path):
+            return False
+        self.size = data["size"]
+        self.records = data["records"]
+        self.blocks = data["blocks"]
+        self.addresses = BloomFilter(data["bloom_bits"], base64.b64decode(data["bloom"]))
+        self.sealed = True
+        return True
+
+
+def _line_addresses(entry):
+    return {entry.get("from", ""), entry.get("to", "")} - {""}
+
+
+class TransactionArchive:
+    """Archive en ajout seul des transactions observées, découpée en segments NDJSON
+
+    Les lectures projettent les segments en mémoire (mmap) et ne parcourent que les
+    segments et blocs dont l'index (plage d'horodatages, filtre de Bloom des adresses)
+    peut correspondre à la requête.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, segment_records=ARCHIVE_SEGMENT_RECORDS,
+                 block_records=ARCHIVE_BLOCK_RECORDS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_records = segment_records
+        self.block_records = block_records
+        self.segments = []
+        self._file = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._refresh()
+        logger.info(f"Archive des transactions ouverte: {directory} "
+                    f"({len(self.segments)} segments, {sum(s.records for s in self.segments)} transactions)")
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"segment-{number:08d}.ndjson")
+
+    def _refresh(self):
+        """Met l'index en mémoire à jour depuis les fichiers (écrits par cette instance ou une autre)"""
+        known = {segment.path: segment for segment in self.segments}
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".ndjson"))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            segment = known.get(path)
+            if segment is None:
+                segment = Segment(path, self.segment_records)
+                self.segments.append(segment)
+            if not segment.sealed and not segment.load_index():
+                self._catch_up(segment)
+
+    def _catch_up(self, segment):
+        """Indexe les lignes complètes ajoutées au segment depuis la dernière lecture"""
+        offset = segment.size
+        with open(segment.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Ligne en cours d'écriture, ou tronquée par un arrêt brutal
+                    break
+                end = offset + len(line)
+                try:
+                    entry = json.loads(line)
+                    segment.index(offset, end, entry["ts"], _line_addresses(entry), self.block_records)
+                except (ValueError, KeyError):
+                    logger.warning(f"Ligne invalide ignorée dans {segment.path} à la position {offset}")
+                    segment.size = end
+                offset = end
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _open_writer(self):
+        """Prend la main en écriture: reprend le dernier segment non scellé, ou en ouvre un"""
+        self._refresh()
+        segment = self.segments[-1] if self.segments else None
+        if segment is None or segment.sealed or segment.records >= self.segment_records:
+            self._rotate()
+            return
+        # Une ligne incomplète laissée par un arrêt brutal est retirée
+        if os.path.getsize(segment.path) != segment.size:
+            with open(segment.path, "r+b") as f:
+                f.truncate(segment.size)
+        self._file = open(segment.path, "ab")
+
+    def _rotate(self):
+        """Scelle le segment courant et en ouvre un nouveau"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.segments and not self.segments[-1].sealed:
+            self.segments[-1].save_index()
+            self.segments[-1].sealed = True
+        number = int(os.path.basename(self.segments[-1].path)[8:16]) + 1 if self.segments else 1
+        segment = Segment(self._segment_path(number), self.segment_records)
+        self.segments.append(segment)
+        self._file = open(segment.path, "ab")
+
+    def append(self, transactions, now=None):
+        """Ajoute des transactions (datées par leur horodatage, sinon par `now`)
+
+        Returns:
+            Le nombre de transactions archivées
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if self._file is None:
+                self._open_writer()
+            for tx in transactions:
+                entry = {
+                    "ts": parse_timestamp(tx.get("timestamp")) or now,
+                    "from": str(tx.get("from", "")).lower(),
+                    "to": str(tx.get("to", "")).lower(),
+                    "tx": tx,
+                }
+                line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+                segment = self.segments[-1]
+                offset = segment.size
+                self._file.write(line)
+                segment.index(offset, offset + len(line), entry["ts"], _line_addresses(entry), self.block_records)
+                if segment.records >= self.segment_records:
+                    self._rotate()
+            self._file.flush()
+        return len(transactions)
+
+    def _candidates(self, start, end, address):
+        """Blocs (chemin, début, fin) susceptibles de contenir des transactions de la plage"""
+        with self._lock:
+            segments = [(segment, list(segment.blocks)) for segment in self.segments if segment.records]
+        for segment, blocks in segments:
+            if address and address not in segment.addresses:
+                continue
+            ranges = [
+                (block[0], block[1]) for block in blocks
+                if (start is None or block[3] >= start) and (end is None or block[2] <= end)
+            ]
+            if ranges:
+                yield segment.path, ranges
+
+    def iter_range(self, start=None, end=None, address=None):
+        """Parcourt les transactions archivées d'une plage, dans l'ordre d'archivage
+
+        L'ordre d'archivage n'est chronologique qu'au sein d'un ajout (le chargement de
+        l'historique écrit après les transactions du service): le filtrage par période
+        s'appuie sur les bornes de chaque bloc, pas sur l'ordre des lignes.
+        """
+        address = address.lower() if address else None
+        needle = f'"{address}"'.encode("utf-8") if address else None
+        for path, ranges in self._candidates(start, end, address):
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for block_start, block_end in ranges:
+                    for line in mm[block_start:block_end].splitlines():
+                        if needle is not None and needle not in line:
+                            continue
+                        entry = json.loads(line)
+                        if start is not None and entry["ts"] < start:
+                            continue
+                        if end is not None and entry["ts"] > end:
+                            continue
+                        if address and address not in (entry["from"], entry["to"]):
+                            continue
+                        yield entry["tx"]
+
+    def first(self):
+        """Première transaction archivée (la plus ancienne écrite), ou None si l'archive est vide"""
+        with self._lock:
+            self._refresh()
+        return next(self.iter_range(), None)
+
+    def iter_ndjson(self, start=None, end=None, address=None):
+        """Export NDJSON d'une plage (une transaction par ligne)"""
+        for tx in self.iter_range(start, end, address):
+            yield (json.dumps(tx, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    def close(self):
+        """Rend la main en écriture (une autre instance pourra reprendre le segment courant)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def status(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "segments": len(self.segments),
+                "transactions": sum(segment.records for segment in self.segments),
+                "bytes": sum(segment.size for segment in self.segments),
+            }
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import logging
+
+from address_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Fichier de la liste de surveillance: {"<adresse>": "<libellé>"} ou
+# [{"address": ..., "label": ..., "highlight": true}, ...]
+WATCHLIST_FILE = os.getenv("WATCHLIST_FILE", os.path.join(DATA_DIR, "watchlist.json"))
+# Intervalle minimal (secondes) entre deux vérifications de la date de modification du fichier
+WATCHLIST_RELOAD_INTERVAL = float(os.getenv("WATCHLIST_RELOAD_INTERVAL", "10"))
+# Libellé des safes détectés par la surveillance des nouvelles adresses
+SAFE_LABEL = "NEW SAFE"
+
+# Entrées présentes même sans fichier
+DEFAULT_ENTRIES = [
+    {"address": "0x74a9b04c7bab3d3BAd1A0a06589A24A67a6f9127", "label": "GIFT NEW WALLET", "highlight": True},
+]
+
+
+class WatchEntry:
+    """Adresse surveillée: libellé affiché et mise en avant éventuelle de l'expéditeur"""
+
+    __slots__ = ("label", "highlight")
+
+    def __init__(self, label, highlight=False):
+        self.label = label
+        self.highlight = highlight
+
+
+def _parse_entries(data):
+    """Retourne {adresse en minuscules: WatchEntry} depuis le contenu du fichier"""
+    if isinstance(data, dict):
+        data = [{"address": address, "label": label} for address, label in data.items()]
+    entries = {}
+    for item in data:
+        if not isinstance(item, dict) or not item.get("address"):
+            logger.warning(f"Entrée de la liste de surveillance ignorée: {item}")
+            continue
+        entries[item["address"].lower()] = WatchEntry(item.get("label") or "WATCHED", bool(item.get("highlight")))
+    return entries
+
+
+class Watchlist:
+    """Liste d'adresses surveillées, consultée en temps constant
+
+    Les adresses sont normalisées en minuscules dans des ensembles hachés: celles du
+    fichier (et des entrées par défaut), et les safes détectés, ajoutés au fil de l'eau.
+    Le fichier est relu dès que sa date de modification change; la nouvelle table
+    remplace l'ancienne d'un bloc.
+    """
+
+    def __init__(self, path=WATCHLIST_FILE, reload_interval=WATCHLIST_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._entries = _parse_entries(DEFAULT_ENTRIES)
+        self._safes = set()
+        self._mtime = None
+        self._checked_at = 0
+        self.load()
+
+    def load(self):
+        """Relit le fichier (les entrées par défaut sont conservées)"""
+        entries = _parse_entries(DEFAULT_ENTRIES)
+        mtime = None
+        if self.path and os.path.exists(self.path):
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, encoding="utf-8") as f:
+                    entries.update(_parse_entries(json.load(f)))
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Lecture de la liste de surveillance impossible ({self.path}): {e}")
+                return False
+        self._entries = entries
+        self._mtime = mtime
+        logger.info(f"Liste de surveillance chargée: {len(entries)} adresses")
+        return True
+
+    def maybe_reload(self):
+        """Relit le fichier s'il a changé (vérifié au plus une fois par reload_interval)"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path) if self.path else None
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        return self.load()
+
+    def add_safes(self, records):
+        """Ajoute des safes détectés (AddressRecord) à la surveillance"""
+        for record in records:
+            self._safes.add(record.address.lower())
+
+    def lookup(self, address):
+        """Retourne l'entrée d'une adresse surveillée, ou None"""
+        if not address:
+            return None
+        address = address.lower()
+        entry = self._entries.get(address)
+        if entry is None and address in self._safes:
+            return SAFE_ENTRY
+        return entry
+
+    def is_priority(self, address):
+        """True si l'adresse est listée explicitement (fichier ou entrées par défaut)"""
+        return bool(address) and address.lower() in self._entries
+
+    def status(self):
+        return {
+            "path": self.path,
+            "addresses": len(self._entries),
+            "safes": len(self._safes),
+            "entries": {address: entry.label for address, entry in self._entries.items()},
+        }
+
+
+SAFE_ENTRY = WatchEntry(SAFE_LABEL)